@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Project annotation storage backed by SQLite
+
+Annotations are stored one row per project in a WAL-mode database, so an
+update writes a single row in its own transaction instead of rewriting a
+whole file, and concurrent requests (or processes) cannot lose each
+other's changes. Reads are served from an in-process cache that is only
+reloaded when another connection has committed a change. The old
+project_annotations.json is imported the first time the store is opened.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import threading
+
+ANNOTATIONS_DB = "project_annotations.db"
+LEGACY_ANNOTATIONS_FILE = "project_annotations.json"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS annotations (
+    project TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class AnnotationStore:
+    """Per-project annotations with atomic single-row updates and a read cache."""
+
+    def __init__(self, db_file=ANNOTATIONS_DB, legacy_file=LEGACY_ANNOTATIONS_FILE):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.cache = None
+        self.data_version = None
+        self.version = 0  # bumped whenever the cached annotations change
+        # One shared connection: PRAGMA data_version on it only changes when
+        # another connection commits, which is exactly when the cache is stale
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        if legacy_file and os.path.exists(legacy_file):
+            self.import_json(legacy_file, once=True)
+
+    def load(self):
+        """Return {project: annotation}, re-reading the database only if it changed."""
+        with self.lock:
+            version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+            if self.cache is None or version != self.data_version:
+                self.cache = {project: json.loads(data) for project, data in
+                              self.conn.execute('SELECT project, data FROM annotations')}
+                self.data_version = version
+                self.version += 1
+            return dict(self.cache)
+
+    def get(self, project):
+        return self.load().get(project)
+
+    def set(self, project, annotation):
+        """Replace the annotation of one project."""
+        self.write(project, lambda current: annotation)
+
+    def update(self, project, **fields):
+        """Change some fields of a project's annotation, keeping the others."""
+        self.write(project, lambda current: dict(current or {}, **fields))
+
+    def write(self, project, change):
+        """Apply change(current annotation or None) to one row in a write transaction."""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.conn.execute('SELECT data FROM annotations WHERE project = ?',
+                                        (project,)).fetchone()
+                annotation = change(json.loads(row[0]) if row else None)
+                self.conn.execute('INSERT OR REPLACE INTO annotations (project, data, updated) '
+                                  'VALUES (?, ?, ?)', (project, json.dumps(annotation), time.time()))
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            if self.cache is not None:
+                self.cache[project] = annotation
+                self.version += 1
+
+    def delete(self, project):
+        with self.lock:
+            self.conn.execute('DELETE FROM annotations WHERE project = ?', (project,))
+            if self.cache is not None:
+                self.cache.pop(project, None)
+                self.version += 1
+
+    def import_json(self, json_file, once=False, replace=False):
+        """Import annotations from a project_annotations.json file in one transaction.
+
+        Existing rows win unless replace is set. With once, a file that was
+        imported before is skipped. Returns the number of projects imported.
+        """
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                if once and self.conn.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+                    self.conn.execute('ROLLBACK')
+                    return 0
+                with open(json_file, 'r') as f:
+                    annotations = json.load(f)
+                verb = 'REPLACE' if replace else 'IGNORE'
+                now = time.time()
+                imported = 0
+                for project, annotation in annotations.items():
+                    imported += self.conn.execute(
+                        f'INSERT OR {verb} INTO annotations (project, data, updated) VALUES (?, ?, ?)',
+                        (project, json.dumps(annotation), now)).rowcount
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('imported', ?)",
+                                  (os.path.abspath(json_file),))
+                self.conn.execute('COMMIT')
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.cache = None
+            return imported
+
+    def export_json(self, json_file):
+        """Write all annotations to a JSON file in the old format, atomically."""
+        tmp_file = json_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(dict(sorted(self.load().items())), f, indent=2)
+        os.replace(tmp_file, json_file)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('import', 'export'):
+        print("Usage: python annotation_store.py import <annotations.json> [--replace]")
+        print("       python annotation_store.py export <annotations.json>")
+        sys.exit(1)
+
+    store = AnnotationStore(legacy_file=None)
+    if sys.argv[1] == 'import':
+        count = store.import_json(sys.argv[2], replace='--replace' in sys.argv)
+        print(f"Imported {count} annotations into {store.db_file}")
+    else:
+        store.export_json(sys.argv[2])
+        print(f"Exported {len(store.load())} annotations to {sys.argv[2]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@
 Project Viewer - Web application for viewing and managing code projects
 """
 
-from flask import Flask, render_template, jsonify, request, send_from_directory
+from flask import Flask, render_template, jsonify, request, send_from_directory, send_file, Response, stream_with_context, g, has_request_context
 import os
 import json
 import subprocess
@@ -11,6 +11,32 @@ import datetime
 import glob
 from pathlib import Path
 import mimetypes
+import threading
+import re
+import time
+import functools
+
+from scan_cache import ScanCache, project_signature
+from scanner import iter_scan_projects
+from github_meta import GitHubAPIBackend, GitHubMetadata, parse_github_repo
+from git_reader import read_repo_info
+from project_index import ProjectIndex, list_projects
+from language_detect import detect_language
+from file_tree import is_skipped, list_directory
+from file_viewer import read_line_range, read_byte_range
+from file_sniff import sniff_file
+from code_search import CodeSearchIndex
+from jobs import JobQueue, JobError
+from check_large_files import audit_history, format_size, FleetAuditor, LARGE_FILES_CACHE_FILE
+from clean_history import clean_history, CleanupError
+from annotation_store import AnnotationStore
+from project_meta import MetadataStore, MetadataError
+from project_query import ProjectCatalog, QueryError, parse_query, QUERY_PARAMS
+from worktree_status import StatusCollector, STATUS_TTL
+from git_activity import ActivityTracker, ACTIVITY_CACHE_FILE
+from http_response import finish_response
+from metrics import (PhaseTimer, REQUEST_SECONDS, REQUEST_PHASE_SECONDS, SCAN_PHASE_SECONDS,
+                     SERVER_TIMING, project_timings, record_cache, render as render_metrics)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
@@ -18,34 +44,37 @@ app.config['JSON_SORT_KEYS'] = False
 
 # Configuration
 PROJECTS_DIR = os.path.expanduser("~/Documents/dev")
-ANNOTATIONS_FILE = "project_annotations.json"
-
-def load_annotations():
-    """Load project annotations from JSON file."""
-    if os.path.exists(ANNOTATIONS_FILE):
-        with open(ANNOTATIONS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
-
-def save_annotations(annotations):
-    """Save project annotations to JSON file."""
-    with open(ANNOTATIONS_FILE, 'w') as f:
-        json.dump(annotations, f, indent=2)
-
-def load_project_metadata(project_path):
-    """Load project-specific metadata from .project-meta.json file."""
-    meta_file = os.path.join(project_path, '.project-meta.json')
-    if os.path.exists(meta_file):
-        try:
-            with open(meta_file, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {}
+ANNOTATIONS_DB = "project_annotations.db"
+ANNOTATIONS_FILE = "project_annotations.json"  # imported into ANNOTATIONS_DB on first start
+SCAN_CACHE_FILE = "project_scan_cache.json"
+GITHUB_CACHE_FILE = "github_meta_cache.json"
+SEARCH_INDEX_FILE = "code_search.db"
+JOBS_FILE = "project_jobs.json"
+SEARCH_REINDEX_INTERVAL = 300  # seconds between incremental code search index updates
+WATCH_PROJECTS = os.environ.get('PROJECT_VIEWER_WATCH', '1') != '0'
+
+scan_cache = ScanCache(SCAN_CACHE_FILE)
+github_meta = GitHubMetadata(GitHubAPIBackend(), GITHUB_CACHE_FILE)
+project_index = None
+project_index_lock = threading.Lock()
+code_search_index = None
+job_queue = JobQueue(JOBS_FILE)
+large_file_auditor = FleetAuditor(LARGE_FILES_CACHE_FILE)
+annotation_store = AnnotationStore(ANNOTATIONS_DB, ANNOTATIONS_FILE)
+metadata_store = MetadataStore()
+status_collector = StatusCollector()
+activity_tracker = ActivityTracker(ACTIVITY_CACHE_FILE)
+project_catalog = None  # (index seq, annotations version, build time, ProjectCatalog)
+project_catalog_lock = threading.Lock()
 
 def scan_project(project_path):
-    """Analyze a single project directory."""
+    """Analyze a single project directory.
+    
+    Each phase is timed into the scan phase histogram and the project's
+    entry in project_timings.
+    """
     project_name = os.path.basename(project_path)
+    timer = PhaseTimer(SCAN_PHASE_SECONDS, project_path)
     
     # Detect project type
     project_type = "Unknown"
@@ -63,35 +92,11 @@ def scan_project(project_path):
         project_type = "Python" 
     elif os.path.exists(os.path.join(project_path, "Dockerfile")):
         project_type = "Docker"
+    timer.lap('type')
     
     # Detect primary language
-    language = "Unknown"
-    ext_counts = {}
-    lang_map = {
-        ".js": "JavaScript", ".ts": "TypeScript", ".py": "Python",
-        ".java": "Java", ".kt": "Kotlin", ".go": "Go",
-        ".rs": "Rust", ".swift": "Swift", ".m": "Objective-C",
-        ".pl": "Prolog", ".pro": "Prolog", ".P": "Prolog",
-        ".sol": "Solidity", ".vy": "Vyper", ".circom": "Circom",
-        ".rb": "Ruby", ".php": "PHP", ".c": "C", ".cpp": "C++",
-        ".cs": "C#", ".lua": "Lua", ".r": "R", ".scala": "Scala",
-        ".clj": "Clojure", ".ex": "Elixir", ".dart": "Dart",
-        ".nim": "Nim", ".zig": "Zig", ".v": "V"
-    }
-    
-    for root, _, files in os.walk(project_path):
-        # Skip hidden directories
-        if '/.git' in root or '/node_modules' in root:
-            continue
-        for file in files[:100]:  # Limit to first 100 files for performance
-            _, ext = os.path.splitext(file.lower())
-            if ext in lang_map:
-                ext_counts[ext] = ext_counts.get(ext, 0) + 1
-    
-    if ext_counts:
-        primary_ext = max(ext_counts, key=lambda k: ext_counts.get(k, 0))
-        if primary_ext in lang_map:
-            language = lang_map[primary_ext]
+    language = detect_language(project_path)
+    timer.lap('language')
     
     # Check git status
     has_git = os.path.exists(os.path.join(project_path, ".git"))
@@ -99,35 +104,18 @@ def scan_project(project_path):
     remote_url = ""
     is_private = None
     
+    branch = None
+    head_commit = None
+    
     if has_git:
-        try:
-            result = subprocess.run(['git', 'remote', 'get-url', 'origin'], 
-                                  cwd=project_path, capture_output=True, text=True)
-            if result.returncode == 0:
-                has_remote = True
-                remote_url = result.stdout.strip()
-                
-                # Check if repo is private using gh CLI
-                if 'github.com' in remote_url:
-                    # Extract owner/repo from URL
-                    if remote_url.startswith('git@github.com:'):
-                        repo_path = remote_url.replace('git@github.com:', '').replace('.git', '')
-                    elif 'github.com/' in remote_url:
-                        repo_path = remote_url.split('github.com/')[-1].replace('.git', '')
-                    else:
-                        repo_path = None
-                    
-                    if repo_path:
-                        try:
-                            # Use gh api to check if repo is private
-                            api_result = subprocess.run(['gh', 'api', f'repos/{repo_path}', '-q', '.private'], 
-                                                      capture_output=True, text=True)
-                            if api_result.returncode == 0:
-                                is_private = api_result.stdout.strip().lower() == 'true'
-                        except:
-                            pass
-        except:
-            pass
+        # Read remote, branch and HEAD straight from .git instead of forking git
+        repo_info = read_repo_info(project_path)
+        if repo_info:
+            remote_url = repo_info['remotes'].get('origin', '')
+            has_remote = bool(remote_url)
+            branch = repo_info['branch']
+            head_commit = repo_info['head']
+    timer.lap('git')
     
     # Get last modified date
     last_modified = "Unknown"
@@ -143,9 +131,11 @@ def scan_project(project_path):
     
     # Check for .gitignore
     gitignore_exists = os.path.exists(os.path.join(project_path, ".gitignore"))
+    timer.lap('files')
     
-    # Load project metadata
-    metadata = load_project_metadata(project_path)
+    # Load project metadata (cached until the file changes)
+    metadata, metadata_errors = metadata_store.load(project_path)
+    timer.lap('metadata')
     
     return {
         'name': project_name,
@@ -157,237 +147,759 @@ def scan_project(project_path):
         'has_remote': has_remote,
         'remote_url': remote_url,
         'is_private': is_private,
+        'branch': branch,
+        'head_commit': head_commit,
         'readme_exists': readme_exists,
         'gitignore_exists': gitignore_exists,
-        'metadata': metadata
+        'metadata': metadata,
+        'metadata_errors': metadata_errors
     }
 
+@app.before_request
+def start_job_queue():
+    """Resume queued jobs in the process that serves requests.
+    
+    Never at import time: `flask routes`, `flask shell` and spawned pool
+    workers (which import the main module as __mp_main__) import the app
+    too, and must not run git pushes or history rewrites.
+    """
+    if not job_queue.threads and __name__ != '__mp_main__':
+        job_queue.start()
+
+@app.before_request
+def start_request_timer():
+    g.timer = PhaseTimer(REQUEST_PHASE_SECONDS, endpoint=request.endpoint or 'unknown')
+
+@app.after_request
+def record_request_timing(response):
+    """Observe the request latency and add a Server-Timing header when enabled."""
+    timer = g.get('timer')
+    if timer is not None:
+        REQUEST_SECONDS.observe(timer.elapsed(), endpoint=request.endpoint or 'unknown',
+                                method=request.method, status=response.status_code)
+        if SERVER_TIMING or request.args.get('debug') == '1':
+            response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
+@app.after_request
+def encode_response(response):
+    """ETag, 304 and compression for complete responses (runs before the timing hook)."""
+    timer = g.get('timer')
+    if timer is None:
+        return finish_response(request, response)
+    with timer.phase('encode'):
+        return finish_response(request, response)
+
+def timed_phase(name):
+    """Decorator that adds the time spent in a function to the current request's phases."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = g.get('timer') if has_request_context() else None
+            if timer is None:
+                return func(*args, **kwargs)
+            with timer.phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
 @app.route('/')
 def index():
     """Main page."""
     return render_template('index.html')
 
+@app.route('/metrics')
+def get_metrics():
+    """Request, scan, subprocess and cache metrics in the Prometheus text format."""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def placeholder_project(project_path, error):
+    """Return a minimal project record for a project whose scan failed."""
+    return {
+        'name': os.path.basename(project_path),
+        'path': project_path,
+        'type': 'Unknown',
+        'language': 'Unknown',
+        'last_modified': 'Unknown',
+        'has_git': os.path.exists(os.path.join(project_path, '.git')),
+        'has_remote': False,
+        'remote_url': '',
+        'is_private': None,
+        'branch': None,
+        'head_commit': None,
+        'readme_exists': False,
+        'gitignore_exists': False,
+        'metadata': {},
+        'metadata_errors': [],
+        'scan_error': error
+    }
+
+def list_project_paths():
+    """Return the sorted list of project directories under PROJECTS_DIR."""
+    return list_projects(PROJECTS_DIR)
+
+def iter_all_projects(project_paths, counters, refresh=False):
+    """Yield project records as they become available.
+
+    Projects served from the scan cache are yielded first, then the rest in
+    the order their parallel scans complete. Each record carries a 'scan'
+    entry with whether it came from the cache, how long the scan took and
+    any error.
+    """
+    signatures = {}
+    to_scan = []
+    
+    for project_path in project_paths:
+        signatures[project_path] = project_signature(project_path)
+        cached = None if refresh else scan_cache.get(project_path, signatures[project_path])
+        record_cache('scan', cached is not None)
+        if cached is not None:
+            counters['hits'] += 1
+            project_info = dict(cached)
+            project_info['scan'] = {'cached': True, 'duration_ms': 0.0, 'error': None}
+            yield project_info
+        else:
+            counters['misses'] += 1
+            to_scan.append(project_path)
+    
+    for result in iter_scan_projects(to_scan, scan_project):
+        project_path = result['path']
+        if result['info'] is not None:
+            scan_cache.put(project_path, result['info'], signatures[project_path])
+            project_info = dict(result['info'])
+        else:
+            project_info = placeholder_project(project_path, result['error'])
+        project_info['scan'] = {
+            'cached': False,
+            'duration_ms': round(result['duration'] * 1000, 1),
+            'error': result['error']
+        }
+        yield project_info
+
+def scan_all_projects(project_paths, counters, refresh=False):
+    """Scan all projects and return their records in the order of project_paths."""
+    projects = {project_info['path']: project_info
+                for project_info in iter_all_projects(project_paths, counters, refresh)}
+    return [projects[project_path] for project_path in project_paths]
+
+def rescan_projects(project_paths):
+    """Rescan projects reported as changed by the project index watcher."""
+    counters = {'hits': 0, 'misses': 0}
+    projects = scan_all_projects(project_paths, counters, refresh=True)
+    scan_cache.save()
+    return projects
+
+def get_project_index():
+    """Return the live project index for PROJECTS_DIR, or None if watching is disabled.
+    
+    The index is created lazily and seeded by the first full scan.
+    """
+    global project_index
+    if not WATCH_PROJECTS:
+        return None
+    with project_index_lock:
+        if project_index is None or project_index.projects_dir != os.path.abspath(PROJECTS_DIR):
+            if project_index is not None:
+                project_index.stop()
+            project_index = ProjectIndex(PROJECTS_DIR, rescan_projects)
+        return project_index
+
+def apply_github_metadata(project_info, meta):
+    """Set visibility and GitHub details on a project record."""
+    if meta:
+        project_info['is_private'] = meta['private']
+        project_info['github'] = {
+            'stars': meta['stars'],
+            'default_branch': meta['default_branch'],
+            'archived': meta['archived']
+        }
+    else:
+        project_info['is_private'] = None
+        project_info['github'] = None
+
+@timed_phase('github')
+def resolve_github_metadata(projects):
+    """Look up GitHub metadata for all projects in one batch and apply it."""
+    repos = {}
+    for project_info in projects:
+        repo_path = parse_github_repo(project_info.get('remote_url'))
+        if repo_path:
+            repos[project_info['name']] = repo_path
+    
+    metadata = github_meta.lookup(repos.values()) if repos else {}
+    for project_info in projects:
+        repo_path = repos.get(project_info['name'])
+        apply_github_metadata(project_info, metadata.get(repo_path) if repo_path else None)
+
+def apply_push_risk(project_info):
+    """Attach the cached large-file audit of a project's HEAD; returns False if it is missing."""
+    head = project_info.get('head_commit')
+    if not project_info.get('has_git') or not head:
+        # Nothing committed yet, so nothing that could fail a push
+        project_info['push_risk'] = None
+        return True
+    summary = large_file_auditor.cached(project_info['path'], head)
+    record_cache('push_risk', summary is not None)
+    # A failed audit is cached too, but has no risk to show
+    project_info['push_risk'] = summary if summary and summary['risk'] else None
+    return summary is not None
+
+def touch_projects(project_paths):
+    """Let polling clients know that response-time data of these projects changed."""
+    if project_index is not None:
+        project_index.touch(project_paths)
+
+@timed_phase('push_risk')
+def resolve_push_risk(projects, prune=False):
+    """Attach push risk to projects and audit the missing ones in the background.
+    
+    Audits run in a process pool and are cached by HEAD commit; clients
+    pick up the results through /api/projects/changes.
+    """
+    missing = [project_info for project_info in projects if not apply_push_risk(project_info)]
+    if missing:
+        repos = [(project_info['path'], project_info['head_commit']) for project_info in projects
+                 if project_info.get('has_git') and project_info.get('head_commit')]
+        large_file_auditor.audit_in_background(repos, touch_projects, prune)
+
+def apply_activity(project_info):
+    """Attach the cached git activity of a project's HEAD; returns False if it is missing.
+    
+    A repository's last_modified becomes its last commit date; the
+    directory mtime from the scan is kept only when there is no commit.
+    """
+    head = project_info.get('head_commit')
+    if not project_info.get('has_git') or not head:
+        project_info['activity'] = None
+        return True
+    activity = activity_tracker.cached(project_info['path'], head)
+    project_info['activity'] = activity
+    record_cache('activity', activity is not None)
+    if activity and activity.get('last_commit_date'):
+        project_info['last_modified'] = activity['last_commit_date']
+    return activity is not None
+
+@timed_phase('activity')
+def resolve_activity(projects, prune=False):
+    """Attach git activity to projects and read the missing ones in the background.
+    
+    Activity is cached by HEAD commit, so only repositories with new
+    commits run git log; clients pick up the results through
+    /api/projects/changes.
+    """
+    missing = [project_info for project_info in projects if not apply_activity(project_info)]
+    if missing:
+        repos = [(project_info['path'], project_info['head_commit']) for project_info in projects
+                 if project_info.get('has_git') and project_info.get('head_commit')]
+        activity_tracker.collect_in_background(repos, touch_projects, prune)
+
+def apply_worktree_status(project_info, expire=True):
+    """Attach the cached working-tree status; returns False if it is missing or stale."""
+    if not project_info.get('has_git'):
+        project_info['worktree'] = None
+        return True
+    status, fresh = status_collector.cached(project_info['path'], expire)
+    record_cache('worktree', fresh)
+    project_info['worktree'] = status
+    return fresh
+
+@timed_phase('worktree')
+def resolve_worktree_status(projects, expire=True):
+    """Attach working-tree status to projects and refresh stale ones in the background.
+    
+    Statuses that changed are reported through the project index, so
+    clients pick them up through /api/projects/changes. Without expire
+    only repositories whose index, HEAD or refs changed are refreshed.
+    """
+    stale = [project_info['path'] for project_info in projects
+             if not apply_worktree_status(project_info, expire)]
+    if stale:
+        status_collector.collect_in_background(stale, touch_projects)
+
+def default_annotation():
+    """Return the annotation used for projects that have not been annotated."""
+    return {
+        'notes': '',
+        'tags': [],
+        'github_created': False,
+        'priority': 'normal'
+    }
+
+@timed_phase('annotations')
+def add_annotations(projects, annotations):
+    """Attach saved annotations (or the default one) to project records."""
+    for project_info in projects:
+        project_info['annotation'] = annotations.get(project_info['name'], default_annotation())
+
+def add_timings(projects):
+    """Attach the latest scan phase and git command times of each project (debug=1)."""
+    for project_info in projects:
+        project_info['timings'] = project_timings.get(project_info['path'])
+
+@timed_phase('scan')
+def load_all_projects(index, counters, refresh=False):
+    """Return every project record, from the live index when it is ready."""
+    if index is not None and index.ready and not refresh:
+        # Served from the live index: no scan work at all
+        seq, projects = index.snapshot()
+        return projects
+    
+    project_paths = list_project_paths()
+    projects = scan_all_projects(project_paths, counters, refresh)
+    scan_cache.prune(project_paths)
+    scan_cache.save()
+    if index is not None:
+        index.seed([dict(project_info) for project_info in projects])
+    return projects
+
+def get_project_catalog(index, counters, refresh=False):
+    """Return the ProjectCatalog of all annotated projects.
+    
+    With a ready live index the catalog is reused until the index sequence
+    or the annotations change, so a page request does no per-project work.
+    """
+    global project_catalog
+    annotations = annotation_store.load()
+    if index is None or not index.ready or refresh:
+        projects = load_all_projects(index, counters, refresh)
+        add_annotations(projects, annotations)
+        resolve_worktree_status(projects)
+        resolve_activity(projects)
+        return ProjectCatalog(projects)
+    
+    with project_catalog_lock:
+        key = (index.seq, annotation_store.version)
+        rebuild = project_catalog is None or project_catalog[:2] != key
+        record_cache('catalog', not rebuild)
+        if rebuild:
+            seq, projects = index.snapshot()
+            add_annotations(projects, annotations)
+            # Statuses only expire by age on the page being viewed (see query_projects)
+            resolve_worktree_status(projects, expire=False)
+            resolve_activity(projects)
+            project_catalog = (seq, key[1], time.monotonic(), ProjectCatalog(projects))
+        elif time.monotonic() - project_catalog[2] > STATUS_TTL:
+            # Every STATUS_TTL the status signatures are compared (stat calls only);
+            # git status runs just for repositories whose index, HEAD or refs changed
+            project_catalog = project_catalog[:2] + (time.monotonic(), project_catalog[3])
+            stale = [project_info['path'] for project_info in project_catalog[3].projects.values()
+                     if project_info.get('has_git')
+                     and not status_collector.cached(project_info['path'], expire=False)[1]]
+            if stale:
+                status_collector.collect_in_background(stale, touch_projects)
+        return project_catalog[3]
+
+def query_projects():
+    """Return one filtered, sorted page of projects with facet counts."""
+    try:
+        query = parse_query(request.args)
+    except QueryError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    counters = {'hits': 0, 'misses': 0}
+    index = get_project_index()
+    catalog = get_project_catalog(index, counters, request.args.get('refresh') == '1')
+    with g.timer.phase('query'):
+        matched, page = catalog.query(query)
+    
+    # Only the visible page is decorated; copies keep the cached records clean
+    page = [dict(project_info) for project_info in page]
+    resolve_github_metadata(page)
+    resolve_push_risk(page)
+    # Catches edits to tracked files, which change no signature, in the repositories on screen
+    resolve_worktree_status(page)
+    if request.args.get('debug') == '1':
+        add_timings(page)
+    
+    response = jsonify({
+        'status': 'success',
+        'total': matched,
+        'offset': query['offset'],
+        'limit': query['limit'],
+        'projects': page,
+        'facets': catalog.facets,
+        'seq': index.seq if index is not None else None
+    })
+    response.headers['X-Scan-Cache-Hits'] = str(counters['hits'])
+    response.headers['X-Scan-Cache-Misses'] = str(counters['misses'])
+    return response
+
 @app.route('/api/projects')
 def get_projects():
-    """Get all projects with their information."""
-    projects = []
-    annotations = load_annotations()
-    
-    for item in sorted(os.listdir(PROJECTS_DIR)):
-        item_path = os.path.join(PROJECTS_DIR, item)
-        if os.path.isdir(item_path) and not item.startswith('.'):
-            project_info = scan_project(item_path)
-            
-            # Add annotations if they exist
-            if project_info['name'] in annotations:
-                project_info['annotation'] = annotations[project_info['name']]
+    """Get all projects with their information.
+    
+    With any of the filter, sort or paging parameters the response is a
+    single page of matching projects together with facet counts. With
+    debug=1 every project gets a 'timings' entry and the response a
+    Server-Timing header.
+    """
+    if any(param in request.args for param in QUERY_PARAMS):
+        return query_projects()
+    
+    annotations = annotation_store.load()
+    refresh = request.args.get('refresh') == '1'
+    counters = {'hits': 0, 'misses': 0}
+    index = get_project_index()
+    projects = load_all_projects(index, counters, refresh)
+    
+    resolve_github_metadata(projects)
+    resolve_push_risk(projects, prune=True)
+    resolve_worktree_status(projects)
+    resolve_activity(projects, prune=True)
+    add_annotations(projects, annotations)
+    if request.args.get('debug') == '1':
+        add_timings(projects)
+    
+    response = jsonify(projects)
+    response.headers['X-Scan-Cache-Hits'] = str(counters['hits'])
+    response.headers['X-Scan-Cache-Misses'] = str(counters['misses'])
+    if index is not None:
+        response.headers['X-Index-Seq'] = str(index.seq)
+    return response
+
+@app.route('/api/projects/changes')
+def get_project_changes():
+    """Return projects changed or removed since a sequence number of the live index."""
+    since = request.args.get('since', 0, type=int)
+    index = get_project_index()
+    
+    if index is None or not index.ready:
+        return jsonify({'status': 'error', 'message': 'Project index is not available'}), 503
+    
+    seq, projects, removed = index.changes_since(since)
+    resolve_github_metadata(projects)
+    resolve_push_risk(projects)
+    resolve_worktree_status(projects)
+    resolve_activity(projects)
+    add_annotations(projects, annotation_store.load())
+    
+    return jsonify({
+        'status': 'success',
+        'seq': seq,
+        # A client ahead of the server saw a previous index and must reload
+        'reset': since > seq,
+        'projects': projects,
+        'removed': removed
+    })
+
+@app.route('/api/projects/stream')
+def stream_projects():
+    """Stream projects as newline-delimited JSON while they are scanned.
+    
+    The stream starts with a 'start' message holding the project count and
+    whether the records come from the ready live index (nothing to scan),
+    then one 'project' message per project. GitHub metadata that is not
+    already cached is resolved in one batch once all scans are done and
+    sent as a 'github' message keyed by project name. A final 'done'
+    message carries the scan cache counters and the index sequence number.
+    """
+    annotations = annotation_store.load()
+    refresh = request.args.get('refresh') == '1'
+    index = get_project_index()
+    use_index = index is not None and index.ready and not refresh
+    
+    if use_index:
+        _, records = index.snapshot()
+        project_paths = [project_info['path'] for project_info in records]
+    else:
+        records = None
+        project_paths = list_project_paths()
+    
+    def generate():
+        counters = {'hits': 0, 'misses': 0}
+        yield json.dumps({'type': 'start', 'total': len(project_paths), 'indexed': use_index}) + '\n'
+        
+        pending_repos = {}
+        scanned = []
+        streamed = []
+        source = iter(records) if use_index else iter_all_projects(project_paths, counters, refresh)
+        
+        for project_info in source:
+            if not use_index:
+                scanned.append(dict(project_info))
+            streamed.append(project_info)
+            apply_push_risk(project_info)
+            apply_worktree_status(project_info)
+            apply_activity(project_info)
+            project_info['annotation'] = annotations.get(project_info['name'], default_annotation())
+            repo_path = parse_github_repo(project_info.get('remote_url'))
+            if repo_path and github_meta.is_fresh(repo_path):
+                apply_github_metadata(project_info, github_meta.cached(repo_path))
             else:
-                project_info['annotation'] = {
-                    'notes': '',
-                    'tags': [],
-                    'github_created': False,
-                    'priority': 'normal'
-                }
-            
-            projects.append(project_info)
+                apply_github_metadata(project_info, None)
+                if repo_path:
+                    pending_repos[project_info['name']] = repo_path
+            yield json.dumps({'type': 'project', 'project': project_info}) + '\n'
+        
+        if pending_repos:
+            metadata = github_meta.lookup(pending_repos.values())
+            updates = {}
+            for name, repo_path in pending_repos.items():
+                project_info = {}
+                apply_github_metadata(project_info, metadata.get(repo_path))
+                updates[name] = project_info
+            yield json.dumps({'type': 'github', 'projects': updates}) + '\n'
+        
+        resolve_push_risk(streamed, prune=True)
+        resolve_worktree_status(streamed)
+        resolve_activity(streamed, prune=True)
+        
+        if not use_index:
+            scan_cache.prune(project_paths)
+            scan_cache.save()
+            if index is not None:
+                index.seed(scanned)
+        yield json.dumps({
+            'type': 'done',
+            'total': len(project_paths),
+            'cache_hits': counters['hits'],
+            'cache_misses': counters['misses'],
+            'seq': index.seq if index is not None else None
+        }) + '\n'
     
-    return jsonify(projects)
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/project/<project_name>/annotate', methods=['POST'])
 def annotate_project(project_name):
     """Save annotation for a project."""
     data = request.json
-    annotations = load_annotations()
     
-    annotations[project_name] = {
+    annotation_store.set(project_name, {
         'notes': data.get('notes', ''),
         'tags': data.get('tags', []),
         'github_created': data.get('github_created', False),
         'priority': data.get('priority', 'normal')
-    }
+    })
     
-    save_annotations(annotations)
     return jsonify({'status': 'success'})
 
+@app.route('/api/project/<project_name>/metadata', methods=['GET'])
+def get_project_metadata(project_name):
+    """Return a project's .project-meta.json contents and any problems with it."""
+    project_path = os.path.join(PROJECTS_DIR, project_name)
+    
+    if not os.path.isdir(project_path):
+        return jsonify({'status': 'error', 'message': 'Project not found'}), 404
+    
+    metadata, errors = metadata_store.load(project_path)
+    return jsonify({'status': 'success', 'metadata': metadata, 'errors': errors})
+
 @app.route('/api/project/<project_name>/metadata', methods=['POST'])
 def save_project_metadata(project_name):
     """Save project-specific metadata to .project-meta.json file."""
-    data = request.json
+    data = request.get_json(silent=True)
     project_path = os.path.join(PROJECTS_DIR, project_name)
     
     if not os.path.exists(project_path):
         return jsonify({'status': 'error', 'message': 'Project not found'}), 404
-    
-    meta_file = os.path.join(project_path, '.project-meta.json')
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'message': 'Metadata must be a JSON object'}), 400
     
     try:
-        # Load existing metadata
-        existing_meta = load_project_metadata(project_path)
-        
-        # Update with new data
-        existing_meta.update(data)
-        
-        # Save to file
-        with open(meta_file, 'w') as f:
-            json.dump(existing_meta, f, indent=2)
-        
-        return jsonify({'status': 'success', 'message': 'Metadata saved'})
-    except Exception as e:
+        metadata = metadata_store.update(project_path, data)
+    except MetadataError as e:
+        return jsonify({'status': 'error', 'message': str(e), 'errors': e.errors}), 400
+    except OSError as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
-
-@app.route('/api/project/<project_name>/create-github', methods=['POST'])
-def create_github_repo(project_name):
-    """Create GitHub repository for a project."""
-    data = request.json
-    private = data.get('private', False)
     
+    return jsonify({'status': 'success', 'message': 'Metadata saved', 'metadata': metadata})
+
+def mark_github_created(project_name):
+    """Record in the annotations that a project has a GitHub repository."""
+    annotation_store.update(project_name, github_created=True)
+
+def create_github_job(ctx, project_name, private=False):
+    """Job: create a GitHub repository for a project and push it."""
     project_path = os.path.join(PROJECTS_DIR, project_name)
     
-    if not os.path.exists(project_path):
-        return jsonify({'status': 'error', 'message': 'Project not found'}), 404
+    # Check if git repo exists
+    if not os.path.exists(os.path.join(project_path, '.git')):
+        # Initialize git repo
+        ctx.run(['git', 'init'], project_path, check=True)
+        ctx.run(['git', 'add', '.'], project_path, check=True)
+        ctx.run(['git', 'commit', '-m', 'Initial commit'], project_path, check=True)
     
-    try:
-        # Check if git repo exists
-        if not os.path.exists(os.path.join(project_path, '.git')):
-            # Initialize git repo
-            subprocess.run(['git', 'init'], cwd=project_path, check=True)
-            subprocess.run(['git', 'add', '.'], cwd=project_path, check=True)
-            subprocess.run(['git', 'commit', '-m', 'Initial commit'], cwd=project_path, check=True)
-        
-        # Create GitHub repo with source flag to set it as origin and push
-        visibility = '--private' if private else '--public'
-        cmd = ['gh', 'repo', 'create', project_name, visibility, '--source', '.', '--push']
-        
-        print(f"Running command: {' '.join(cmd)}")
-        result = subprocess.run(cmd, cwd=project_path, capture_output=True, text=True)
-        print(f"Return code: {result.returncode}")
-        print(f"Stdout: {result.stdout}")
-        print(f"Stderr: {result.stderr}")
-        
-        if result.returncode == 0:
-            
-            # Update annotations
-            annotations = load_annotations()
-            if project_name not in annotations:
-                annotations[project_name] = {}
-            annotations[project_name]['github_created'] = True
-            save_annotations(annotations)
-            
-            return jsonify({'status': 'success', 'message': 'GitHub repository created'})
-        else:
-            error_msg = result.stderr if result.stderr else result.stdout
-            if 'already exists' in error_msg or 'repository-exists' in error_msg:
-                # Try to link existing repo
-                print(f"Repository already exists, attempting to link and push...")
-                return link_existing_github_repo(project_name, project_path)
-            return jsonify({'status': 'error', 'message': error_msg}), 400
-            
-    except subprocess.CalledProcessError as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    # Create GitHub repo with source flag to set it as origin and push
+    visibility = '--private' if private else '--public'
+    cmd = ['gh', 'repo', 'create', project_name, visibility, '--source', '.', '--push']
+    returncode, output = ctx.run(cmd, project_path)
+    
+    if returncode == 0:
+        mark_github_created(project_name)
+        return 'GitHub repository created'
+    
+    if 'already exists' in output or 'repository-exists' in output:
+        # Try to link existing repo
+        ctx.log("Repository already exists, attempting to link and push...")
+        return link_existing_github_repo(ctx, project_name, project_path)
+    raise JobError(output)
 
-def link_existing_github_repo(project_name, project_path):
+def link_existing_github_repo(ctx, project_name, project_path):
     """Link to existing GitHub repository."""
-    try:
-        # Get current user's GitHub username
-        user_result = subprocess.run(['gh', 'api', 'user', '-q', '.login'], 
-                                   capture_output=True, text=True)
-        if user_result.returncode != 0:
-            return jsonify({'status': 'error', 'message': 'Could not get GitHub username'}), 500
-        
-        username = user_result.stdout.strip()
-        print(f"GitHub username: {username}")
-        
-        # Remove existing remote if it exists
-        remote_check = subprocess.run(['git', 'remote', 'get-url', 'origin'], 
-                                    cwd=project_path, capture_output=True, text=True)
-        
-        if remote_check.returncode == 0:
-            print(f"Removing existing remote: {remote_check.stdout.strip()}")
-            subprocess.run(['git', 'remote', 'remove', 'origin'], cwd=project_path)
-        
-        # Add the correct remote
-        remote_url = f'https://github.com/{username}/{project_name}.git'
-        print(f"Adding remote: {remote_url}")
-        subprocess.run(['git', 'remote', 'add', 'origin', remote_url], 
-                     cwd=project_path, check=True)
-        
-        # Check which branch we're on
-        branch_result = subprocess.run(['git', 'branch', '--show-current'], 
-                                     cwd=project_path, capture_output=True, text=True)
-        current_branch = branch_result.stdout.strip()
-        
-        if not current_branch:
-            # No branch yet, create main
-            subprocess.run(['git', 'checkout', '-b', 'main'], cwd=project_path)
-            current_branch = 'main'
-        
-        print(f"Current branch: {current_branch}")
-        
-        # Check if remote has any commits
-        remote_refs = subprocess.run(['git', 'ls-remote', 'origin'], 
-                                   cwd=project_path, capture_output=True, text=True)
-        
-        if remote_refs.stdout.strip():
-            # Remote has commits, try to pull first
-            print("Remote has commits, attempting to pull...")
-            pull_result = subprocess.run(['git', 'pull', 'origin', current_branch, '--allow-unrelated-histories'], 
-                                       cwd=project_path, capture_output=True, text=True)
-            
-            if pull_result.returncode != 0 and current_branch == 'main':
-                # Try master if main fails
-                pull_result = subprocess.run(['git', 'pull', 'origin', 'master', '--allow-unrelated-histories'], 
-                                           cwd=project_path, capture_output=True, text=True)
-        
-        # Now push (force if needed for empty repos)
-        print(f"Pushing to origin/{current_branch}...")
-        push_result = subprocess.run(['git', 'push', '-u', 'origin', current_branch], 
-                                   cwd=project_path, capture_output=True, text=True)
-        
-        if push_result.returncode != 0 and not remote_refs.stdout.strip():
-            # Empty remote, force push
-            print("Empty remote detected, force pushing...")
-            push_result = subprocess.run(['git', 'push', '-u', 'origin', current_branch, '--force'], 
-                                       cwd=project_path, capture_output=True, text=True)
+    # Get current user's GitHub username
+    returncode, username = ctx.run(['gh', 'api', 'user', '-q', '.login'], project_path)
+    if returncode != 0:
+        raise JobError('Could not get GitHub username')
+    username = username.strip()
+    
+    # Remove existing remote if it exists
+    returncode, _ = ctx.run(['git', 'remote', 'get-url', 'origin'], project_path)
+    if returncode == 0:
+        ctx.run(['git', 'remote', 'remove', 'origin'], project_path)
+    
+    # Add the correct remote
+    remote_url = f'https://github.com/{username}/{project_name}.git'
+    ctx.run(['git', 'remote', 'add', 'origin', remote_url], project_path, check=True)
+    
+    # Check which branch we're on
+    _, current_branch = ctx.run(['git', 'branch', '--show-current'], project_path)
+    current_branch = current_branch.strip()
+    
+    if not current_branch:
+        # No branch yet, create main
+        ctx.run(['git', 'checkout', '-b', 'main'], project_path)
+        current_branch = 'main'
+    
+    # Check if remote has any commits
+    _, remote_refs = ctx.run(['git', 'ls-remote', 'origin'], project_path)
+    
+    if remote_refs.strip():
+        # Remote has commits, try to pull first
+        ctx.log("Remote has commits, attempting to pull...")
+        returncode, _ = ctx.run(['git', 'pull', 'origin', current_branch, '--allow-unrelated-histories'],
+                                project_path)
         
-        if push_result.returncode == 0:
-            # Update annotations
-            annotations = load_annotations()
-            if project_name not in annotations:
-                annotations[project_name] = {}
-            annotations[project_name]['github_created'] = True
-            save_annotations(annotations)
-            
-            return jsonify({'status': 'success', 'message': 'Linked to existing GitHub repository and pushed code'})
-        else:
-            return jsonify({'status': 'error', 'message': f'Could not push to existing repo: {push_result.stderr}'}), 400
-            
-    except subprocess.CalledProcessError as e:
-        return jsonify({'status': 'error', 'message': f'Error linking to existing repo: {str(e)}'}), 500
+        if returncode != 0 and current_branch == 'main':
+            # Try master if main fails
+            ctx.run(['git', 'pull', 'origin', 'master', '--allow-unrelated-histories'], project_path)
+    
+    # Now push (force if needed for empty repos)
+    returncode, output = ctx.run(['git', 'push', '-u', 'origin', current_branch], project_path)
+    
+    if returncode != 0 and not remote_refs.strip():
+        # Empty remote, force push
+        ctx.log("Empty remote detected, force pushing...")
+        returncode, output = ctx.run(['git', 'push', '-u', 'origin', current_branch, '--force'],
+                                     project_path)
+    
+    if returncode != 0:
+        raise JobError(f'Could not push to existing repo: {output}')
+    
+    mark_github_created(project_name)
+    return 'Linked to existing GitHub repository and pushed code'
+
+def init_git_job(ctx, project_name):
+    """Job: initialize a git repository and commit the existing files."""
+    project_path = os.path.join(PROJECTS_DIR, project_name)
+    ctx.run(['git', 'init'], project_path, check=True)
+    
+    # Check if there are files to commit
+    _, status = ctx.run(['git', 'status', '--porcelain'], project_path, check=True)
+    
+    if status.strip():
+        ctx.run(['git', 'add', '.'], project_path, check=True)
+        ctx.run(['git', 'commit', '-m', 'Initial commit'], project_path, check=True)
+    
+    return 'Git repository initialized'
+
+def clean_history_job(ctx, project_name, size_limit_mb=None, patterns=(), dry_run=True):
+    """Job: drop large or matching files from a project's git history."""
+    project_path = os.path.join(PROJECTS_DIR, project_name)
+    try:
+        report = clean_history(project_path, size_limit_mb, patterns, dry_run, log=ctx.log)
+    except CleanupError as e:
+        raise JobError(str(e))
+    
+    size = format_size(report['dropped_bytes'])
+    if dry_run:
+        return f"Would drop {report['dropped_blobs']} file version(s) ({size}) from {report['commits']} commits"
+    return f"Dropped {report['dropped_blobs']} file version(s) ({size}); push with --force to update the remote"
+
+job_queue.register('create-github', create_github_job)
+job_queue.register('init-git', init_git_job)
+job_queue.register('clean-history', clean_history_job)
+
+def queue_job(kind, project_name, message, **params):
+    """Queue a job for a project and return the 202 response with its id."""
+    if not os.path.exists(os.path.join(PROJECTS_DIR, project_name)):
+        return jsonify({'status': 'error', 'message': 'Project not found'}), 404
+    
+    job = job_queue.submit(kind, project_name, **params)
+    return jsonify({'status': 'success', 'message': message, 'job_id': job['id']}), 202
+
+@app.route('/api/project/<project_name>/create-github', methods=['POST'])
+def create_github_repo(project_name):
+    """Create GitHub repository for a project in a background job."""
+    data = request.json or {}
+    private = bool(data.get('private', False))
+    return queue_job('create-github', project_name, 'GitHub repository creation queued', private=private)
 
 @app.route('/api/project/<project_name>/init-git', methods=['POST'])
 def init_git(project_name):
-    """Initialize git repository for a project."""
+    """Initialize git repository for a project in a background job."""
+    return queue_job('init-git', project_name, 'Git initialization queued')
+
+@app.route('/api/project/<project_name>/clean-history', methods=['POST'])
+def clean_project_history(project_name):
+    """Remove large files from a project's history in a background job.
+    
+    JSON body: size_limit_mb, patterns (list of globs) and dry_run
+    (default true, so the first call only reports what would be dropped).
+    """
+    data = request.json or {}
+    size_limit_mb = data.get('size_limit_mb')
+    patterns = data.get('patterns') or []
+    
+    # bool is an int subclass, so True would otherwise pass as 1
+    if size_limit_mb is not None and (isinstance(size_limit_mb, bool)
+                                      or not isinstance(size_limit_mb, (int, float)) or size_limit_mb <= 0):
+        return jsonify({'status': 'error', 'message': 'size_limit_mb must be a positive number'}), 400
+    if size_limit_mb is None and not patterns:
+        return jsonify({'status': 'error', 'message': 'Give size_limit_mb or patterns'}), 400
     project_path = os.path.join(PROJECTS_DIR, project_name)
+    if os.path.exists(project_path) and not os.path.exists(os.path.join(project_path, '.git')):
+        return jsonify({'status': 'error', 'message': 'Not a git repository'}), 400
     
-    if not os.path.exists(project_path):
-        return jsonify({'status': 'error', 'message': 'Project not found'}), 404
+    dry_run = data.get('dry_run', True) is not False
+    message = 'History cleanup dry run queued' if dry_run else 'History cleanup queued'
+    return queue_job('clean-history', project_name, message, size_limit_mb=size_limit_mb,
+                     patterns=[str(pattern) for pattern in patterns], dry_run=dry_run)
+
+@app.route('/api/jobs')
+def list_jobs():
+    """List recent jobs (without logs), optionally for one project."""
+    return jsonify({'status': 'success', 'jobs': job_queue.list(request.args.get('project'))})
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Return a job's status, message and captured output."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify({'status': 'success', 'job': job})
+
+@app.route('/api/jobs/<job_id>/stream')
+def stream_job(job_id):
+    """Stream a job's output as server-sent events.
     
-    try:
-        subprocess.run(['git', 'init'], cwd=project_path, check=True)
-        
-        # Check if there are files to commit
-        status = subprocess.run(['git', 'status', '--porcelain'], 
-                              cwd=project_path, capture_output=True, text=True)
-        
-        if status.stdout.strip():
-            subprocess.run(['git', 'add', '.'], cwd=project_path, check=True)
-            subprocess.run(['git', 'commit', '-m', 'Initial commit'], 
-                         cwd=project_path, check=True)
-        
-        return jsonify({'status': 'success', 'message': 'Git repository initialized'})
-        
-    except subprocess.CalledProcessError as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+    Each output line is sent as a 'log' event; a final 'done' event carries
+    the finished job record.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    
+    def generate():
+        for event, data in job_queue.follow(job_id):
+            if event == 'keepalive':
+                yield ': keepalive\n\n'
+            else:
+                yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/project/<project_name>/open-vscode', methods=['POST'])
 def open_in_vscode(project_name):
@@ -416,12 +928,32 @@ def open_in_vscode(project_name):
 
 @app.route('/api/project/<project_name>/files')
 def get_project_files(project_name):
-    """Get file tree for a project."""
+    """Get file tree for a project.
+    
+    With a 'path' (or 'lazy') query parameter only that directory level is
+    returned, paginated with 'cursor' and 'limit'. Without it the whole tree
+    up to depth 5 is returned as before.
+    """
     project_path = os.path.join(PROJECTS_DIR, project_name)
     
     if not os.path.exists(project_path):
         return jsonify({'status': 'error', 'message': 'Project not found'}), 404
     
+    if 'path' in request.args or 'lazy' in request.args:
+        limit = max(1, min(request.args.get('limit', 200, type=int), 1000))
+        try:
+            listing = list_directory(project_path, request.args.get('path', ''),
+                                     request.args.get('cursor'), limit)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'Invalid path'}), 403
+        except NotADirectoryError:
+            return jsonify({'status': 'error', 'message': 'Path is not a directory'}), 400
+        except FileNotFoundError:
+            return jsonify({'status': 'error', 'message': 'Directory not found'}), 404
+        except PermissionError:
+            return jsonify({'status': 'error', 'message': 'Permission denied'}), 403
+        return jsonify({'status': 'success', 'path': request.args.get('path', ''), **listing})
+    
     def build_tree(path, base_path, max_depth=5, current_depth=0):
         """Build file tree structure."""
         if current_depth >= max_depth:
@@ -430,17 +962,13 @@ def get_project_files(project_name):
         items = []
         try:
             for item in sorted(os.listdir(path)):
-                if item.startswith('.'):
+                # Skip hidden entries and dependency/build directories
+                if is_skipped(item):
                     continue
                     
                 item_path = os.path.join(path, item)
                 relative_path = os.path.relpath(item_path, base_path)
                 
-                # Skip certain directories
-                if item in ['node_modules', '__pycache__', 'dist', 'build', '.git', 
-                           'venv', 'env', '.venv', 'target', '.idea', '.vscode']:
-                    continue
-                
                 if os.path.isdir(item_path):
                     children = build_tree(item_path, base_path, max_depth, current_depth + 1)
                     if children is not None:
@@ -486,41 +1014,38 @@ def get_file_content(project_name, file_path):
     # Get file info
     file_size = os.path.getsize(full_path)
     mime_type, _ = mimetypes.guess_type(full_path)
+    # Classify by content (first few KB only, cached per path/size/mtime)
+    sniff = sniff_file(full_path)
     
-    # Don't read files larger than 1MB
-    if file_size > 1024 * 1024:
+    if sniff['binary']:
         return jsonify({
             'status': 'success',
             'content': None,
-            'message': 'File too large to display',
+            'message': 'Binary file',
+            'format': sniff['format'],
             'size': file_size,
             'mime_type': mime_type
         })
     
-    # Check if it's a binary file
-    is_binary = mime_type and (
-        mime_type.startswith('image/') or 
-        mime_type.startswith('video/') or
-        mime_type.startswith('audio/') or
-        mime_type.startswith('application/') and not mime_type.endswith('json')
-    )
-    
-    if is_binary:
+    # Don't read files larger than 1MB
+    if file_size > 1024 * 1024:
         return jsonify({
             'status': 'success',
             'content': None,
-            'message': 'Binary file',
+            'message': 'File too large to display',
+            'encoding': sniff['encoding'],
             'size': file_size,
             'mime_type': mime_type
         })
     
     try:
-        with open(full_path, 'r', encoding='utf-8') as f:
+        with open(full_path, 'r', encoding=sniff['encoding']) as f:
             content = f.read()
         
         return jsonify({
             'status': 'success',
             'content': content,
+            'encoding': sniff['encoding'],
             'size': file_size,
             'mime_type': mime_type or 'text/plain'
         })
@@ -533,5 +1058,151 @@ def get_file_content(project_name, file_path):
             'mime_type': mime_type
         })
 
+def resolve_project_file(project_name, file_path):
+    """Return the absolute path of a file inside a project, or None if it escapes the project."""
+    project_path = os.path.abspath(os.path.join(PROJECTS_DIR, project_name))
+    full_path = os.path.abspath(os.path.join(project_path, file_path))
+    if not full_path.startswith(project_path + os.sep):
+        return None
+    return full_path
+
+@app.route('/api/project/<project_name>/view/<path:file_path>')
+def view_file_range(project_name, file_path):
+    """Get a range of a file by line ('start_line', 'lines') or by byte ('offset', 'length')."""
+    full_path = resolve_project_file(project_name, file_path)
+    
+    if full_path is None:
+        return jsonify({'status': 'error', 'message': 'Invalid file path'}), 403
+    
+    if not os.path.exists(full_path):
+        return jsonify({'status': 'error', 'message': 'File not found'}), 404
+    
+    if os.path.isdir(full_path):
+        return jsonify({'status': 'error', 'message': 'Path is a directory'}), 400
+    
+    sniff = sniff_file(full_path)
+    if sniff['binary']:
+        return jsonify({
+            'status': 'success',
+            'binary': True,
+            'message': 'Binary file',
+            'format': sniff['format'],
+            'size': os.path.getsize(full_path)
+        })
+    
+    if 'offset' in request.args:
+        data, size = read_byte_range(full_path, request.args.get('offset', 0, type=int),
+                                     request.args.get('length', 64 * 1024, type=int))
+        offset = min(max(0, request.args.get('offset', 0, type=int)), size)
+        return jsonify({
+            'status': 'success',
+            'content': data.decode(sniff['encoding'], errors='replace'),
+            'offset': offset,
+            'next_offset': offset + len(data),
+            'size': size,
+            'eof': offset + len(data) >= size
+        })
+    
+    count = max(1, min(request.args.get('lines', 500, type=int), 5000))
+    try:
+        result = read_line_range(full_path, request.args.get('start_line', 0, type=int), count,
+                                 sniff['encoding'])
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'success', 'binary': False, 'encoding': sniff['encoding'], **result})
+
+@app.route('/api/project/<project_name>/raw/<path:file_path>')
+def get_raw_file(project_name, file_path):
+    """Stream a file as-is, with HTTP Range and ETag support."""
+    full_path = resolve_project_file(project_name, file_path)
+    
+    if full_path is None:
+        return jsonify({'status': 'error', 'message': 'Invalid file path'}), 403
+    
+    if not os.path.isfile(full_path):
+        return jsonify({'status': 'error', 'message': 'File not found'}), 404
+    
+    mime_type, _ = mimetypes.guess_type(full_path)
+    # Never let project files run as active content in the viewer's origin
+    if not mime_type or mime_type.startswith('text/') or mime_type in (
+            'application/javascript', 'image/svg+xml', 'application/xhtml+xml'):
+        mime_type = 'text/plain'
+    
+    response = send_file(full_path, mimetype=mime_type, conditional=True, etag=True)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/api/project/<project_name>/large-files')
+def get_large_files(project_name):
+    """List blobs over limit_mb (default 50) anywhere in a project's git history."""
+    project_path = os.path.join(PROJECTS_DIR, project_name)
+    
+    if not os.path.exists(project_path):
+        return jsonify({'status': 'error', 'message': 'Project not found'}), 404
+    if not os.path.exists(os.path.join(project_path, '.git')):
+        return jsonify({'status': 'error', 'message': 'Not a git repository'}), 400
+    
+    size_limit_mb = max(0, request.args.get('limit_mb', 50, type=int))
+    try:
+        audit = audit_history(project_path, size_limit_mb)
+    except RuntimeError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    return jsonify({'status': 'success', 'limit_mb': size_limit_mb, **audit})
+
+def get_code_search_index():
+    """Return the code search index, refreshing it in the background when due."""
+    global code_search_index
+    with project_index_lock:
+        if code_search_index is None or code_search_index.projects_dir != PROJECTS_DIR:
+            code_search_index = CodeSearchIndex(SEARCH_INDEX_FILE, PROJECTS_DIR)
+        index = code_search_index
+    
+    last_indexed = index.last_indexed
+    if not index.indexing and (last_indexed is None or time.time() - last_indexed > SEARCH_REINDEX_INTERVAL):
+        threading.Thread(target=index.update, name='code-search-index', daemon=True).start()
+    return index
+
+@app.route('/api/search')
+def search_code():
+    """Search the text files of all projects.
+    
+    Query parameters: 'q' (required), 'regex=1' to treat q as a regular
+    expression, 'case=1' for a case-sensitive search, 'project' to limit the
+    search to one project and 'limit' for the maximum number of hits.
+    """
+    query = request.args.get('q', '')
+    is_regex = request.args.get('regex') == '1'
+    
+    if not is_regex and len(query) < 3:
+        return jsonify({'status': 'error', 'message': 'Query must be at least 3 characters'}), 400
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Query is required'}), 400
+    
+    index = get_code_search_index()
+    limit = max(1, min(request.args.get('limit', 200, type=int), 1000))
+    start = time.perf_counter()
+    
+    try:
+        hits, stats = index.search(query, is_regex, request.args.get('case') == '1',
+                                   request.args.get('project'), limit)
+    except re.error as e:
+        return jsonify({'status': 'error', 'message': f'Invalid regular expression: {e}'}), 400
+    
+    return jsonify({
+        'status': 'success',
+        'query': query,
+        'hits': hits,
+        'candidates': stats['candidates'],
+        'scanned': stats['scanned'],
+        'truncated': stats['truncated'],
+        'indexing': index.indexing,
+        'indexed_files': index.file_count(),
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+    })
+
 if __name__ == '__main__':
+    # Resume queued jobs at startup in the serving process, not in the reloader's parent
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_queue.start()
     app.run(debug=True, port=5000, host='127.0.0.1')
\ No newline at end of file
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Benchmark the viewer's endpoints on a synthetic projects directory
+
+A reproducible dev tree is generated from a seed: projects of several
+kinds with nested sources, dependency directories (virtualenvs,
+node_modules, target), metadata files, real and fake .git directories and
+sparse large files. A stub `gh` is put first on PATH and GitHub metadata
+is served by the local fake API, so nothing touches the network. The
+Flask endpoints are then driven through the test client and, for every
+scenario, latency percentiles, file and subprocess counts, read/write
+syscalls and peak Python memory are written to a JSON results file.
+Pass --compare with an earlier results file to see what changed.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import resource
+import tracemalloc
+import subprocess
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = "benchmark_results.json"
+RESULTS_VERSION = 1
+GITHUB_OWNER = 'bench-user'
+
+# (kind, marker file, source extension, dependency directory)
+PROJECT_KINDS = [
+    ('python', 'requirements.txt', '.py', 'venv'),
+    ('node', 'package.json', '.js', 'node_modules'),
+    ('rust', 'Cargo.toml', '.rs', 'target'),
+    ('go', 'go.mod', '.go', None),
+    ('docs', None, '.md', None),
+]
+
+# Audit events counted while a scenario runs
+AUDIT_EVENTS = {
+    'open': 'opens',
+    'os.scandir': 'scandirs',
+    'os.listdir': 'listdirs',
+    'subprocess.Popen': 'subprocesses',
+}
+
+GH_STUB = """#!/bin/sh
+# Stand-in for the GitHub CLI: logs every call and answers what the viewer asks
+echo "$*" >> "$GH_STUB_LOG"
+case "$1 $2" in
+    "auth token") echo fake-token ;;
+    "api user") echo %s ;;
+esac
+exit 0
+""" % GITHUB_OWNER
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='bench', GIT_AUTHOR_EMAIL='bench@example.com',
+               GIT_COMMITTER_NAME='bench', GIT_COMMITTER_EMAIL='bench@example.com',
+               GIT_AUTHOR_DATE='2024-01-01T00:00:00', GIT_COMMITTER_DATE='2024-01-01T00:00:00')
+
+
+def write_source_file(path, rng, lines):
+    with open(path, 'w') as f:
+        for _ in range(lines):
+            f.write(f"def func_{rng.randrange(10 ** 6)}(value):  # {rng.random():.6f}\n")
+
+
+def write_source_tree(root, rng, depth, files, ext):
+    """Write files at every level of a binary directory tree of the given depth."""
+    os.makedirs(root, exist_ok=True)
+    for i in range(files):
+        write_source_file(os.path.join(root, f'file_{i}{ext}'), rng, rng.randint(5, 200))
+    if depth > 1:
+        for child in ('core', 'util'):
+            write_source_tree(os.path.join(root, child), rng, depth - 1, files, ext)
+
+
+def write_fake_git(project_path, rng, name):
+    """Create a .git directory that git_reader can read but git itself cannot use."""
+    git_dir = os.path.join(project_path, '.git')
+    os.makedirs(os.path.join(git_dir, 'refs', 'heads'))
+    os.makedirs(os.path.join(git_dir, 'objects'))
+    with open(os.path.join(git_dir, 'HEAD'), 'w') as f:
+        f.write('ref: refs/heads/main\n')
+    with open(os.path.join(git_dir, 'refs', 'heads', 'main'), 'w') as f:
+        f.write('%040x\n' % rng.getrandbits(160))
+    with open(os.path.join(git_dir, 'config'), 'w') as f:
+        f.write('[core]\n\trepositoryformatversion = 0\n'
+                f'[remote "origin"]\n\turl = https://github.com/{GITHUB_OWNER}/{name}.git\n')
+
+
+def write_real_git(project_path, name):
+    """Initialize a git repository and commit the project with fixed dates."""
+    def git(*args):
+        subprocess.run(['git'] + list(args), cwd=project_path, env=GIT_ENV, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    git('-c', 'init.defaultBranch=main', 'init', '-q')
+    git('remote', 'add', 'origin', f'git@github.com:{GITHUB_OWNER}/{name}.git')
+    git('add', '-A')
+    git('commit', '-q', '-m', 'Initial commit')
+
+
+def build_dev_tree(root, projects=100, depth=3, files=10, seed=1, real_git=0.1,
+                   large_every=25, large_mb=60):
+    """Generate a reproducible projects directory; returns a summary of what was built."""
+    rng = random.Random(seed)
+    summary = {'projects': projects, 'real_git': 0, 'fake_git': 0, 'large_files': 0}
+    real_git_count = int(projects * real_git)
+    for i in range(projects):
+        name = f'project-{i:04d}'
+        kind, marker, ext, deps = PROJECT_KINDS[i % len(PROJECT_KINDS)]
+        project_path = os.path.join(root, name)
+        write_source_tree(os.path.join(project_path, 'src'), rng, depth, files, ext)
+        if marker:
+            with open(os.path.join(project_path, marker), 'w') as f:
+                f.write(f'# {kind} project {name}\n')
+        if i % 3 != 2:
+            with open(os.path.join(project_path, 'README.md'), 'w') as f:
+                f.write(f'# {name}\n')
+        with open(os.path.join(project_path, '.gitignore'), 'w') as f:
+            f.write('venv/\nnode_modules/\ntarget/\n*.bin\n')
+        if deps:
+            for package in range(10):
+                write_source_tree(os.path.join(project_path, deps, f'pkg_{package}'), rng, 1, files, ext)
+        if i % 3 == 0:
+            meta = {'description': f'Synthetic {kind} project', 'status': 'active', 'technologies': [kind]}
+            if i % 17 == 0:
+                meta['status'] = 'unknown'  # exercises per-project validation errors
+            with open(os.path.join(project_path, '.project-meta.json'), 'w') as f:
+                json.dump(meta, f)
+        if large_every and i % large_every == large_every - 1:
+            # Sparse, so it costs no disk space
+            with open(os.path.join(project_path, 'dataset.bin'), 'wb') as f:
+                f.truncate(large_mb * 1024 * 1024)
+            summary['large_files'] += 1
+        if i < real_git_count:
+            write_real_git(project_path, name)
+            summary['real_git'] += 1
+        elif i % 5 != 4:
+            write_fake_git(project_path, rng, name)
+            summary['fake_git'] += 1
+
+    file_count = 0
+    total_bytes = 0
+    for dirpath, _, filenames in os.walk(root):
+        file_count += len(filenames)
+        for filename in filenames:
+            total_bytes += os.lstat(os.path.join(dirpath, filename)).st_blocks * 512
+    summary['files'] = file_count
+    summary['disk_bytes'] = total_bytes
+    return summary
+
+
+def install_gh_stub(bin_dir, log_file):
+    os.makedirs(bin_dir, exist_ok=True)
+    gh_path = os.path.join(bin_dir, 'gh')
+    with open(gh_path, 'w') as f:
+        f.write(GH_STUB)
+    os.chmod(gh_path, 0o755)
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+    os.environ['GH_STUB_LOG'] = log_file
+
+
+class Counters:
+    """Counts audit events (file opens, directory listings, subprocesses) while active."""
+
+    def __init__(self):
+        self.active = False
+        self.counts = dict.fromkeys(AUDIT_EVENTS.values(), 0)
+        sys.addaudithook(self.hook)
+
+    def hook(self, event, args):
+        if self.active:
+            key = AUDIT_EVENTS.get(event)
+            if key:
+                self.counts[key] += 1
+
+    def reset(self):
+        self.counts = dict.fromkeys(AUDIT_EVENTS.values(), 0)
+
+
+def read_proc_io():
+    """Return read/write syscall counts of this process, or None off Linux."""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return {'read_syscalls': int(fields['syscr']), 'write_syscalls': int(fields['syscw'])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def measure(func, iterations, counters, settle=None):
+    """Run func iterations times; returns latency, counts, syscalls and peak memory."""
+    latencies = []
+    errors = 0
+    counters.reset()
+    io_before = read_proc_io()
+    for _ in range(iterations):
+        counters.active = True
+        start = time.perf_counter()
+        ok = func()
+        latencies.append((time.perf_counter() - start) * 1000)
+        counters.active = False
+        errors += 0 if ok else 1
+        if settle:
+            settle()
+    io_after = read_proc_io()
+
+    # One more call under tracemalloc, which would distort the timings above
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if settle:
+        settle()
+
+    result = {
+        'iterations': iterations,
+        'errors': errors,
+        'latency_ms': {
+            'min': round(min(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3),
+            'mean': round(sum(latencies) / len(latencies), 3)
+        },
+        'per_call': {key: round(count / iterations, 1) for key, count in counters.counts.items()},
+        'peak_alloc_kb': round(peak / 1024, 1)
+    }
+    if io_before and io_after:
+        # Includes the settle waits and background threads of the app
+        for key in io_before:
+            result['per_call'][key] = round((io_after[key] - io_before[key]) / iterations, 1)
+    return result
+
+
+def load_app(dev_dir, work_dir, github_url, watch):
+    """Import the viewer with its caches in work_dir and PROJECTS_DIR set to dev_dir."""
+    os.environ['GITHUB_API_URL'] = github_url
+    os.environ.pop('GITHUB_TOKEN', None)
+    os.environ.pop('GH_TOKEN', None)
+    os.environ['PROJECT_VIEWER_WATCH'] = '1' if watch else '0'
+    os.chdir(work_dir)
+    sys.path.insert(0, SCRIPT_DIR)
+    import github_meta
+    github_meta.GITHUB_API_URL = github_url  # read when the app creates its backend
+    import app as viewer
+    viewer.PROJECTS_DIR = dev_dir
+    return viewer
+
+
+def wait_idle(viewer, timeout=300):
+    """Wait until the app's background work (audits, status, activity, indexing) is done."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        index = viewer.code_search_index
+        busy = (viewer.large_file_auditor.running or viewer.status_collector.running
+                or viewer.activity_tracker.running or (index is not None and index.indexing))
+        if not busy:
+            return
+        time.sleep(0.05)
+
+
+def build_scenarios(viewer, client, dev_dir):
+    """Return {name: (callable returning success, settle after each call)}."""
+    names = sorted(os.listdir(dev_dir))
+    # One source file per project: (project name, path relative to the project)
+    files = [(name, 'src/' + min(filename for filename in os.listdir(os.path.join(dev_dir, name, 'src'))
+                                 if filename.startswith('file_')))
+             for name in names]
+    counter = {'i': 0}
+
+    def rotate(items):
+        counter['i'] += 1
+        return items[counter['i'] % len(items)]
+
+    def get(url):
+        def call():
+            response = client.get(url)
+            response.get_data()  # drain streamed responses
+            return response.status_code == 200
+        return call
+
+    def scan_project():
+        viewer.scan_project(os.path.join(dev_dir, rotate(names)))
+        return True
+
+    def file_tree():
+        return client.get(f'/api/project/{rotate(names)}/files').status_code == 200
+
+    def file_content():
+        name, path = rotate(files)
+        return client.get(f'/api/project/{name}/file/{path}').status_code == 200
+
+    def settle():
+        wait_idle(viewer)
+
+    return {
+        'projects_refresh': (get('/api/projects?refresh=1'), settle),
+        'projects_full': (get('/api/projects'), None),
+        'projects_page': (get('/api/projects?limit=60'), None),
+        'projects_query': (get('/api/projects?q=project-00&status=no-readme&sort=-activity&limit=60'), None),
+        'projects_stream': (get('/api/projects/stream'), None),
+        'scan_project': (scan_project, None),
+        'file_tree': (file_tree, None),
+        'file_content': (file_content, None),
+        'code_search': (get('/api/search?q=func_12&limit=50'), None),
+    }
+
+
+def compare(previous, current):
+    """Print p50/p90 changes of every scenario present in both result files."""
+    print(f"\n{'Scenario':<18} {'p50 before':>11} {'p50 now':>10} {'change':>8} {'p90 before':>11} {'p90 now':>10}")
+    print('-' * 74)
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        old, new = before['latency_ms'], result['latency_ms']
+        change = (new['p50'] - old['p50']) / old['p50'] * 100 if old['p50'] else 0
+        print(f"{name:<18} {old['p50']:>8.2f} ms {new['p50']:>7.2f} ms {change:>+7.1f}% "
+              f"{old['p90']:>8.2f} ms {new['p90']:>7.2f} ms")
+
+
+def git_revision():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                            capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the project viewer on a synthetic projects directory.')
+    parser.add_argument('--projects', type=int, default=100, help='number of projects (default: 100)')
+    parser.add_argument('--depth', type=int, default=3, help='source directory depth (default: 3)')
+    parser.add_argument('--files', type=int, default=10, help='files per directory (default: 10)')
+    parser.add_argument('--real-git', type=float, default=0.1,
+                        help='fraction of projects that are real git repositories (default: 0.1)')
+    parser.add_argument('--large-every', type=int, default=25,
+                        help='every Nth project gets a large sparse file, 0 for none (default: 25)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the generated tree (default: 1)')
+    parser.add_argument('--iterations', type=int, default=20, help='calls per scenario (default: 20)')
+    parser.add_argument('--scenario', action='append', help='only run this scenario (can be repeated)')
+    parser.add_argument('--watch', action='store_true', help='enable the live project index')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'results file (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--compare', metavar='RESULTS', help='compare with an earlier results file')
+    parser.add_argument('--keep', metavar='DIR', help='build the tree in DIR and keep it afterwards')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+    revision = git_revision()
+
+    root = os.path.abspath(args.keep) if args.keep else tempfile.mkdtemp(prefix='viewer-bench-')
+    dev_dir = os.path.join(root, 'dev')
+    work_dir = os.path.join(root, 'work')
+    os.makedirs(work_dir, exist_ok=True)
+    install_gh_stub(os.path.join(root, 'bin'), os.path.join(root, 'gh-calls.log'))
+
+    from github_meta import FakeGitHubServer
+    try:
+        print(f"Building {args.projects} projects in {dev_dir}...")
+        start = time.perf_counter()
+        if os.path.isdir(dev_dir):
+            shutil.rmtree(dev_dir)
+        os.makedirs(dev_dir)
+        tree = build_dev_tree(dev_dir, args.projects, args.depth, args.files, args.seed,
+                              args.real_git, args.large_every)
+        tree['build_seconds'] = round(time.perf_counter() - start, 2)
+        print(f"{tree['files']} files, {tree['real_git']} real and {tree['fake_git']} fake git "
+              f"repositories in {tree['build_seconds']}s\n")
+
+        repos = {f'{GITHUB_OWNER}/project-{i:04d}': {'private': i % 2 == 0, 'stars': i}
+                 for i in range(args.projects)}
+        github = FakeGitHubServer(repos).start()
+        counters = Counters()
+        viewer = load_app(dev_dir, work_dir, github.url, args.watch)
+        client = viewer.app.test_client()
+
+        # Warm everything up once: scan cache, background audits, search index
+        client.get('/api/projects')
+        viewer.get_code_search_index()
+        wait_idle(viewer)
+
+        results = {}
+        print(f"{'Scenario':<18} {'p50':>9} {'p90':>9} {'p99':>9} {'opens':>7} {'procs':>6} {'peak KB':>9}")
+        print('-' * 73)
+        for name, (func, settle) in build_scenarios(viewer, client, dev_dir).items():
+            if args.scenario and name not in args.scenario:
+                continue
+            result = measure(func, args.iterations, counters, settle)
+            results[name] = result
+            latency = result['latency_ms']
+            print(f"{name:<18} {latency['p50']:>6.2f} ms {latency['p90']:>6.2f} ms {latency['p99']:>6.2f} ms "
+                  f"{result['per_call']['opens']:>7} {result['per_call']['subprocesses']:>6} "
+                  f"{result['peak_alloc_kb']:>9}" + (f"  ({result['errors']} errors)" if result['errors'] else ''))
+        github.stop()
+
+        report = {
+            'version': RESULTS_VERSION,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': revision,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'compare', 'keep')},
+            'tree': tree,
+            'github_requests': len(github.requests),
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'scenarios': results
+        }
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {output}")
+        if previous:
+            compare(previous, report)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark language detection against the previous os.walk implementation
+on a synthetic large project tree
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from language_detect import LANG_MAP, detect_language
+
+
+def legacy_detect_language(project_path):
+    """The os.walk based detection scan_project() used before language_detect.py."""
+    language = "Unknown"
+    ext_counts = {}
+    for root, _, files in os.walk(project_path):
+        # Skip hidden directories
+        if '/.git' in root or '/node_modules' in root:
+            continue
+        for file in files[:100]:  # Limit to first 100 files for performance
+            _, ext = os.path.splitext(file.lower())
+            if ext in LANG_MAP:
+                ext_counts[ext] = ext_counts.get(ext, 0) + 1
+    if ext_counts:
+        primary_ext = max(ext_counts, key=lambda k: ext_counts.get(k, 0))
+        if primary_ext in LANG_MAP:
+            language = LANG_MAP[primary_ext]
+    return language
+
+
+def write_files(directory, count, ext, content=b'x\n'):
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(directory, f'file_{i}{ext}'), 'wb') as f:
+            f.write(content)
+
+
+def build_synthetic_project(root, scale=1):
+    """Create a Rust project with a Python virtualenv, build output and a .git dir."""
+    # The project's own code: Rust sources spread over a few modules
+    for module in range(10):
+        write_files(os.path.join(root, 'src', f'module_{module}'), 30 * scale, '.rs')
+    write_files(os.path.join(root, 'scripts'), 5, '.py')
+    # Noise the detector must not descend into
+    for package in range(40 * scale):
+        write_files(os.path.join(root, 'venv', 'lib', 'site-packages', f'pkg_{package}'), 50, '.py')
+    for crate in range(20 * scale):
+        write_files(os.path.join(root, 'target', 'debug', 'build', f'crate_{crate}'), 50, '.rs')
+    for package in range(20 * scale):
+        write_files(os.path.join(root, 'node_modules', f'pkg_{package}'), 50, '.js')
+    write_files(os.path.join(root, '.git', 'objects', 'ab'), 200, '')
+
+
+def time_call(func, *args, repeat=5):
+    """Return (best wall-clock seconds, result) over repeat runs."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    root = tempfile.mkdtemp(prefix='lang-bench-')
+    try:
+        print(f"Building synthetic project (scale {scale}) in {root}...")
+        build_synthetic_project(root, scale)
+        total_files = sum(len(files) for _, _, files in os.walk(root))
+        print(f"Tree contains {total_files} files\n")
+
+        runs = [
+            ('legacy os.walk', legacy_detect_language, (root,)),
+            ('scandir + pruning', detect_language, (root,)),
+            ('scandir, byte-weighted', detect_language, (root, None, True)),
+        ]
+        baseline = None
+        print(f"{'Implementation':<26} {'Best time':>12} {'Speedup':>9}  Language")
+        print("-" * 64)
+        for label, func, args in runs:
+            elapsed, language = time_call(func, *args)
+            baseline = baseline or elapsed
+            print(f"{label:<26} {elapsed * 1000:>9.2f} ms {baseline / elapsed:>8.1f}x  {language}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,37 @@
 #!/usr/bin/env python3
 """
 Check for large files in a git repository that might cause push issues
+
+The default mode checks the tracked files in the working tree. The
+--history mode sizes every blob reachable from any ref, including files
+that were deleted long ago but still break pushes, in one streaming pass
+over `git rev-list --objects --all | git cat-file --batch-check`.
+The --all mode runs that audit for every git repository under a projects
+directory in a thread pool and rates each one's push risk.
 """
 
 import os
 import sys
+import time
+import heapq
+import tempfile
+import threading
 import subprocess
+from functools import partial
+
+from scan_cache import ScanCache
+from scanner import iter_scan_projects
+from git_reader import read_repo_info
+from project_index import list_projects
+from metrics import record_subprocess
+
+MAX_RESULTS = 1000  # largest blobs kept by the history audit
+LARGE_FILES_CACHE_FILE = "large_files_cache.json"
+PUSH_BLOCK_MB = 100  # GitHub rejects pushes containing a larger blob
+PUSH_WARN_MB = 50  # GitHub warns about blobs over this size
+FLEET_TOP_N = 5  # largest blobs kept per project by the fleet audit
+FLEET_TIMEOUT = 600
+FLEET_RETRY = 3600  # seconds before an audit that timed out is tried again at the same HEAD
 
 def format_size(bytes):
     """Format bytes to human readable size."""
@@ -49,13 +75,299 @@ def check_large_files(repo_path, size_limit_mb=50):
     
     return large_files
 
+def iter_history_blobs(repo_path, timeout=None):
+    """Yield (sha, size, path) for every blob reachable from any ref.
+    
+    rev-list feeds cat-file directly, so only one line at a time is held
+    in memory no matter how many objects the repository has. Raises
+    RuntimeError if git fails, or RuntimeError('timeout') if the git
+    processes were killed after timeout seconds.
+    """
+    # stderr goes to a file: a pipe nobody reads until the end could fill up and stall rev-list
+    errors = tempfile.TemporaryFile()
+    rev_list = subprocess.Popen(['git', 'rev-list', '--objects', '--all'],
+                                cwd=repo_path, stdout=subprocess.PIPE, stderr=errors)
+    cat_file = subprocess.Popen(['git', 'cat-file', '--batch-check=%(objecttype) %(objectname) %(objectsize) %(rest)'],
+                                cwd=repo_path, stdin=rev_list.stdout, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+    rev_list.stdout.close()  # cat-file owns the pipe now
+    killed = threading.Event()
+    
+    def kill():
+        killed.set()
+        cat_file.kill()
+        rev_list.kill()
+    
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer:
+        timer.start()
+    try:
+        for line in cat_file.stdout:
+            fields = line.rstrip(b'\n').split(b' ', 3)
+            if fields[0] != b'blob':
+                continue
+            path = fields[3].decode('utf-8', errors='replace') if len(fields) > 3 else ''
+            yield fields[1].decode('ascii'), int(fields[2]), path
+    finally:
+        if timer:
+            timer.cancel()
+        cat_file.stdout.close()
+        cat_file.wait()
+        rev_list.wait()
+        errors.seek(0)
+        error = errors.read().decode('utf-8', errors='replace').strip()
+        errors.close()
+    if killed.is_set():
+        raise RuntimeError('timeout')
+    if rev_list.returncode != 0 or cat_file.returncode != 0:
+        raise RuntimeError(error or 'Not a git repository or git command failed')
+
+def tracked_blobs(repo_path, shas):
+    """Return the subset of blob shas that are in the index (the current checkout)."""
+    found = set()
+    ls_files = subprocess.Popen(['git', 'ls-files', '-s'], cwd=repo_path,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    for line in ls_files.stdout:
+        # <mode> SP <sha> SP <stage> TAB <path>
+        sha = line.split(b' ', 2)[1].decode('ascii')
+        if sha in shas:
+            found.add(sha)
+    ls_files.stdout.close()
+    ls_files.wait()
+    return found
+
+def audit_history(repo_path, size_limit_mb=50, max_results=MAX_RESULTS, timeout=None):
+    """Find blobs larger than size_limit_mb anywhere in a repository's history.
+    
+    Returns a dict with the largest blobs ('files', at most max_results,
+    largest first), the number of blobs over the limit, and the number and
+    total size of all blobs. Each file has path, sha, size and 'tracked'
+    (False when the blob only exists in history). The git commands are
+    killed after timeout seconds.
+    """
+    limit = size_limit_mb * 1024 * 1024
+    largest = []  # min-heap of (size, sha, path), bounded by max_results
+    over_limit = 0
+    blobs = 0
+    blob_bytes = 0
+    
+    for sha, size, path in iter_history_blobs(repo_path, timeout):
+        blobs += 1
+        blob_bytes += size
+        if size <= limit:
+            continue
+        over_limit += 1
+        if len(largest) < max_results:
+            heapq.heappush(largest, (size, sha, path))
+        else:
+            heapq.heappushpop(largest, (size, sha, path))
+    
+    largest.sort(reverse=True)
+    tracked = tracked_blobs(repo_path, {sha for _, sha, _ in largest}) if largest else set()
+    return {
+        'files': [{
+            'path': path,
+            'sha': sha,
+            'size': size,
+            'size_formatted': format_size(size),
+            'tracked': sha in tracked
+        } for size, sha, path in largest],
+        'over_limit': over_limit,
+        'blobs': blobs,
+        'blob_bytes': blob_bytes
+    }
+
+def push_risk(largest_size):
+    """Rate how likely a push is to fail from the size of the largest blob."""
+    if largest_size >= PUSH_BLOCK_MB * 1024 * 1024:
+        return 'high'
+    if largest_size >= PUSH_WARN_MB * 1024 * 1024:
+        return 'medium'
+    return 'none'
+
+def audit_project(repo_path, size_limit_mb=PUSH_WARN_MB, top_n=FLEET_TOP_N, timeout=None):
+    """Audit one repository's history and return a compact summary for the fleet view."""
+    audit = audit_history(repo_path, size_limit_mb, max_results=top_n, timeout=timeout)
+    largest_size = audit['files'][0]['size'] if audit['files'] else 0
+    return {
+        'risk': push_risk(largest_size),
+        'largest_size': largest_size,
+        'over_limit': audit['over_limit'],
+        'files': audit['files'],
+        'blobs': audit['blobs'],
+        'blob_bytes': audit['blob_bytes']
+    }
+
+class FleetAuditor:
+    """Audits many repositories in a thread pool, caching results by HEAD commit.
+    
+    Results are stored in a ScanCache file whose signature is the HEAD
+    commit plus the audit settings, so an unchanged repository is never
+    audited twice. The work happens in git subprocesses, so threads are
+    enough; unlike pool processes they import nothing, and an audit that
+    runs past FLEET_TIMEOUT has its git processes killed.
+    """
+    
+    def __init__(self, cache_file, size_limit_mb=PUSH_WARN_MB, top_n=FLEET_TOP_N, workers=None):
+        self.cache = ScanCache(cache_file)
+        self.size_limit_mb = size_limit_mb
+        self.top_n = top_n
+        self.workers = workers or os.cpu_count() or 4
+        self.running = False
+        self.lock = threading.Lock()
+        self.timeouts = {}  # repo_path -> (head, time) of an audit that timed out
+    
+    def signature(self, head):
+        return [head, self.size_limit_mb, self.top_n]
+    
+    def cached(self, repo_path, head):
+        """Return the cached summary for a repository at this HEAD, or None.
+        
+        An audit that timed out at this HEAD less than FLEET_RETRY seconds
+        ago counts as known, so it is not restarted on every request.
+        """
+        if not head:
+            return None
+        summary = self.cache.get(repo_path, self.signature(head))
+        if summary is None:
+            timeout = self.timeouts.get(repo_path)
+            if timeout and timeout[0] == head and time.monotonic() - timeout[1] < FLEET_RETRY:
+                return {'risk': None, 'error': 'timeout'}
+        return summary
+    
+    def audit(self, repos, prune=False):
+        """Audit (repo_path, head) pairs that have no cached result.
+        
+        Returns {repo_path: summary}. A repository whose audit failed gets
+        a summary with risk None and an 'error'. With prune, cache entries
+        for repositories not in repos are dropped.
+        """
+        results = {}
+        heads = {}
+        for repo_path, head in repos:
+            summary = self.cached(repo_path, head)
+            if summary is None:
+                heads[repo_path] = head
+            else:
+                results[repo_path] = summary
+        
+        audit_func = partial(audit_project, size_limit_mb=self.size_limit_mb, top_n=self.top_n,
+                             timeout=FLEET_TIMEOUT)
+        for result in iter_scan_projects(list(heads), audit_func, workers=self.workers,
+                                         mode='thread', timeout=FLEET_TIMEOUT):
+            repo_path = result['path']
+            # One audit runs several git commands; their total is recorded as one
+            record_subprocess('large-file audit', result['duration'], result['info'] is not None, repo_path)
+            if result['info'] is None:
+                results[repo_path] = {'risk': None, 'error': result['error']}
+                if result['error'] == 'timeout':
+                    self.timeouts[repo_path] = (heads[repo_path], time.monotonic())
+                elif heads[repo_path]:
+                    # A history git cannot read stays unreadable until HEAD moves
+                    self.cache.put(repo_path, results[repo_path], self.signature(heads[repo_path]))
+                continue
+            if heads[repo_path]:
+                self.cache.put(repo_path, result['info'], self.signature(heads[repo_path]))
+            results[repo_path] = result['info']
+        
+        if prune:
+            self.cache.prune([repo_path for repo_path, _ in repos])
+        self.cache.save()
+        return results
+    
+    def audit_in_background(self, repos, on_done=None, prune=False):
+        """Run audit() in a thread unless one is already running.
+        
+        on_done is called with the paths of the repositories that were audited.
+        """
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        stale = [repo_path for repo_path, head in repos if self.cached(repo_path, head) is None]
+        
+        def run():
+            try:
+                self.audit(repos, prune)
+                if on_done:
+                    on_done(stale)
+            except Exception as e:
+                print(f"Large file audit failed: {e}")
+            finally:
+                with self.lock:
+                    self.running = False
+        
+        threading.Thread(target=run, name='large-file-audit', daemon=True).start()
+
+def print_fleet_audit(projects_dir, size_limit_mb):
+    repos = []
+    for project_path in list_projects(projects_dir):
+        info = read_repo_info(project_path)
+        if info is not None:
+            repos.append((project_path, info['head']))
+    
+    print(f"Auditing {len(repos)} repositories in {projects_dir} for blobs larger than {size_limit_mb} MB...")
+    auditor = FleetAuditor(LARGE_FILES_CACHE_FILE, size_limit_mb)
+    results = auditor.audit(repos, prune=True)
+    
+    order = {'high': 0, 'medium': 1, 'none': 2, None: 3}
+    print("-" * 72)
+    for repo_path, summary in sorted(results.items(),
+                                     key=lambda item: (order[item[1]['risk']], -item[1].get('largest_size', 0))):
+        name = os.path.basename(repo_path)
+        if summary['risk'] is None:
+            print(f"{'error':<7} | {name}: {summary['error']}")
+            continue
+        if not summary['over_limit']:
+            print(f"{summary['risk']:<7} | {name}: no blobs over {size_limit_mb} MB")
+            continue
+        print(f"{summary['risk']:<7} | {name}: {summary['over_limit']} blob(s) over {size_limit_mb} MB, "
+              f"largest {format_size(summary['largest_size'])}")
+        for file in summary['files']:
+            where = 'tracked' if file['tracked'] else 'history only'
+            print(f"        |   {file['size_formatted']:>10} {where:<12} {file['path']}")
+    print("-" * 72)
+    print(f"Push risk: 'high' has a blob over {PUSH_BLOCK_MB} MB, which GitHub rejects; "
+          f"'medium' has one over {PUSH_WARN_MB} MB.")
+
+def print_history_audit(repo_path, size_limit_mb):
+    print(f"Checking history for blobs larger than {size_limit_mb} MB in {repo_path}...")
+    try:
+        audit = audit_history(repo_path, size_limit_mb)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    print(f"Scanned {audit['blobs']:,} blobs ({format_size(audit['blob_bytes'])})")
+    if not audit['files']:
+        print(f"No blobs larger than {size_limit_mb} MB found in history.")
+        return
+    
+    print(f"\nFound {audit['over_limit']} large blob(s):")
+    print("-" * 60)
+    for file in audit['files']:
+        where = 'tracked' if file['tracked'] else 'history only'
+        print(f"{file['size_formatted']:>10} | {file['sha'][:10]} | {where:<12} | {file['path']}")
+    print("-" * 60)
+    print("\nBlobs marked 'history only' were deleted but are still pushed with the history.")
+    print("Remove them from the history (e.g. with fix_large_repo.sh) before pushing.")
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python check_large_files.py <repo_path> [size_limit_mb]")
+    args = [arg for arg in sys.argv[1:] if arg not in ('--history', '--all')]
+    if not args:
+        print("Usage: python check_large_files.py <repo_path> [size_limit_mb] [--history]")
+        print("       python check_large_files.py <projects_dir> [size_limit_mb] --all")
         sys.exit(1)
     
-    repo_path = sys.argv[1]
-    size_limit_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    repo_path = args[0]
+    size_limit_mb = int(args[1]) if len(args) > 1 else 50
+    
+    if '--all' in sys.argv:
+        print_fleet_audit(os.path.expanduser(repo_path), size_limit_mb)
+        return
+    if '--history' in sys.argv:
+        print_history_audit(repo_path, size_limit_mb)
+        return
     
     print(f"Checking for files larger than {size_limit_mb} MB in {repo_path}...")
     
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Remove large files from a repository's history in place
+
+History is rewritten by streaming `git fast-export --no-data` through a
+filter into `git fast-import` in the same repository. Because the export
+refers to blobs by sha instead of carrying their content, no file data is
+copied; only commits and trees are rewritten. Files above a size limit or
+matching glob patterns are dropped from every commit of the local branches
+and tags. The working tree is left alone: dropped files that are still on
+disk simply become untracked.
+"""
+
+import os
+import sys
+import time
+import fnmatch
+import argparse
+import threading
+import subprocess
+
+from check_large_files import iter_history_blobs, format_size
+
+MAX_REPORTED = 1000  # dropped blobs listed in the report
+SUBMODULE_MODE = b'160000'
+# --use-done-feature makes fast-import reject a stream cut short by a failed export
+EXPORT_ARGS = ['git', 'fast-export', '--no-data', '--use-done-feature', '--signed-tags=strip',
+               '--tag-of-filtered-object=rewrite', '--branches', '--tags']
+
+C_ESCAPES = {b'a': 7, b'b': 8, b't': 9, b'n': 10, b'v': 11, b'f': 12, b'r': 13, b'"': 34, b'\\': 92}
+
+
+class CleanupError(Exception):
+    """Raised when a repository cannot be cleaned."""
+
+
+def unquote_path(raw):
+    """Decode a path from a fast-export stream, undoing git's C-style quoting."""
+    if not raw.startswith(b'"'):
+        return raw.decode('utf-8', errors='replace')
+    raw = raw[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        if raw[i:i + 1] == b'\\':
+            escape = raw[i + 1:i + 2]
+            if escape in C_ESCAPES:
+                out.append(C_ESCAPES[escape])
+                i += 2
+                continue
+            # Octal escape for non-ASCII bytes, e.g. \303\251
+            out.append(int(raw[i + 1:i + 4], 8))
+            i += 4
+            continue
+        out.append(raw[i])
+        i += 1
+    return out.decode('utf-8', errors='replace')
+
+
+def drain(stream):
+    """Read a pipe to the end in a thread, so the writer never blocks on a full pipe.
+
+    Returns (thread, chunks); the data is in chunks once the thread is joined.
+    """
+    chunks = []
+    thread = threading.Thread(target=lambda: chunks.append(stream.read()), daemon=True)
+    thread.start()
+    return thread, chunks
+
+
+def read_drained(drained):
+    thread, chunks = drained
+    thread.join()
+    return b''.join(chunks).decode('utf-8', errors='replace').strip()
+
+
+def git(repo_path, args, check=True):
+    result = subprocess.run(['git'] + args, cwd=repo_path, capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise CleanupError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def blob_sizes(repo_path, shas):
+    """Return {sha: size} for the given blobs with one cat-file call."""
+    if not shas:
+        return {}
+    result = subprocess.run(['git', 'cat-file', '--batch-check=%(objectname) %(objectsize)'],
+                            cwd=repo_path, input='\n'.join(shas) + '\n',
+                            capture_output=True, text=True)
+    sizes = {}
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[1].isdigit():
+            sizes[fields[0]] = int(fields[1])
+    return sizes
+
+
+class HistoryFilter:
+    """Drops file entries from a fast-export stream by blob sha or path pattern."""
+
+    def __init__(self, drop_shas, patterns):
+        self.drop_shas = drop_shas
+        self.patterns = list(patterns)
+        self.commits = 0
+        self.dropped = {}  # sha -> first path it was dropped at
+        self.dropped_entries = 0
+
+    def matches(self, sha, path):
+        if sha in self.drop_shas:
+            return True
+        name = path.rsplit('/', 1)[-1]
+        return any(fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(name, pattern)
+                   for pattern in self.patterns)
+
+    def run(self, src, dst):
+        """Copy the stream from src to dst, leaving out dropped filemodify lines."""
+        for line in iter(src.readline, b''):
+            if line.startswith(b'data '):
+                # Commit and tag messages: copy the payload verbatim, it may
+                # contain lines that look like commands
+                dst.write(line)
+                dst.write(src.read(int(line[5:])))
+                continue
+            if line.startswith(b'M '):
+                mode, sha, raw_path = line[2:].rstrip(b'\n').split(b' ', 2)
+                if mode != SUBMODULE_MODE:
+                    sha = sha.decode('ascii')
+                    path = unquote_path(raw_path)
+                    if self.matches(sha, path):
+                        self.dropped_entries += 1
+                        self.dropped.setdefault(sha, path)
+                        continue
+            elif line.startswith(b'commit '):
+                self.commits += 1
+            dst.write(line)
+
+
+def find_large_blobs(repo_path, size_limit_mb):
+    """Return the set of blob shas larger than size_limit_mb anywhere in history."""
+    limit = size_limit_mb * 1024 * 1024
+    return {sha for sha, size, _ in iter_history_blobs(repo_path) if size > limit}
+
+
+def backup_refs(repo_path):
+    """Save every branch and tag position so the rewrite can be undone with update-ref."""
+    git_dir = git(repo_path, ['rev-parse', '--absolute-git-dir']).strip()
+    backup_file = os.path.join(git_dir, f"clean-history-{time.strftime('%Y%m%d-%H%M%S')}.refs")
+    refs = git(repo_path, ['for-each-ref', '--format=%(objectname) %(refname)', 'refs/heads', 'refs/tags'])
+    with open(backup_file, 'w') as f:
+        f.write(refs)
+    return backup_file
+
+
+def clean_history(repo_path, size_limit_mb=None, patterns=(), dry_run=False, gc=False, log=print):
+    """Drop large or matching files from the history of a repository's branches and tags.
+
+    Returns a report dict. With dry_run the stream is filtered but nothing
+    is written. Raises CleanupError if the repository cannot be cleaned.
+    """
+    if size_limit_mb is None and not patterns:
+        raise CleanupError('Nothing to remove: give a size limit or a pattern')
+    if not os.path.exists(os.path.join(repo_path, '.git')):
+        raise CleanupError('Not a git repository')
+    if not dry_run and git(repo_path, ['status', '--porcelain', '--untracked-files=no']).strip():
+        raise CleanupError('Working tree has uncommitted changes; commit or stash them first')
+
+    drop_shas = set()
+    if size_limit_mb is not None:
+        log(f"Finding blobs larger than {size_limit_mb} MB...")
+        try:
+            drop_shas = find_large_blobs(repo_path, size_limit_mb)
+        except RuntimeError as e:
+            raise CleanupError(str(e))
+        log(f"Found {len(drop_shas)} large blob(s)")
+
+    history_filter = HistoryFilter(drop_shas, patterns)
+    backup_file = None
+    log("Dry run: filtering history without writing" if dry_run else "Rewriting history...")
+
+    if not dry_run:
+        backup_file = backup_refs(repo_path)
+    export = subprocess.Popen(EXPORT_ARGS, cwd=repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    export_errors = drain(export.stderr)
+    if dry_run:
+        sink = open(os.devnull, 'wb')
+        target = None
+    else:
+        target = subprocess.Popen(['git', 'fast-import', '--force', '--quiet'], cwd=repo_path,
+                                  stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        target_errors = drain(target.stderr)
+        sink = target.stdin
+    try:
+        with sink:
+            history_filter.run(export.stdout, sink)
+    finally:
+        export.stdout.close()
+        export.wait()
+    # Sizes are looked up before a gc can prune the dropped blobs
+    dropped_shas = list(history_filter.dropped)[:MAX_REPORTED]
+    sizes = blob_sizes(repo_path, dropped_shas)
+    export_error = read_drained(export_errors)
+    if export.returncode != 0:
+        raise CleanupError(export_error or 'git fast-export failed')
+    if target is not None:
+        target.wait()
+        target_error = read_drained(target_errors)
+        if target.returncode != 0:
+            raise CleanupError(target_error or 'git fast-import failed')
+        # Point the index at the rewritten HEAD; dropped files stay on disk, untracked
+        git(repo_path, ['reset', '--quiet'])
+        if gc:
+            log("Expiring reflogs and pruning unreachable objects...")
+            git(repo_path, ['reflog', 'expire', '--expire=now', '--all'])
+            git(repo_path, ['gc', '--prune=now', '--quiet'])
+
+    dropped = sorted(({'sha': sha, 'path': history_filter.dropped[sha], 'size': sizes.get(sha)}
+                      for sha in dropped_shas),
+                     key=lambda blob: blob['size'] or 0, reverse=True)
+    report = {
+        'dry_run': dry_run,
+        'commits': history_filter.commits,
+        'dropped_blobs': len(history_filter.dropped),
+        'dropped_entries': history_filter.dropped_entries,
+        'dropped_bytes': sum(blob['size'] or 0 for blob in dropped),
+        'dropped': dropped,
+        'backup': backup_file
+    }
+
+    for blob in dropped:
+        size = format_size(blob['size']) if blob['size'] is not None else '?'
+        log(f"{size:>10} | {blob['sha'][:10]} | {blob['path']}")
+    verb = 'Would drop' if dry_run else 'Dropped'
+    log(f"{verb} {report['dropped_blobs']} blob(s), {format_size(report['dropped_bytes'])}, "
+        f"from {report['commits']} commit(s)")
+    if backup_file:
+        log(f"Previous branch and tag positions saved to {backup_file}")
+        if not gc:
+            log("Old objects stay in .git until 'git reflog expire --expire=now --all && git gc --prune=now'")
+        log("Pushing the rewritten branches requires 'git push --force'")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove large files from a repository's history in place.")
+    parser.add_argument('repo_path')
+    parser.add_argument('--size', type=int, metavar='MB', help='drop blobs larger than this many MB')
+    parser.add_argument('--pattern', action='append', default=[],
+                        help='drop files whose path or name matches this glob (can be repeated)')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be dropped')
+    parser.add_argument('--gc', action='store_true',
+                        help='expire reflogs and prune the old objects afterwards (cannot be undone)')
+    args = parser.parse_args()
+
+    try:
+        clean_history(args.repo_path, args.size, args.pattern, args.dry_run, args.gc)
+    except CleanupError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Cross-project code search backed by a persistent trigram index
+
+Every text file under PROJECTS_DIR (skipping the same directories as the
+file browser) is indexed by the set of lower-cased byte trigrams it
+contains. A query is turned into required trigrams, the index narrows the
+search to candidate files, and only those are scanned with the real regex.
+Candidates are found by starting from the rarest trigram (or the files of
+the requested project) and checking the remaining trigrams only for the
+files still left, so common trigrams never have their posting lists read
+in full. The index lives in SQLite and is updated incrementally by size
+and mtime.
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import threading
+
+from file_tree import is_skipped
+from file_sniff import sniff_file
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+MAX_FILE_SIZE = 1024 * 1024  # larger files are not indexed
+MAX_LINE_LENGTH = 300  # longest line excerpt returned per hit
+COUNT_LIMIT = 5000  # posting list sizes are only counted up to this when ordering trigrams
+SQL_BATCH = 500  # ids per IN (...) clause
+MAX_SCAN_FILES = 2000  # candidate files read per search; a regex without literals matches every file
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    indexed INTEGER NOT NULL,  -- 0 for binary or wide-encoded files, kept to skip them cheaply
+    UNIQUE (project, path)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    trigram INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (trigram, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+"""
+
+
+def trigrams(data):
+    """Return the set of trigram keys of lower-cased bytes."""
+    data = data.lower()
+    return {int.from_bytes(data[i:i + 3], 'big') for i in range(len(data) - 2)}
+
+
+def required_literals(pattern, is_regex):
+    """Return literal strings that every match of the query must contain.
+
+    For regexes only top-level runs of literal characters are used; an
+    alternation or anything else the parser does not understand gives no
+    constraint (every file is a candidate).
+    """
+    if not is_regex:
+        return [pattern]
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, OverflowError):
+        return []
+    literals = []
+    current = []
+    for op, arg in parsed:
+        if op is sre_constants.LITERAL:
+            current.append(chr(arg))
+        elif op is sre_constants.SUBPATTERN and arg[-1] and all(
+                sub_op is sre_constants.LITERAL for sub_op, _ in arg[-1]):
+            current.extend(chr(sub_arg) for _, sub_arg in arg[-1])
+        else:
+            if current:
+                literals.append(''.join(current))
+            current = []
+    if current:
+        literals.append(''.join(current))
+    return literals
+
+
+def iter_text_files(project_path):
+    """Yield (relative path, size, mtime_ns) of indexable files in a project."""
+    pending = [project_path]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if is_skipped(entry.name):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if st.st_size <= MAX_FILE_SIZE:
+                    yield os.path.relpath(entry.path, project_path), st.st_size, st.st_mtime_ns
+
+
+class CodeSearchIndex:
+    """Trigram index over every project under projects_dir."""
+
+    def __init__(self, db_file, projects_dir):
+        self.db_file = db_file
+        self.projects_dir = projects_dir
+        self.indexing = False
+        self.last_indexed = None
+        self.lock = threading.Lock()
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def file_count(self):
+        """Return the number of searchable (text) files in the index."""
+        with self.connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM files WHERE indexed = 1').fetchone()[0]
+
+    def update(self):
+        """Bring the index up to date, re-reading only new or modified files.
+
+        Returns a dict with counts of indexed, unchanged and removed files.
+        """
+        stats = {'indexed': 0, 'unchanged': 0, 'removed': 0}
+        with self.lock:
+            if self.indexing:
+                return stats
+            self.indexing = True
+        try:
+            try:
+                names = os.listdir(self.projects_dir)
+            except OSError as e:
+                # Keep the existing index rather than treating every project as removed
+                print(f"Code search indexing skipped: {e}")
+                return stats
+            conn = self.connect()
+            try:
+                projects = sorted(name for name in names if not name.startswith('.')
+                                  and os.path.isdir(os.path.join(self.projects_dir, name)))
+                for project in projects:
+                    self.update_project(conn, project, stats)
+                placeholders = ','.join('?' * len(projects))
+                stale = conn.execute(
+                    f'SELECT id FROM files WHERE project NOT IN ({placeholders})',
+                    projects).fetchall()
+                self.delete_files(conn, [row[0] for row in stale])
+                stats['removed'] += len(stale)
+                conn.commit()
+            finally:
+                conn.close()
+            self.last_indexed = time.time()
+        finally:
+            with self.lock:
+                self.indexing = False
+        return stats
+
+    def update_project(self, conn, project, stats):
+        """Re-index the changed files of one project in a single transaction."""
+        project_path = os.path.join(self.projects_dir, project)
+        known = {path: (file_id, size, mtime) for file_id, path, size, mtime in conn.execute(
+            'SELECT id, path, size, mtime FROM files WHERE project = ?', (project,))}
+        seen = set()
+
+        for rel_path, size, mtime in iter_text_files(project_path):
+            seen.add(rel_path)
+            previous = known.get(rel_path)
+            if previous and previous[1] == size and previous[2] == mtime:
+                stats['unchanged'] += 1
+                continue
+            full_path = os.path.join(project_path, rel_path)
+            try:
+                sniff = sniff_file(full_path)
+                indexable = not sniff['binary'] and sniff['encoding'] not in ('utf-16', 'utf-32')
+                data = b''
+                if indexable:
+                    with open(full_path, 'rb') as f:
+                        data = f.read(MAX_FILE_SIZE)
+            except OSError:
+                continue
+            if previous:
+                self.delete_files(conn, [previous[0]])
+            file_id = conn.execute(
+                'INSERT INTO files (project, path, size, mtime, indexed) VALUES (?, ?, ?, ?, ?)',
+                (project, rel_path, size, mtime, int(indexable))).lastrowid
+            if indexable:
+                conn.executemany('INSERT OR IGNORE INTO postings (trigram, file_id) VALUES (?, ?)',
+                                 ((trigram, file_id) for trigram in trigrams(data)))
+                stats['indexed'] += 1
+
+        removed = [file_id for path, (file_id, _, _) in known.items() if path not in seen]
+        self.delete_files(conn, removed)
+        stats['removed'] += len(removed)
+        conn.commit()
+
+    def delete_files(self, conn, file_ids):
+        for file_id in file_ids:
+            conn.execute('DELETE FROM postings WHERE file_id = ?', (file_id,))
+            conn.execute('DELETE FROM files WHERE id = ?', (file_id,))
+
+    def candidates(self, conn, literals, project=None):
+        """Return (project, path) of files containing all trigrams of the literals."""
+        keys = set()
+        for literal in literals:
+            keys |= trigrams(literal.encode('utf-8'))
+        project_filter = ' AND project = ?' if project else ''
+        if not keys:
+            return conn.execute(f'SELECT project, path FROM files WHERE indexed = 1{project_filter} '
+                                'ORDER BY project, path', (project,) if project else ()).fetchall()
+
+        # Rarest first: each later trigram is only checked for the files still left
+        counts = {key: conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM postings WHERE trigram = ? '
+                                    'LIMIT ?)', (key, COUNT_LIMIT)).fetchone()[0] for key in keys}
+        ordered = sorted(keys, key=counts.get)
+        file_ids = None
+        if project:
+            project_ids = [row[0] for row in conn.execute(
+                'SELECT id FROM files WHERE project = ? AND indexed = 1', (project,))]
+            if len(project_ids) < counts[ordered[0]]:
+                file_ids = project_ids
+        if file_ids is None:
+            file_ids = [row[0] for row in conn.execute(
+                'SELECT file_id FROM postings WHERE trigram = ?', (ordered[0],))]
+            ordered = ordered[1:]
+        for key in ordered:
+            if not file_ids:
+                break
+            file_ids = [file_id for batch in self.batches(file_ids) for (file_id,) in conn.execute(
+                f'SELECT file_id FROM postings WHERE trigram = ? AND file_id IN ({batch[1]})',
+                (key, *batch[0]))]
+
+        files = []
+        for ids, placeholders in self.batches(file_ids):
+            files.extend(conn.execute(
+                f'SELECT project, path FROM files WHERE id IN ({placeholders}){project_filter}',
+                (*ids, project) if project else ids))
+        return sorted(files)
+
+    @staticmethod
+    def batches(ids):
+        """Yield (ids, placeholders) chunks small enough for one IN (...) clause."""
+        for start in range(0, len(ids), SQL_BATCH):
+            chunk = ids[start:start + SQL_BATCH]
+            yield chunk, ','.join('?' * len(chunk))
+
+    def search(self, query, is_regex=False, case_sensitive=False, project=None, limit=200,
+               max_files=MAX_SCAN_FILES):
+        """Return (hits, stats) for a query; each hit has project, path, line and text.
+
+        At most max_files candidate files are read. stats['truncated'] is
+        set when the hit limit or max_files stopped the search early.
+        Raises re.error for invalid regular expressions.
+        """
+        flags = 0 if case_sensitive else re.IGNORECASE
+        regex = re.compile(query if is_regex else re.escape(query), flags)
+        literals = required_literals(query, is_regex)
+        if not case_sensitive:
+            # The index only folds ASCII case
+            literals = [literal for literal in literals if literal.isascii()]
+
+        with self.connect() as conn:
+            files = self.candidates(conn, literals, project)
+
+        hits = []
+        scanned = 0
+        for name, path in files:
+            if len(hits) >= limit or scanned >= max_files:
+                break
+            full_path = os.path.join(self.projects_dir, name, path)
+            scanned += 1
+            try:
+                with open(full_path, 'r', encoding=sniff_file(full_path)['encoding'] or 'utf-8',
+                          errors='replace') as f:
+                    for line_number, line in enumerate(f):
+                        if regex.search(line):
+                            hits.append({
+                                'project': name,
+                                'path': path,
+                                'line': line_number,
+                                'text': line.rstrip('\r\n')[:MAX_LINE_LENGTH]
+                            })
+                            if len(hits) >= limit:
+                                break
+            except OSError:
+                continue
+        return hits, {'candidates': len(files), 'scanned': scanned,
+                      'truncated': len(hits) >= limit or scanned < len(files)}
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python code_search.py <projects_dir> index")
+        print("       python code_search.py <projects_dir> <query> [--regex]")
+        sys.exit(1)
+
+    index = CodeSearchIndex('code_search.db', os.path.expanduser(sys.argv[1]))
+    if sys.argv[2] == 'index':
+        start = time.perf_counter()
+        stats = index.update()
+        print(f"Indexed {stats['indexed']} files, {stats['unchanged']} unchanged, "
+              f"{stats['removed']} removed in {time.perf_counter() - start:.1f}s")
+        return
+
+    start = time.perf_counter()
+    hits, stats = index.search(sys.argv[2], is_regex='--regex' in sys.argv)
+    for hit in hits:
+        print(f"{hit['project']}/{hit['path']}:{hit['line'] + 1}: {hit['text']}")
+    print(f"\n{len(hits)} hits, {stats['candidates']} candidate files "
+          f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,82 +1,306 @@
 #!/usr/bin/env python3
 """
 Convert all git repositories from HTTPS to SSH URLs
+
+Every remote (url and pushurl) of every repository under a projects
+directory is rewritten by editing .git/config directly, in parallel, with
+no git subprocess per repository. URLs are rewritten by a list of rules
+(GitHub, Azure DevOps, GitLab, plus custom hosts or a JSON rules file).
+--dry-run prints the config diffs. A real run first writes a journal with
+the original configs, so --rollback can restore them.
 """
 
 import os
-import subprocess
+import re
 import sys
+import json
+import time
+import difflib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from git_reader import SECTION_RE, UnsupportedRepo, find_git_dir, find_common_dir
+from project_index import list_projects
+
+DEFAULT_PROJECTS_DIR = os.path.expanduser("~/Documents/dev")
+DEFAULT_WORKERS = 16
+URL_KEYS = ('url', 'pushurl')
+# Matches "key = value" keeping the text around the value so only the value changes
+VALUE_RE = re.compile(r'^(\s*([A-Za-z][A-Za-z0-9-]*)\s*=\s*)(.*?)(\s*)$')
+# Values with quotes, escapes or comments are left alone rather than mis-parsed
+UNSAFE_VALUE_CHARS = set('"\\#;')
+
+
+class RewriteRule:
+    """Rewrites remote URLs that match a regex into a replacement template."""
+
+    def __init__(self, name, pattern, replacement):
+        self.name = name
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.replacement = replacement
+
+    def rewrite(self, url):
+        """Return the rewritten URL, or None if the rule does not apply."""
+        match = self.pattern.match(url)
+        return match.expand(self.replacement) if match else None
+
+
+def host_rule(host, ssh_host=None, user='git'):
+    """Rule for a self-hosted server: https://host/path -> user@ssh_host:path.git."""
+    return RewriteRule(host,
+                       rf'^https?://(?:[^@/]+@)?{re.escape(host)}(?::\d+)?/(?P<path>.+?)(?:\.git)?/?$',
+                       rf'{user}@{ssh_host or host}:\g<path>.git')
+
+
+DEFAULT_RULES = [
+    RewriteRule('github',
+                r'^https?://(?:[^@/]+@)?github\.com/(?P<owner>[^/]+)/(?P<repo>[^/]+?)(?:\.git)?/?$',
+                r'git@github.com:\g<owner>/\g<repo>.git'),
+    # Same conversion the dashboard does for Azure DevOps links, in reverse
+    RewriteRule('azure',
+                r'^https://(?:[^@/]+@)?dev\.azure\.com/(?P<org>[^/]+)/(?P<project>[^/]+)/_git/(?P<repo>[^/]+?)/?$',
+                r'git@ssh.dev.azure.com:v3/\g<org>/\g<project>/\g<repo>'),
+    RewriteRule('azure-legacy',
+                r'^https://(?:[^@/]+@)?(?P<org>[^./]+)\.visualstudio\.com/(?:DefaultCollection/)?'
+                r'(?P<project>[^/]+)/_git/(?P<repo>[^/]+?)/?$',
+                r'git@ssh.dev.azure.com:v3/\g<org>/\g<project>/\g<repo>'),
+    RewriteRule('gitlab',
+                r'^https?://(?:[^@/]+@)?gitlab\.com/(?P<path>[^/]+/.+?)(?:\.git)?/?$',
+                r'git@gitlab.com:\g<path>.git'),
+]
+
+
+def load_rules(rules_file):
+    """Load rules from a JSON list of {"name", "match", "replace"} objects."""
+    with open(rules_file, 'r') as f:
+        return [RewriteRule(rule['name'], rule['match'], rule['replace']) for rule in json.load(f)]
 
-def convert_to_ssh(repo_path):
-    """Convert a repository's remote URL from HTTPS to SSH."""
+
+def rewrite_url(url, rules):
+    """Return (new_url, rule_name) from the first matching rule, or (None, None)."""
+    for rule in rules:
+        new_url = rule.rewrite(url)
+        if new_url and new_url != url:
+            return new_url, rule.name
+    return None, None
+
+
+def rewrite_config(text, rules):
+    """Rewrite remote URLs in the text of a git config file.
+
+    Returns (new_text, changes), each change a dict with remote, key, old, new and rule.
+    Only the values change; comments, ordering and indentation are kept.
+    Raises UnsupportedRepo for includes and continuation lines.
+    """
+    lines = text.splitlines(keepends=True)
+    changes = []
+    remote = None
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        if stripped.endswith('\\'):
+            raise UnsupportedRepo('continuation lines in git config')
+        match = SECTION_RE.match(stripped)
+        if match:
+            name, subsection, _ = match.groups()
+            name = name.lower()
+            if subsection is None and '.' in name:
+                # Legacy [remote.origin] syntax, read the same way as git_reader does
+                name, subsection = name.split('.', 1)
+            if name in ('include', 'includeif'):
+                raise UnsupportedRepo('include directives in git config')
+            remote = subsection if name == 'remote' else None
+            continue
+        match = VALUE_RE.match(line.rstrip('\r\n'))
+        if remote is None or not match or match.group(2).lower() not in URL_KEYS:
+            continue
+        prefix, key, value, trailing = match.groups()
+        if UNSAFE_VALUE_CHARS & set(value):
+            continue
+        new_value, rule_name = rewrite_url(value, rules)
+        if new_value:
+            ending = line[len(line.rstrip('\r\n')):]
+            lines[i] = prefix + new_value + trailing + ending
+            changes.append({'remote': remote, 'key': key.lower(), 'old': value,
+                            'new': new_value, 'rule': rule_name})
+    return ''.join(lines), changes
+
+
+def find_config(project_path):
+    """Return the path of a repository's shared config file, or None."""
+    git_dir = find_git_dir(project_path)
+    if git_dir is None:
+        return None
+    config_file = os.path.abspath(os.path.join(find_common_dir(git_dir), 'config'))
+    return config_file if os.path.isfile(config_file) else None
+
+
+def plan_repo(project_path, rules):
+    """Work out the new config of one repository without writing anything."""
+    plan = {'project': os.path.basename(project_path), 'config': find_config(project_path),
+            'changes': [], 'error': None}
+    if plan['config'] is None:
+        return plan
     try:
-        # Get current remote URL
-        result = subprocess.run(['git', 'remote', 'get-url', 'origin'], 
-                              cwd=repo_path, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            return None, "No remote found"
-        
-        current_url = result.stdout.strip()
-        
-        # Check if it's already SSH
-        if current_url.startswith('git@'):
-            return current_url, "Already using SSH"
-        
-        # Convert HTTPS to SSH
-        if 'github.com' in current_url:
-            # https://github.com/user/repo.git -> git@github.com:user/repo.git
-            ssh_url = current_url.replace('https://github.com/', 'git@github.com:')
-            
-            # Set the new URL
-            subprocess.run(['git', 'remote', 'set-url', 'origin', ssh_url], 
-                         cwd=repo_path, check=True)
-            
-            return ssh_url, "Converted to SSH"
-        else:
-            return current_url, "Not a GitHub URL"
-            
-    except Exception as e:
-        return None, f"Error: {str(e)}"
+        with open(plan['config'], 'r', encoding='utf-8', newline='') as f:
+            plan['old'] = f.read()
+        plan['new'], plan['changes'] = rewrite_config(plan['old'], rules)
+    except (OSError, UnicodeDecodeError, UnsupportedRepo) as e:
+        plan['error'] = str(e)
+    return plan
+
+
+def plan_migration(projects_dir, rules, workers=DEFAULT_WORKERS):
+    """Plan the rewrite of every repository under projects_dir in parallel.
+
+    Worktrees sharing one config are planned once.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        plans = list(executor.map(lambda path: plan_repo(path, rules), list_projects(projects_dir)))
+    seen = set()
+    unique = []
+    for plan in plans:
+        if plan['config'] is None:
+            continue
+        config = os.path.realpath(plan['config'])
+        if config not in seen:
+            seen.add(config)
+            unique.append(plan)
+    return unique
+
+
+def write_atomic(path, text):
+    """Replace a file through path + '.lock', the lock file git itself uses for config."""
+    lock_file = path + '.lock'
+    fd = os.open(lock_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, os.stat(path).st_mode & 0o777)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        os.replace(lock_file, path)
+    except BaseException:
+        if os.path.exists(lock_file):
+            os.remove(lock_file)
+        raise
+
+
+def swap_config(config_file, expected, text):
+    """Write text to a config file if it still holds expected; returns an error or None."""
+    try:
+        with open(config_file, 'r', encoding='utf-8', newline='') as f:
+            if f.read() != expected:
+                return 'config changed since it was read, skipped'
+        write_atomic(config_file, text)
+    except FileExistsError:
+        return 'config is locked by another git process'
+    except OSError as e:
+        return str(e)
+    return None
+
+
+def apply_migration(plans, journal_file, workers=DEFAULT_WORKERS):
+    """Write the planned configs, journaling the originals first.
+
+    The journal is written atomically before any config is touched, so a
+    crash at any point can be undone with rollback(). Returns whether a
+    journal was written; nothing is written when no config changes.
+    """
+    pending = [plan for plan in plans if plan['changes'] and not plan['error']]
+    if not pending:
+        return False
+    journal = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'entries': [{'config': plan['config'], 'old': plan['old'], 'new': plan['new']} for plan in pending]
+    }
+    tmp_file = journal_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(journal, f, indent=2)
+    os.replace(tmp_file, journal_file)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors = executor.map(lambda plan: swap_config(plan['config'], plan['old'], plan['new']), pending)
+        for plan, error in zip(pending, errors):
+            plan['error'] = error
+    return True
+
+
+def rollback(journal_file, workers=DEFAULT_WORKERS):
+    """Restore the configs recorded in a journal; returns [(config, error or None)].
+
+    A config edited again after the migration is not overwritten.
+    """
+    with open(journal_file, 'r') as f:
+        entries = json.load(f)['entries']
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors = executor.map(lambda entry: swap_config(entry['config'], entry['new'], entry['old']), entries)
+        return [(entry['config'], error) for entry, error in zip(entries, errors)]
+
+
+def print_diff(plan):
+    diff = difflib.unified_diff(plan['old'].splitlines(keepends=True), plan['new'].splitlines(keepends=True),
+                                fromfile=f"a/{plan['project']}/config", tofile=f"b/{plan['project']}/config")
+    sys.stdout.writelines(diff)
+
 
 def main():
-    if len(sys.argv) > 1:
-        base_dir = sys.argv[1]
-    else:
-        base_dir = os.path.expanduser("~/Documents/dev")
-    
+    parser = argparse.ArgumentParser(description='Convert git remotes from HTTPS to SSH URLs.')
+    parser.add_argument('projects_dir', nargs='?', default=DEFAULT_PROJECTS_DIR,
+                        help=f'directory containing the repositories (default: {DEFAULT_PROJECTS_DIR})')
+    parser.add_argument('--dry-run', action='store_true', help='print the config diffs without writing')
+    parser.add_argument('--host', action='append', default=[], metavar='HOST[=SSH_HOST]',
+                        help='also convert https://HOST/... remotes of a self-hosted server (can be repeated)')
+    parser.add_argument('--rules', help='JSON file with extra rules: [{"name", "match", "replace"}]')
+    parser.add_argument('--journal', default=f"convert_to_ssh-{time.strftime('%Y%m%d-%H%M%S')}.journal.json",
+                        help='where to write the rollback journal')
+    parser.add_argument('--rollback', metavar='JOURNAL', help='restore the configs saved in a journal')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.rollback:
+        results = rollback(args.rollback)
+        for config_file, error in results:
+            print(f"{'✗' if error else '✓'} {config_file}{': ' + error if error else ''}")
+        print(f"\nRestored {sum(1 for _, error in results if not error)} of {len(results)} configs "
+              f"in {time.perf_counter() - start:.2f}s")
+        sys.exit(1 if any(error for _, error in results) else 0)
+
+    rules = load_rules(args.rules) if args.rules else []
+    for host in args.host:
+        host, _, ssh_host = host.partition('=')
+        rules.append(host_rule(host, ssh_host or None))
+    rules.extend(DEFAULT_RULES)
+
+    base_dir = os.path.expanduser(args.projects_dir)
     print(f"Converting repositories in {base_dir} to use SSH...\n")
-    
+    plans = plan_migration(base_dir, rules)
+
+    if args.dry_run:
+        for plan in plans:
+            if plan['changes']:
+                print_diff(plan)
+    else:
+        apply_migration([plan for plan in plans if plan['changes']], args.journal)
+
     converted = 0
-    already_ssh = 0
-    no_remote = 0
     errors = 0
-    
-    for item in sorted(os.listdir(base_dir)):
-        item_path = os.path.join(base_dir, item)
-        
-        if os.path.isdir(item_path) and not item.startswith('.'):
-            git_dir = os.path.join(item_path, '.git')
-            
-            if os.path.exists(git_dir):
-                url, status = convert_to_ssh(item_path)
-                
-                if status == "Converted to SSH":
-                    print(f"✓ {item}: {url}")
-                    converted += 1
-                elif status == "Already using SSH":
-                    already_ssh += 1
-                elif status == "No remote found":
-                    no_remote += 1
-                else:
-                    print(f"✗ {item}: {status}")
-                    errors += 1
-    
-    print(f"\nSummary:")
-    print(f"  Converted to SSH: {converted}")
-    print(f"  Already using SSH: {already_ssh}")
-    print(f"  No remote: {no_remote}")
+    for plan in plans:
+        if plan['error']:
+            print(f"✗ {plan['project']}: {plan['error']}")
+            errors += 1
+        elif plan['changes'] and not args.dry_run:
+            for change in plan['changes']:
+                print(f"✓ {plan['project']}: {change['remote']}.{change['key']} -> {change['new']} ({change['rule']})")
+            converted += 1
+
+    changed = sum(1 for plan in plans if plan['changes'] and not plan['error'])
+    print(f"\nSummary ({time.perf_counter() - start:.2f}s):")
+    print(f"  Repositories: {len(plans)}")
+    print(f"  {'Would convert' if args.dry_run else 'Converted'}: {changed if args.dry_run else converted}")
+    print(f"  Unchanged: {len(plans) - changed - errors}")
     print(f"  Errors: {errors}")
+    if converted:
+        print(f"\nRollback journal: {args.journal} (undo with --rollback {args.journal})")
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
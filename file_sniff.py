@@ -0,0 +1,122 @@
+"""
+Content-based binary detection and encoding sniffing for the file viewer
+
+Only the first SNIFF_BYTES of a file are read. Results are cached per
+(path, size, mtime) so reopening a file does not touch its content again.
+"""
+
+import os
+import codecs
+import threading
+from collections import OrderedDict
+
+SNIFF_BYTES = 8192
+MAX_CACHED = 4096
+# Share of control characters above which undecodable data is treated as binary
+CONTROL_RATIO = 0.1
+
+# (prefix, format name) for common binary formats whose extensions
+# mimetypes may not know
+MAGIC_NUMBERS = [
+    (b'\x89PNG\r\n\x1a\n', 'PNG image'),
+    (b'\xff\xd8\xff', 'JPEG image'),
+    (b'GIF87a', 'GIF image'),
+    (b'GIF89a', 'GIF image'),
+    (b'RIFF', 'RIFF media'),
+    (b'%PDF-', 'PDF document'),
+    (b'PK\x03\x04', 'ZIP archive'),
+    (b'\x1f\x8b', 'gzip archive'),
+    (b'BZh', 'bzip2 archive'),
+    (b'\xfd7zXZ\x00', 'xz archive'),
+    (b'7z\xbc\xaf\x27\x1c', '7-Zip archive'),
+    (b'Rar!\x1a\x07', 'RAR archive'),
+    (b'\x28\xb5\x2f\xfd', 'zstd archive'),
+    (b'\x7fELF', 'ELF executable'),
+    (b'MZ', 'Windows executable'),
+    (b'\xcf\xfa\xed\xfe', 'Mach-O executable'),
+    (b'\xca\xfe\xba\xbe', 'Java class / Mach-O universal binary'),
+    (b'\x00asm', 'WebAssembly module'),
+    (b'SQLite format 3\x00', 'SQLite database'),
+    (b'\x93NUMPY', 'NumPy array'),
+    (b'\x89HDF\r\n\x1a\n', 'HDF5 data'),
+    (b'PAR1', 'Parquet data'),
+    (b'OggS', 'Ogg media'),
+    (b'fLaC', 'FLAC audio'),
+    (b'ID3', 'MP3 audio'),
+    (b'wOFF', 'WOFF font'),
+    (b'wOF2', 'WOFF2 font'),
+]
+
+# Longest BOMs first so UTF-32 LE is not mistaken for UTF-16 LE
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+TEXT_CONTROL_BYTES = {0x08, 0x09, 0x0a, 0x0c, 0x0d, 0x1b}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def sniff_bytes(sample):
+    """Classify a file from its first bytes.
+
+    Returns a dict with 'binary' (bool), 'encoding' (codec name for text,
+    None for binary) and 'format' (magic-number format name or None).
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return {'binary': False, 'encoding': encoding, 'format': None}
+
+    format_name = None
+    for magic, name in MAGIC_NUMBERS:
+        if sample.startswith(magic):
+            # Printable magics like "MZ" or "ID3" can also start a text file,
+            # so those only count once the content check below agrees
+            if not all(0x20 <= byte < 0x7f for byte in magic):
+                return {'binary': True, 'encoding': None, 'format': name}
+            format_name = name
+            break
+
+    if b'\x00' in sample:
+        return {'binary': True, 'encoding': None, 'format': format_name}
+
+    control = sum(1 for byte in sample if byte < 0x20 and byte not in TEXT_CONTROL_BYTES)
+    if sample and control / len(sample) > CONTROL_RATIO:
+        return {'binary': True, 'encoding': None, 'format': format_name}
+
+    try:
+        # A sample may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return {'binary': False, 'encoding': 'utf-8', 'format': None}
+    except UnicodeDecodeError:
+        pass
+
+    if format_name:
+        return {'binary': True, 'encoding': None, 'format': format_name}
+    # Not UTF-8 but looks like text: cp1252 decodes almost any legacy 8-bit text
+    return {'binary': False, 'encoding': 'cp1252', 'format': None}
+
+
+def sniff_file(path):
+    """Classify a file by content, reading at most SNIFF_BYTES, with caching."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            return result
+
+    with open(path, 'rb') as f:
+        result = sniff_bytes(f.read(SNIFF_BYTES))
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,74 @@
+"""
+Helpers shared by everything that walks a project's files
+"""
+
+import os
+
+# Directories that never hold a project's own source code
+SKIP_DIRS = {'node_modules', '__pycache__', 'dist', 'build', '.git',
+             'venv', 'env', '.venv', 'target', '.idea', '.vscode'}
+
+
+def is_skipped(name):
+    """Return True for hidden entries and directories in SKIP_DIRS."""
+    return name.startswith('.') or name in SKIP_DIRS
+
+
+def count_children(path):
+    """Return the number of visible entries in a directory, or None if unreadable."""
+    try:
+        with os.scandir(path) as entries:
+            return sum(1 for entry in entries if not is_skipped(entry.name))
+    except OSError:
+        return None
+
+
+def list_directory(project_path, rel_path='', cursor=None, limit=200):
+    """List one directory level of a project, sorted by name and paginated.
+
+    cursor is the name of the last entry of the previous page. Only the
+    entries on the returned page are stat'ed; directories carry a child
+    count so the UI can render them without descending. Raises ValueError
+    for paths outside the project and OSError for unreadable directories.
+    """
+    base_path = os.path.abspath(project_path)
+    dir_path = os.path.abspath(os.path.join(base_path, rel_path))
+    if dir_path != base_path and not dir_path.startswith(base_path + os.sep):
+        raise ValueError('Invalid path')
+
+    with os.scandir(dir_path) as it:
+        entries = sorted((entry for entry in it if not is_skipped(entry.name)),
+                         key=lambda entry: entry.name)
+    total = len(entries)
+    if cursor:
+        entries = [entry for entry in entries if entry.name > cursor]
+    page = entries[:limit]
+
+    items = []
+    for entry in page:
+        relative_path = os.path.relpath(entry.path, base_path)
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            continue
+        if is_dir:
+            items.append({
+                'name': entry.name,
+                'path': relative_path,
+                'type': 'directory',
+                'child_count': count_children(entry.path)
+            })
+        else:
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                size = None
+            items.append({
+                'name': entry.name,
+                'path': relative_path,
+                'type': 'file',
+                'size': size
+            })
+
+    next_cursor = page[-1].name if len(entries) > limit else None
+    return {'entries': items, 'next_cursor': next_cursor, 'total': total}
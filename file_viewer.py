@@ -0,0 +1,161 @@
+"""
+Byte- and line-range reads for large files, backed by mmap and a sparse
+line-offset index cached per (path, size, mtime)
+"""
+
+import os
+import mmap
+import bisect
+import threading
+from collections import OrderedDict
+
+INDEX_STEP = 64 * 1024  # one index entry per 64 KB of file
+MAX_INDEXES = 32
+MAX_RANGE_BYTES = 1024 * 1024  # largest slice returned in one JSON response
+# Encodings in which b'\n' does not mark line ends; such files are decoded whole
+WIDE_ENCODINGS = ('utf-16', 'utf-32')
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class LineIndex:
+    """Sparse line index: for every INDEX_STEP bytes, the number of newlines before it."""
+
+    def __init__(self, lines_before, total_lines, size):
+        self.lines_before = lines_before  # lines_before[i] = newlines in data[:i * INDEX_STEP]
+        self.total_lines = total_lines
+        self.size = size
+
+    def offset_before(self, line):
+        """Return (line, offset) for the last indexed offset lying on a line before line.
+
+        The offset may be in the middle of that line; skipping (target - line)
+        newlines from it lands exactly at the start of the target line.
+        """
+        if line <= 0:
+            return 0, 0
+        slot = max(0, bisect.bisect_left(self.lines_before, line) - 1)
+        return self.lines_before[slot], slot * INDEX_STEP
+
+
+def open_map(f, size):
+    """Memory-map an open file; empty files cannot be mapped and return None."""
+    if size == 0:
+        return None
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def build_line_index(path):
+    """Scan a file once, counting newlines per INDEX_STEP block."""
+    lines_before = [0]
+    lines = 0
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        data = open_map(f, size)
+        if data is None:
+            return LineIndex(lines_before, 0, 0)
+        with data:
+            for start in range(0, size, INDEX_STEP):
+                lines += data[start:start + INDEX_STEP].count(b'\n')
+                if start + INDEX_STEP < size:
+                    lines_before.append(lines)
+            # A final line without a trailing newline still counts
+            if data[size - 1:size] != b'\n':
+                lines += 1
+    return LineIndex(lines_before, lines, size)
+
+
+def get_line_index(path):
+    """Return the cached line index for a file, rebuilding it when the file changed."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = build_line_index(path)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def read_byte_range(path, offset, length):
+    """Return (data, size) for up to length bytes starting at offset."""
+    length = max(0, min(length, MAX_RANGE_BYTES))
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = max(0, min(offset, size))
+        data = open_map(f, size)
+        if data is None:
+            return b'', size
+        with data:
+            return data[offset:offset + length], size
+
+
+def read_wide_line_range(path, start_line, count, encoding):
+    """read_line_range() for UTF-16/32 files, which are decoded as a whole."""
+    size = os.path.getsize(path)
+    if size > MAX_RANGE_BYTES:
+        raise ValueError(f'Line ranges are not supported for {encoding} files over 1 MB')
+    with open(path, 'r', encoding=encoding, errors='replace') as f:
+        all_lines = f.read().splitlines()
+    lines = all_lines[start_line:start_line + count]
+    return {
+        'start_line': start_line,
+        'lines': lines,
+        'total_lines': len(all_lines),
+        'offset': None,
+        'next_offset': None,
+        'size': size,
+        'eof': start_line + len(lines) >= len(all_lines)
+    }
+
+
+def read_line_range(path, start_line, count, encoding='utf-8'):
+    """Return a dict with up to count lines starting at start_line (0-based).
+
+    Lines are returned as decoded text (undecodable bytes replaced) without
+    their line endings. Reading stops early if MAX_RANGE_BYTES is reached.
+    """
+    start_line = max(0, start_line)
+    if encoding in WIDE_ENCODINGS:
+        return read_wide_line_range(path, start_line, count, encoding)
+    index = get_line_index(path)
+    lines = []
+    offset = None
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        data = open_map(f, size)
+        if data is not None:
+            with data:
+                line, pos = index.offset_before(start_line)
+                # Skip forward from the indexed offset to the requested line
+                while line < start_line and pos < size:
+                    newline = data.find(b'\n', pos)
+                    pos = size if newline == -1 else newline + 1
+                    line += 1
+                offset = pos
+                budget = MAX_RANGE_BYTES
+                while len(lines) < count and pos < size and budget > 0:
+                    newline = data.find(b'\n', pos)
+                    end = size if newline == -1 else newline
+                    raw = data[pos:min(end, pos + budget)]
+                    budget -= len(raw) + 1
+                    lines.append(raw.rstrip(b'\r').decode(encoding, errors='replace'))
+                    pos = end + 1
+                next_offset = min(pos, size)
+    if offset is None:
+        offset = next_offset = 0
+    return {
+        'start_line': start_line,
+        'lines': lines,
+        'total_lines': index.total_lines,
+        'offset': offset,
+        'next_offset': next_offset,
+        'size': size,
+        'eof': start_line + len(lines) >= index.total_lines
+    }
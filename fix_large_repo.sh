@@ -1,37 +1,25 @@
 #!/bin/bash
-# Script to create a clean copy of a repository without large files
+# Remove large files and logs from a repository's history in place.
+# Delegates to clean_history.py, which rewrites the history with
+# git fast-export/fast-import instead of copying the repository.
 
 if [ $# -lt 1 ]; then
-    echo "Usage: $0 <repo_path>"
+    echo "Usage: $0 <repo_path> [--dry-run] [--size MB] [--pattern GLOB] [--gc]"
     exit 1
 fi
 
 REPO_PATH="$1"
-REPO_NAME=$(basename "$REPO_PATH")
-TEMP_PATH="${REPO_PATH}_clean"
+shift
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
-echo "Creating clean copy of $REPO_NAME..."
+# Same defaults as before: files over 50 MB and *.log files; later options override --size
+python3 "$SCRIPT_DIR/clean_history.py" "$REPO_PATH" --size 50 --pattern '*.log' "$@" || exit 1
 
-# Create a clean copy
-cp -r "$REPO_PATH" "$TEMP_PATH"
+case " $* " in
+    *" --dry-run "*) exit 0 ;;
+esac
 
-# Remove .git directory
-rm -rf "$TEMP_PATH/.git"
-
-# Remove large files
-find "$TEMP_PATH" -type f -size +50M -delete
-
-# Remove log files
-find "$TEMP_PATH" -name "*.log" -type f -delete
-
-# Initialize new git repo
-cd "$TEMP_PATH"
-git init
-git add .
-git commit -m "Initial commit - cleaned repository"
-
-echo "Clean repository created at: $TEMP_PATH"
 echo "Next steps:"
-echo "1. Review the clean repository"
-echo "2. Add remote: git remote add origin <github_url>"
-echo "3. Push: git push -u origin main"
\ No newline at end of file
+echo "1. Review the rewritten history: git log --stat"
+echo "2. Add the dropped files to .gitignore if they should stay untracked"
+echo "3. Push: git push --force-with-lease origin <branch>"
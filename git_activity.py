@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Project activity from git history
+
+For each repository one streamed `git log --format=%ct%x09%aN` pass reads
+the commits of the last year: the newest commit gives the last activity
+date, and the rest are bucketed by day and by author. The walk stops at
+the first commit older than a year, so old history is never read. Results
+are cached by HEAD commit in a JSON file; the 30/90/365 day counts are
+derived from the day buckets when they are read, so they stay correct as
+time passes without running git again.
+"""
+
+import os
+import sys
+import time
+import datetime
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_cache import ScanCache
+from git_reader import read_repo_info
+from project_index import list_projects
+from metrics import record_subprocess
+
+ACTIVITY_CACHE_FILE = "project_activity_cache.json"
+ACTIVITY_WORKERS = int(os.environ.get('PROJECT_VIEWER_ACTIVITY_WORKERS', '8'))
+WINDOWS = (30, 90, 365)  # days counted in the summary
+TOP_AUTHORS = 5
+KEPT_AUTHORS = 20  # authors stored per repository
+DAY = 86400
+
+
+def read_activity(repo_path, now=None):
+    """Read the last year of commits of a repository in one git log pass.
+
+    Returns {'last_commit', 'days', 'authors'} where days maps a day number
+    (days since the epoch, as a string) to a commit count. Raises
+    RuntimeError if git log fails.
+    """
+    now = now or time.time()
+    cutoff = now - max(WINDOWS) * DAY
+    start = time.perf_counter()
+    process = subprocess.Popen(['git', 'log', '--format=%ct%x09%aN', 'HEAD'], cwd=repo_path,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, errors='replace')
+    last_commit = None
+    days = {}
+    authors = {}
+    stopped = False
+    try:
+        for line in process.stdout:
+            timestamp, _, author = line.rstrip('\n').partition('\t')
+            timestamp = int(timestamp)
+            if last_commit is None:
+                last_commit = timestamp
+            if timestamp < cutoff:
+                # Like --since: the walk ends at the first commit older than the window
+                stopped = True
+                break
+            day = str(int(timestamp // DAY))
+            days[day] = days.get(day, 0) + 1
+            authors[author] = authors.get(author, 0) + 1
+    finally:
+        if stopped:
+            process.kill()
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        process.wait()
+        record_subprocess('git log', time.perf_counter() - start,
+                          stopped or process.returncode == 0, repo_path)
+    if not stopped and process.returncode != 0:
+        raise RuntimeError(stderr.strip() or 'git log failed')
+    top = sorted(authors.items(), key=lambda item: (-item[1], item[0]))[:KEPT_AUTHORS]
+    return {'last_commit': last_commit, 'days': days, 'authors': top}
+
+
+def summarize(activity, now=None):
+    """Turn a cached activity record into the summary attached to projects."""
+    if 'error' in activity:
+        return {'error': activity['error']}
+    now = now or time.time()
+    today = int(now // DAY)
+    summary = {
+        'last_commit': activity['last_commit'],
+        'last_commit_date': None,
+        'top_authors': [{'name': name, 'commits': count} for name, count in activity['authors'][:TOP_AUTHORS]]
+    }
+    if activity['last_commit']:
+        summary['last_commit_date'] = datetime.datetime.fromtimestamp(
+            activity['last_commit']).strftime("%Y-%m-%d %H:%M")
+    for window in WINDOWS:
+        summary[f'commits_{window}d'] = sum(count for day, count in activity['days'].items()
+                                            if today - int(day) < window)
+    return summary
+
+
+class ActivityTracker:
+    """Reads repository activity in a thread pool, caching it by HEAD commit."""
+
+    def __init__(self, cache_file, workers=ACTIVITY_WORKERS):
+        self.cache = ScanCache(cache_file)
+        self.workers = workers
+        self.running = False
+        self.lock = threading.Lock()
+
+    def cached(self, repo_path, head):
+        """Return the activity summary for a repository at this HEAD, or None."""
+        if not head:
+            return None
+        activity = self.cache.get(repo_path, [head])
+        return summarize(activity) if activity is not None else None
+
+    def collect(self, repos, prune=False):
+        """Read the activity of (repo_path, head) pairs that have no cached result.
+
+        Returns {repo_path: summary}; a repository whose git log failed gets
+        a summary with only an 'error', which is cached like any result.
+        With prune, cache entries for repositories not in repos are dropped.
+        """
+        results = {}
+        missing = []
+        for repo_path, head in repos:
+            summary = self.cached(repo_path, head)
+            if summary is None:
+                missing.append((repo_path, head))
+            else:
+                results[repo_path] = summary
+
+        def collect_one(repo):
+            repo_path, head = repo
+            try:
+                activity = read_activity(repo_path)
+            except (OSError, RuntimeError, ValueError) as e:
+                # Cached too: a history git cannot read stays unreadable until HEAD moves
+                activity = {'error': str(e)}
+            self.cache.put(repo_path, activity, [head])
+            return repo_path, summarize(activity)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            results.update(executor.map(collect_one, missing))
+
+        if prune:
+            self.cache.prune([repo_path for repo_path, _ in repos])
+        self.cache.save()
+        return results
+
+    def collect_in_background(self, repos, on_done=None, prune=False):
+        """Run collect() in a thread unless one is already running.
+
+        on_done is called with the paths of the repositories that were read.
+        """
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+        stale = [repo_path for repo_path, head in repos if self.cached(repo_path, head) is None]
+
+        def run():
+            try:
+                self.collect(repos, prune)
+                if on_done:
+                    on_done(stale)
+            except Exception as e:
+                print(f"Activity collection failed: {e}")
+            finally:
+                with self.lock:
+                    self.running = False
+
+        threading.Thread(target=run, name='git-activity', daemon=True).start()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python git_activity.py <projects_dir>")
+        sys.exit(1)
+
+    projects_dir = os.path.expanduser(sys.argv[1])
+    repos = []
+    for project_path in list_projects(projects_dir):
+        info = read_repo_info(project_path)
+        if info is not None and info['head']:
+            repos.append((project_path, info['head']))
+
+    start = time.perf_counter()
+    results = ActivityTracker(ACTIVITY_CACHE_FILE).collect(repos, prune=True)
+    ordered = sorted(results.items(), key=lambda item: item[1].get('last_commit') or 0, reverse=True)
+    print(f"{'Project':<30} {'Last commit':<17} {'30d':>5} {'90d':>5} {'365d':>5}  Top author")
+    for repo_path, summary in ordered:
+        name = os.path.basename(repo_path)
+        if 'error' in summary:
+            print(f"{name:<30} error: {summary['error']}")
+            continue
+        author = summary['top_authors'][0]['name'] if summary['top_authors'] else ''
+        print(f"{name:<30} {summary['last_commit_date'] or '-':<17} {summary['commits_30d']:>5} "
+              f"{summary['commits_90d']:>5} {summary['commits_365d']:>5}  {author}")
+    print(f"\n{len(results)} repositories in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
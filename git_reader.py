@@ -0,0 +1,304 @@
+"""
+Lightweight in-process reader for .git metadata (remotes, branch, HEAD commit)
+
+Answers the common questions without forking git. url.*.insteadOf rewrites
+from the repository and global config (including files pulled in with
+[include]) are applied the way git applies them. Anything this reader does
+not understand (includes in a repository's own config, rewrites from a
+conditional [includeIf] that match a remote, reftable repos) falls back to
+the git binary for that repository only.
+"""
+
+import os
+import re
+import time
+import subprocess
+
+from metrics import record_subprocess
+
+GIT_TIMEOUT = 10
+
+SECTION_RE = re.compile(r'^\s*\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]\s*(.*)$')
+ENTRY_RE = re.compile(r'^\s*([A-Za-z][A-Za-z0-9-]*)\s*(?:=\s*(.*))?$')
+
+_global_config_cache = {}
+
+
+class UnsupportedRepo(Exception):
+    """Raised when the repository layout needs the git binary to be read correctly."""
+
+
+def run_git(project_path, args):
+    """Run a git command and return its stripped stdout, or None on failure."""
+    command = 'git ' + args[0]
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(['git'] + args, cwd=project_path, capture_output=True,
+                                text=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired):
+        record_subprocess(command, time.perf_counter() - start, False, project_path)
+        return None
+    record_subprocess(command, time.perf_counter() - start, result.returncode == 0, project_path)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def find_git_dir(project_path):
+    """Return the git directory of a working tree, following gitfile indirection."""
+    dot_git = os.path.join(project_path, '.git')
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isfile(dot_git):
+        # Worktrees and submodules use a ".git" file: "gitdir: <path>"
+        with open(dot_git, 'r') as f:
+            content = f.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = content[len('gitdir:'):].strip()
+            return os.path.normpath(os.path.join(project_path, git_dir))
+    return None
+
+
+def find_common_dir(git_dir):
+    """Return the directory holding shared config and refs (differs for worktrees)."""
+    commondir_file = os.path.join(git_dir, 'commondir')
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, 'r') as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return git_dir
+
+
+def _unquote(value):
+    """Strip comments and quotes from a config value."""
+    result = []
+    in_quotes = False
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char == '\\' and i + 1 < len(value):
+            result.append({'n': '\n', 't': '\t', 'b': '\b'}.get(value[i + 1], value[i + 1]))
+            i += 2
+            continue
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char in '#;' and not in_quotes:
+            break
+        else:
+            result.append(char)
+        i += 1
+    return ''.join(result).strip()
+
+
+def parse_config(config_file, allow_includes=False):
+    """Parse a git config file into {(section, subsection): {key: [values]}}.
+
+    Section and key names are lower-cased as git does; subsections keep
+    their case. Raises UnsupportedRepo for continuation lines, and for
+    include directives unless allow_includes is set, in which case they
+    are returned like any other section for the caller to follow.
+    """
+    config = {}
+    current = None
+    with open(config_file, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped[0] in '#;':
+                continue
+            if stripped.endswith('\\'):
+                raise UnsupportedRepo('continuation lines in git config')
+            match = SECTION_RE.match(stripped)
+            if match:
+                name, subsection, rest = match.groups()
+                name = name.lower()
+                if subsection is None and '.' in name:
+                    # Legacy [section.subsection] syntax
+                    name, subsection = name.split('.', 1)
+                if subsection is not None:
+                    subsection = re.sub(r'\\(.)', r'\1', subsection)
+                if name in ('include', 'includeif') and not allow_includes:
+                    raise UnsupportedRepo('include directives in git config')
+                current = config.setdefault((name, subsection), {})
+                stripped = rest.strip()
+                if not stripped:
+                    continue
+            match = ENTRY_RE.match(stripped)
+            if match and current is not None:
+                key, value = match.groups()
+                current.setdefault(key.lower(), []).append(
+                    'true' if value is None else _unquote(value))
+    return config
+
+
+def url_rewrites(config):
+    """Return the (prefix, replacement) pairs of url.<base>.insteadOf entries."""
+    return [(prefix, base) for (section, base), values in config.items()
+            if section == 'url' and base for prefix in values.get('insteadof', [])]
+
+
+def rewrite_url(url, rewrites):
+    """Apply insteadOf rewrites like git: the longest matching prefix wins."""
+    best = None
+    for prefix, base in rewrites:
+        if url.startswith(prefix) and (best is None or len(prefix) > len(best[0])):
+            best = (prefix, base)
+    return best[1] + url[len(best[0]):] if best else url
+
+
+def read_config_rewrites(path, conditional, result, depth=0):
+    """Collect the rewrites of a config file and the files it includes.
+
+    Rewrites from [includeIf] files depend on the repository, so they go
+    to result['conditional'] instead of result['rewrites']. Every file read
+    is added to result['files'] with its mtime.
+    """
+    if depth > 10:
+        raise UnsupportedRepo('include loop in global git config')
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        result['files'].append((path, None))
+        return
+    result['files'].append((path, mtime))
+    config = parse_config(path, allow_includes=True)
+    result['conditional' if conditional else 'rewrites'].extend(url_rewrites(config))
+    for (section, condition), values in config.items():
+        if section not in ('include', 'includeif'):
+            continue
+        for include in values.get('path', []):
+            include = os.path.join(os.path.dirname(path), os.path.expanduser(include))
+            read_config_rewrites(include, conditional or section == 'includeif', result, depth + 1)
+
+
+def global_url_rewrites():
+    """Return the insteadOf rewrites of the user's global config, or None if unreadable.
+
+    The result is {'rewrites', 'conditional'}, cached until one of the
+    files it was read from changes.
+    """
+    xdg_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+    paths = (os.path.join(xdg_home, 'git', 'config'), os.path.expanduser('~/.gitconfig'))
+    cached = _global_config_cache.get(paths)
+    if cached is not None:
+        files, rewrites = cached
+        if all(_mtime(path) == mtime for path, mtime in files):
+            return rewrites
+    result = {'files': [], 'rewrites': [], 'conditional': []}
+    try:
+        for path in paths:
+            read_config_rewrites(path, False, result)
+        rewrites = {'rewrites': result['rewrites'], 'conditional': result['conditional']}
+    except (OSError, UnsupportedRepo):
+        rewrites = None
+    _global_config_cache[paths] = (result['files'], rewrites)
+    return rewrites
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def read_remotes(common_dir):
+    """Return {remote_name: url} from the repository config, with insteadOf applied."""
+    config_file = os.path.join(common_dir, 'config')
+    if not os.path.isfile(config_file):
+        return {}
+    config = parse_config(config_file)
+    if config.get(('extensions', None), {}).get('refstorage'):
+        raise UnsupportedRepo('non-files ref storage')
+    global_rewrites = global_url_rewrites()
+    if global_rewrites is None:
+        raise UnsupportedRepo('unreadable global git config')
+    rewrites = global_rewrites['rewrites'] + url_rewrites(config)
+    remotes = {}
+    for (section, subsection), values in config.items():
+        if section == 'remote' and subsection and values.get('url'):
+            url = values['url'][0]
+            if any(url.startswith(prefix) for prefix, _ in global_rewrites['conditional']):
+                raise UnsupportedRepo('url rewrite from a conditional include')
+            remotes[subsection] = rewrite_url(url, rewrites)
+    return remotes
+
+
+def read_packed_refs(common_dir):
+    """Return {ref: oid} from packed-refs."""
+    refs = {}
+    packed_file = os.path.join(common_dir, 'packed-refs')
+    if not os.path.isfile(packed_file):
+        return refs
+    with open(packed_file, 'r') as f:
+        for line in f:
+            if line.startswith('#') or line.startswith('^'):
+                continue
+            parts = line.split()
+            if len(parts) == 2:
+                refs[parts[1]] = parts[0]
+    return refs
+
+
+def resolve_ref(git_dir, common_dir, ref, depth=0):
+    """Resolve a ref name to an object id, or None if it does not exist yet."""
+    if depth > 5:
+        return None
+    # Per-worktree refs (HEAD and friends) live in git_dir, the rest in common_dir
+    base_dir = git_dir if '/' not in ref else common_dir
+    ref_file = os.path.join(base_dir, ref)
+    if os.path.isfile(ref_file):
+        with open(ref_file, 'r') as f:
+            content = f.read().strip()
+        if content.startswith('ref:'):
+            return resolve_ref(git_dir, common_dir, content[len('ref:'):].strip(), depth + 1)
+        return content or None
+    return read_packed_refs(common_dir).get(ref)
+
+
+def read_head(git_dir, common_dir):
+    """Return (branch, head_oid); branch is None for a detached HEAD."""
+    head_file = os.path.join(git_dir, 'HEAD')
+    with open(head_file, 'r') as f:
+        content = f.read().strip()
+    if content.startswith('ref:'):
+        ref = content[len('ref:'):].strip()
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+        return branch, resolve_ref(git_dir, common_dir, ref)
+    return None, content or None
+
+
+def read_repo_info(project_path):
+    """Return remotes, branch and HEAD commit for a working tree.
+
+    Returns None when the directory is not a git repository.
+    """
+    git_dir = find_git_dir(project_path)
+    if git_dir is None:
+        return None
+    try:
+        common_dir = find_common_dir(git_dir)
+        remotes = read_remotes(common_dir)
+        branch, head = read_head(git_dir, common_dir)
+    except (OSError, UnsupportedRepo):
+        return read_repo_info_with_git(project_path)
+    return {'remotes': remotes, 'branch': branch, 'head': head}
+
+
+def read_repo_info_with_git(project_path):
+    """Answer the same questions as read_repo_info() using the git binary."""
+    remotes = {}
+    names = run_git(project_path, ['remote'])
+    for name in (names or '').split():
+        url = run_git(project_path, ['remote', 'get-url', name])
+        if url:
+            remotes[name] = url
+    branch = run_git(project_path, ['symbolic-ref', '--short', '-q', 'HEAD']) or None
+    head = run_git(project_path, ['rev-parse', '-q', '--verify', 'HEAD']) or None
+    return {'remotes': remotes, 'branch': branch, 'head': head}
+
+
+def get_remote_url(project_path, remote='origin'):
+    """Return the URL of a remote, or None if the remote is not configured."""
+    info = read_repo_info(project_path)
+    if info is None:
+        return None
+    return info['remotes'].get(remote)
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+GitHub repository metadata (visibility, stars, default branch, archived flag)
+resolved in batches and cached with a TTL and ETag revalidation
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import GITHUB_REQUEST_SECONDS, record_cache, record_subprocess
+
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+CACHE_TTL = int(os.environ.get('PROJECT_VIEWER_GITHUB_TTL', '3600'))
+RETRY_AFTER_ERROR = 300  # seconds to wait before contacting GitHub again after a failure
+GRAPHQL_BATCH_SIZE = 50
+PER_PAGE = 100
+REQUEST_TIMEOUT = 10
+
+CACHE_VERSION = 1
+
+
+class GitHubError(Exception):
+    """Raised when GitHub metadata cannot be fetched."""
+
+
+def parse_github_repo(remote_url):
+    """Return 'owner/repo' for a GitHub remote URL, or None for other hosts."""
+    if not remote_url or 'github.com' not in remote_url:
+        return None
+    if remote_url.startswith('git@github.com:'):
+        repo_path = remote_url[len('git@github.com:'):]
+    elif 'github.com/' in remote_url:
+        repo_path = remote_url.split('github.com/')[-1]
+    else:
+        return None
+    repo_path = repo_path.strip('/')
+    if repo_path.endswith('.git'):
+        repo_path = repo_path[:-len('.git')]
+    if repo_path.count('/') != 1:
+        return None
+    return repo_path
+
+
+def repo_from_rest(repo):
+    """Convert a REST repository object into a metadata dict."""
+    return {
+        'private': bool(repo.get('private')),
+        'stars': repo.get('stargazers_count', 0),
+        'default_branch': repo.get('default_branch'),
+        'archived': bool(repo.get('archived'))
+    }
+
+
+def repo_from_graphql(repo):
+    """Convert a GraphQL repository node into a metadata dict."""
+    default_branch = repo.get('defaultBranchRef') or {}
+    return {
+        'private': bool(repo.get('isPrivate')),
+        'stars': repo.get('stargazerCount', 0),
+        'default_branch': default_branch.get('name'),
+        'archived': bool(repo.get('isArchived'))
+    }
+
+
+class GitHubAPIBackend:
+    """Talks to the GitHub REST and GraphQL APIs (or a stand-in at base_url)."""
+
+    def __init__(self, base_url=None, token=None):
+        self.base_url = (base_url or GITHUB_API_URL).rstrip('/')
+        self.token = token
+        self.token_checked = token is not None
+
+    def get_token(self):
+        """Return an API token from the environment or the gh CLI."""
+        if not self.token_checked:
+            self.token_checked = True
+            self.token = os.environ.get('GITHUB_TOKEN') or os.environ.get('GH_TOKEN')
+            if not self.token:
+                start = time.perf_counter()
+                try:
+                    result = subprocess.run(['gh', 'auth', 'token'], capture_output=True,
+                                            text=True, timeout=REQUEST_TIMEOUT)
+                    if result.returncode == 0:
+                        self.token = result.stdout.strip() or None
+                    record_subprocess('gh auth token', time.perf_counter() - start, result.returncode == 0)
+                except (OSError, subprocess.TimeoutExpired):
+                    record_subprocess('gh auth token', time.perf_counter() - start, False)
+        return self.token
+
+    def request(self, method, path, body=None, etag=None):
+        """Send an API request and return (status, headers, parsed JSON body)."""
+        url = path if path.startswith('http') else self.base_url + path
+        headers = {'Accept': 'application/vnd.github+json',
+                   'User-Agent': 'project-viewer'}
+        token = self.get_token()
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if etag:
+            headers['If-None-Match'] = etag
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(url, data=data, headers=headers, method=method)
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as response:
+                status = response.status
+                return response.status, response.headers, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            status = e.code
+            if e.code == 304:
+                return 304, e.headers, None
+            raise GitHubError(f'{method} {url} failed: HTTP {e.code}')
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise GitHubError(f'{method} {url} failed: {e}')
+        finally:
+            GITHUB_REQUEST_SECONDS.observe(time.perf_counter() - start, method=method, status=status)
+
+    def list_user_repos(self, pages):
+        """Return every repository visible to the authenticated user.
+
+        pages is the cached listing from the previous call, a list of
+        {'etag', 'repos', 'has_next'} dicts. Each page is revalidated with
+        If-None-Match, so unchanged pages cost a 304 and no rate limit.
+        Returns (repos, pages) where repos maps 'owner/repo' to metadata.
+        """
+        if not self.get_token():
+            raise GitHubError('No GitHub token available')
+        new_pages = []
+        page_number = 1
+        while True:
+            cached = pages[page_number - 1] if page_number <= len(pages) else None
+            query = urllib.parse.urlencode({'per_page': PER_PAGE, 'page': page_number})
+            status, headers, body = self.request('GET', f'/user/repos?{query}',
+                                                 etag=cached and cached['etag'])
+            if status == 304:
+                page = cached
+            else:
+                page = {
+                    'etag': headers.get('ETag'),
+                    'repos': {repo['full_name']: repo_from_rest(repo) for repo in body},
+                    'has_next': 'rel="next"' in (headers.get('Link') or '')
+                }
+            new_pages.append(page)
+            if not page['has_next']:
+                break
+            page_number += 1
+
+        repos = {}
+        for page in new_pages:
+            repos.update(page['repos'])
+        return repos, new_pages
+
+    def fetch_repos(self, repo_paths):
+        """Resolve specific repositories with batched GraphQL queries.
+
+        Returns a dict mapping each requested 'owner/repo' to metadata, or
+        None when GitHub reported it NOT_FOUND (missing or not accessible).
+        A repository that failed for another reason is left out, so it is
+        asked again next time. Raises GitHubError when a query returns
+        errors and no data (rate limit, token scope, query error).
+        """
+        if not self.get_token():
+            raise GitHubError('No GitHub token available')
+        results = {}
+        for start in range(0, len(repo_paths), GRAPHQL_BATCH_SIZE):
+            batch = repo_paths[start:start + GRAPHQL_BATCH_SIZE]
+            params = []
+            fields = []
+            variables = {}
+            for i, repo_path in enumerate(batch):
+                owner, name = repo_path.split('/', 1)
+                params.append(f'$o{i}: String!, $n{i}: String!')
+                fields.append(f'r{i}: repository(owner: $o{i}, name: $n{i}) '
+                              '{ isPrivate isArchived stargazerCount defaultBranchRef { name } }')
+                variables[f'o{i}'] = owner
+                variables[f'n{i}'] = name
+            query = f"query({', '.join(params)}) {{ {' '.join(fields)} }}"
+            _, _, body = self.request('POST', '/graphql',
+                                      body={'query': query, 'variables': variables})
+            body = body or {}
+            errors = body.get('errors') or []
+            data = body.get('data')
+            if not data:
+                message = errors[0].get('message') if errors else 'no data in response'
+                raise GitHubError(f'GraphQL query failed: {message}')
+            # Errors name the alias they belong to in 'path', e.g. ['r3']
+            not_found = {error['path'][0] for error in errors
+                         if error.get('type') == 'NOT_FOUND' and error.get('path')}
+            for i, repo_path in enumerate(batch):
+                node = data.get(f'r{i}')
+                if node:
+                    results[repo_path] = repo_from_graphql(node)
+                elif f'r{i}' in not_found:
+                    results[repo_path] = None
+        return results
+
+
+class FakeBackend:
+    """In-memory backend for tests; repos maps 'owner/repo' to metadata."""
+
+    def __init__(self, repos=None, user_repos=None):
+        self.repos = dict(repos or {})
+        self.user_repos = set(self.repos if user_repos is None else user_repos)
+        self.calls = []
+
+    def list_user_repos(self, pages):
+        self.calls.append(('list_user_repos',))
+        repos = {name: self.repos[name] for name in self.user_repos}
+        return repos, [{'etag': None, 'repos': repos, 'has_next': False}]
+
+    def fetch_repos(self, repo_paths):
+        self.calls.append(('fetch_repos', tuple(repo_paths)))
+        return {repo_path: self.repos.get(repo_path) for repo_path in repo_paths}
+
+
+class GitHubMetadata:
+    """TTL cache in front of a backend, persisted to a JSON file."""
+
+    def __init__(self, backend, cache_file=None, ttl=CACHE_TTL):
+        self.backend = backend
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.entries = {}
+        self.pages = []
+        self.retry_at = 0
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load cached metadata and listing ETags from disk."""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.entries = data.get('entries', {})
+            self.pages = data.get('pages', [])
+
+    def save(self):
+        """Write the cache to disk atomically."""
+        if not self.cache_file:
+            return
+        with self.lock:
+            data = {'version': CACHE_VERSION, 'entries': dict(self.entries),
+                    'pages': list(self.pages)}
+        tmp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_file, self.cache_file)
+
+    def cached(self, repo_path, allow_stale=False):
+        """Return cached metadata for a repo, or None if unknown or expired."""
+        with self.lock:
+            entry = self.entries.get(repo_path.lower())
+        if entry and (allow_stale or time.time() - entry['fetched_at'] < self.ttl):
+            return entry['meta']
+        return None
+
+    def is_fresh(self, repo_path):
+        with self.lock:
+            entry = self.entries.get(repo_path.lower())
+        return bool(entry) and time.time() - entry['fetched_at'] < self.ttl
+
+    def store(self, repo_path, meta, now):
+        with self.lock:
+            self.entries[repo_path.lower()] = {'meta': meta, 'fetched_at': now}
+
+    def lookup(self, repo_paths):
+        """Return {repo_path: metadata or None} for the given repos.
+
+        Expired or unknown repos are refreshed with one conditional listing
+        of the user's repos, and whatever is left with batched GraphQL
+        queries. On errors, stale cached values are returned instead.
+        """
+        repo_paths = sorted(set(repo_paths))
+        missing = [repo_path for repo_path in repo_paths if not self.is_fresh(repo_path)]
+        record_cache('github', True, len(repo_paths) - len(missing))
+        record_cache('github', False, len(missing))
+        if missing and time.time() >= self.retry_at:
+            with self.fetch_lock:
+                missing = [repo_path for repo_path in missing if not self.is_fresh(repo_path)]
+                if missing:
+                    self.refresh(missing)
+        return {repo_path: self.cached(repo_path, allow_stale=True) for repo_path in repo_paths}
+
+    def refresh(self, repo_paths):
+        """Fetch metadata for repo_paths from the backend and store it."""
+        now = time.time()
+        remaining = {repo_path.lower(): repo_path for repo_path in repo_paths}
+        try:
+            listed, self.pages = self.backend.list_user_repos(self.pages)
+            for full_name, meta in listed.items():
+                self.store(full_name, meta, now)
+                remaining.pop(full_name.lower(), None)
+            if remaining:
+                fetched = self.backend.fetch_repos(list(remaining.values()))
+                for repo_path, meta in fetched.items():
+                    self.store(repo_path, meta, now)
+                if len(fetched) < len(remaining):
+                    # Some repositories failed for reasons other than NOT_FOUND: back off, then ask again
+                    self.retry_at = now + RETRY_AFTER_ERROR
+        except GitHubError as e:
+            print(f"GitHub metadata lookup failed: {e}")
+            self.retry_at = now + RETRY_AFTER_ERROR
+            return
+        self.save()
+
+
+class FakeGitHubServer:
+    """Local stand-in for api.github.com serving /user/repos and /graphql.
+
+    repos maps 'owner/repo' to metadata dicts. Point GitHubAPIBackend at
+    server.url to exercise the real HTTP code path offline.
+    """
+
+    def __init__(self, repos, host='127.0.0.1', port=0, per_page=PER_PAGE):
+        self.repos = repos
+        self.per_page = per_page
+        self.requests = []
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.url = f'http://{host}:{self.server.server_address[1]}'
+        self.thread = None
+
+    def make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                fake.requests.append(('GET', url.path))
+                if url.path != '/user/repos':
+                    return self.send_json(404, {'message': 'Not Found'})
+                query = urllib.parse.parse_qs(url.query)
+                per_page = int(query.get('per_page', [fake.per_page])[0])
+                page = int(query.get('page', ['1'])[0])
+                names = sorted(fake.repos)
+                chunk = names[(page - 1) * per_page:page * per_page]
+                body = [{
+                    'full_name': name,
+                    'private': fake.repos[name].get('private', False),
+                    'stargazers_count': fake.repos[name].get('stars', 0),
+                    'default_branch': fake.repos[name].get('default_branch', 'main'),
+                    'archived': fake.repos[name].get('archived', False)
+                } for name in chunk]
+                etag = '"%s"' % hashlib.sha1(json.dumps(body).encode('utf-8')).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                headers = {'ETag': etag}
+                if page * per_page < len(names):
+                    headers['Link'] = f'<{fake.url}/user/repos?page={page + 1}>; rel="next"'
+                self.send_json(200, body, headers)
+
+            def do_POST(self):
+                fake.requests.append(('POST', self.path))
+                if self.path != '/graphql':
+                    return self.send_json(404, {'message': 'Not Found'})
+                length = int(self.headers.get('Content-Length', 0))
+                variables = json.loads(self.rfile.read(length)).get('variables', {})
+                data = {}
+                errors = []
+                for key, owner in variables.items():
+                    if not key.startswith('o'):
+                        continue
+                    index = key[1:]
+                    repo_path = f"{owner}/{variables[f'n{index}']}"
+                    meta = fake.repos.get(repo_path)
+                    data[f'r{index}'] = meta and {
+                        'isPrivate': meta.get('private', False),
+                        'isArchived': meta.get('archived', False),
+                        'stargazerCount': meta.get('stars', 0),
+                        'defaultBranchRef': {'name': meta.get('default_branch', 'main')}
+                    }
+                    if meta is None:
+                        # Like GitHub: a null node plus a NOT_FOUND error naming its alias
+                        errors.append({'type': 'NOT_FOUND', 'path': [f'r{index}'],
+                                       'message': f"Could not resolve to a Repository with the name '{repo_path}'."})
+                self.send_json(200, {'data': data, 'errors': errors} if errors else {'data': data})
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    if len(sys.argv) >= 3 and sys.argv[1] == 'serve-fake':
+        with open(sys.argv[2], 'r') as f:
+            repos = json.load(f)
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8765
+        server = FakeGitHubServer(repos, port=port)
+        print(f"Fake GitHub API serving {len(repos)} repos at {server.url}")
+        print(f"Run the viewer with GITHUB_API_URL={server.url} GITHUB_TOKEN=fake")
+        server.server.serve_forever()
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'lookup':
+        metadata = GitHubMetadata(GitHubAPIBackend())
+        for repo_path, meta in metadata.lookup(sys.argv[2:]).items():
+            print(f"{repo_path}: {json.dumps(meta)}")
+    else:
+        print("Usage: python github_meta.py lookup <owner/repo>...")
+        print("       python github_meta.py serve-fake <repos.json> [port]")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
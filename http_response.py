@@ -0,0 +1,63 @@
+"""
+Conditional GET and compression for API responses
+
+Complete (non-streamed) JSON and text responses to GET requests get a
+strong ETag: a hash of the body plus the content coding. A request whose
+If-None-Match still matches is answered with an empty 304. Bodies larger
+than COMPRESS_MIN_BYTES are compressed with brotli when the client accepts
+it and the brotli package is installed (pip install brotli), with gzip
+otherwise. File downloads and streamed responses are left alone.
+"""
+
+import os
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get('PROJECT_VIEWER_COMPRESS_MIN', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # fast enough for per-request compression, close to gzip -9 in size
+ENCODED_TYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+
+def choose_encoding(request, size):
+    """Return 'br', 'gzip' or None for a body of this size."""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def finish_response(request, response):
+    """Add an ETag, answer If-None-Match with 304 and compress the body."""
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in ENCODED_TYPES
+            or 'ETag' in response.headers or 'Content-Encoding' in response.headers):
+        return response
+
+    body = response.get_data()
+    encoding = choose_encoding(request, len(body))
+    # The coding is part of the tag: a gzip body and a plain one are different representations
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    response.vary.add('Accept-Encoding')
+    # Browsers revalidate on every fetch, so a cached body is never shown stale
+    response.headers.setdefault('Cache-Control', 'no-cache')
+
+    response.make_conditional(request)
+    if response.status_code == 304 or not encoding:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,251 @@
+"""
+Background job queue for long-running git/GitHub actions
+
+Endpoints enqueue a job and return its id immediately; a bounded pool of
+worker threads runs the jobs. Jobs on the same project never run at the
+same time: a worker skips queued jobs whose project is busy, so other
+projects keep moving. Every job and its captured output is persisted to a
+JSON file, so finished jobs survive a restart, queued jobs are picked up
+again and jobs that were running are marked interrupted.
+"""
+
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+import subprocess
+
+JOB_WORKERS = int(os.environ.get('PROJECT_VIEWER_JOB_WORKERS', '4'))
+JOB_TIMEOUT = 1800  # seconds a single command of a job may run
+MAX_JOBS = 200  # finished jobs kept in the jobs file
+MAX_LOG_LINES = 2000
+SAVE_INTERVAL = 1.0  # seconds between saves while a job is producing output
+
+# Commands run without a terminal; never let git or ssh wait for a password
+JOB_ENV = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+
+FINISHED = ('succeeded', 'failed', 'interrupted')
+
+
+class JobError(Exception):
+    """Raised by a job function to fail the job with a message."""
+
+
+class JobContext:
+    """Passed to job functions to run commands and write to the job log."""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job = job
+
+    def log(self, line):
+        self.queue.append_log(self.job, line)
+
+    def run(self, cmd, cwd, check=False):
+        """Run a command, streaming its combined stdout/stderr into the job log.
+
+        Returns (returncode, output). Raises JobError when check is set and
+        the command fails.
+        """
+        self.log('$ ' + ' '.join(cmd))
+        try:
+            process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       stdin=subprocess.DEVNULL, text=True, errors='replace', env=JOB_ENV)
+        except OSError as e:
+            raise JobError(f'Could not run {cmd[0]}: {e}')
+        timer = threading.Timer(JOB_TIMEOUT, process.kill)
+        timer.start()
+        output = []
+        try:
+            for line in process.stdout:
+                line = line.rstrip('\n')
+                output.append(line)
+                self.log(line)
+            returncode = process.wait()
+        finally:
+            timer.cancel()
+        output = '\n'.join(output)
+        if check and returncode != 0:
+            raise JobError(output.strip() or f'{cmd[0]} exited with status {returncode}')
+        return returncode, output
+
+
+class JobQueue:
+    """Persistent job queue with per-project serialization."""
+
+    def __init__(self, jobs_file, workers=JOB_WORKERS):
+        self.jobs_file = jobs_file
+        self.workers = workers
+        self.handlers = {}
+        self.jobs = {}
+        self.busy_projects = set()
+        self.changed = threading.Condition()
+        self.last_save = 0
+        self.threads = []
+        self.load()
+
+    def register(self, kind, func):
+        """Register func(context, project, **params) as the handler for a job kind.
+
+        The handler returns a success message or raises JobError.
+        """
+        self.handlers[kind] = func
+
+    def load(self):
+        try:
+            with open(self.jobs_file, 'r') as f:
+                jobs = json.load(f)
+        except (OSError, ValueError):
+            return
+        for job in jobs:
+            if job['status'] == 'running':
+                job['status'] = 'interrupted'
+                job['message'] = 'Server stopped while the job was running'
+                job['finished'] = job['finished'] or time.time()
+            self.jobs[job['id']] = job
+
+    def save(self):
+        """Write all jobs atomically; call with self.changed held."""
+        finished = sorted((job for job in self.jobs.values() if job['status'] in FINISHED),
+                          key=lambda job: job['created'])
+        for job in finished[:-MAX_JOBS]:
+            del self.jobs[job['id']]
+        # A unique temporary file, so two processes saving at once cannot write into each other's
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.jobs_file)),
+                                        prefix=os.path.basename(self.jobs_file) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(sorted(self.jobs.values(), key=lambda job: job['created']), f)
+            os.replace(tmp_file, self.jobs_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+        self.last_save = time.monotonic()
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self.changed:
+            if self.threads:
+                return
+            for i in range(max(1, self.workers)):
+                thread = threading.Thread(target=self.worker, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, kind, project, **params):
+        """Queue a job and return its record."""
+        if kind not in self.handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'project': project,
+            'params': params,
+            'status': 'queued',
+            'message': None,
+            'created': time.time(),
+            'started': None,
+            'finished': None,
+            'log': [],
+            'log_dropped': 0  # lines trimmed from the front of the log
+        }
+        with self.changed:
+            self.jobs[job['id']] = job
+            self.save()
+            self.changed.notify_all()
+        self.start()
+        return dict(job)
+
+    def get(self, job_id):
+        """Return a copy of a job, or None."""
+        with self.changed:
+            job = self.jobs.get(job_id)
+            return dict(job, log=list(job['log'])) if job else None
+
+    def list(self, project=None):
+        """Return all jobs without their logs, newest first."""
+        with self.changed:
+            jobs = [dict(job, log=None) for job in self.jobs.values()
+                    if project is None or job['project'] == project]
+        return sorted(jobs, key=lambda job: job['created'], reverse=True)
+
+    def next_job(self):
+        """Return the oldest queued job whose project is idle; call with self.changed held."""
+        queued = sorted((job for job in self.jobs.values() if job['status'] == 'queued'),
+                        key=lambda job: job['created'])
+        for job in queued:
+            if job['project'] not in self.busy_projects:
+                return job
+        return None
+
+    def worker(self):
+        while True:
+            with self.changed:
+                job = self.next_job()
+                while job is None:
+                    self.changed.wait()
+                    job = self.next_job()
+                job['status'] = 'running'
+                job['started'] = time.time()
+                self.busy_projects.add(job['project'])
+                self.save()
+                self.changed.notify_all()
+            self.execute(job)
+
+    def execute(self, job):
+        context = JobContext(self, job)
+        try:
+            message = self.handlers[job['kind']](context, job['project'], **job['params'])
+            status = 'succeeded'
+        except JobError as e:
+            message = str(e)
+            status = 'failed'
+        except Exception as e:
+            message = f'Unexpected error: {e}'
+            status = 'failed'
+        with self.changed:
+            job['status'] = status
+            job['message'] = message
+            job['finished'] = time.time()
+            self.busy_projects.discard(job['project'])
+            self.save()
+            self.changed.notify_all()
+
+    def append_log(self, job, line):
+        with self.changed:
+            job['log'].append(line)
+            if len(job['log']) > MAX_LOG_LINES:
+                dropped = len(job['log']) - MAX_LOG_LINES
+                del job['log'][:dropped]
+                job['log_dropped'] += dropped
+            if time.monotonic() - self.last_save > SAVE_INTERVAL:
+                self.save()
+            self.changed.notify_all()
+
+    def follow(self, job_id, keepalive=15):
+        """Yield ('log', line) for every log line and finally ('done', job).
+
+        Yields ('keepalive', None) when nothing happened for keepalive seconds.
+        """
+        sent = 0
+        while True:
+            with self.changed:
+                job = self.jobs.get(job_id)
+                if job is None:
+                    return
+                timed_out = False
+                if job['log_dropped'] + len(job['log']) <= sent and job['status'] not in FINISHED:
+                    timed_out = not self.changed.wait(keepalive)
+                lines = job['log'][max(0, sent - job['log_dropped']):]
+                sent = job['log_dropped'] + len(job['log'])
+                finished = job['status'] in FINISHED
+                snapshot = dict(job, log=None) if finished else None
+            if timed_out:
+                yield 'keepalive', None
+            for line in lines:
+                yield 'log', line
+            if finished:
+                yield 'done', snapshot
+                return
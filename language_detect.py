@@ -0,0 +1,99 @@
+"""
+Bounded primary-language detection for project directories
+"""
+
+import os
+import math
+from collections import deque
+
+from file_tree import is_skipped
+
+LANG_MAP = {
+    ".js": "JavaScript", ".ts": "TypeScript", ".py": "Python",
+    ".java": "Java", ".kt": "Kotlin", ".go": "Go",
+    ".rs": "Rust", ".swift": "Swift", ".m": "Objective-C",
+    ".pl": "Prolog", ".pro": "Prolog", ".P": "Prolog",
+    ".sol": "Solidity", ".vy": "Vyper", ".circom": "Circom",
+    ".rb": "Ruby", ".php": "PHP", ".c": "C", ".cpp": "C++",
+    ".cs": "C#", ".lua": "Lua", ".r": "R", ".scala": "Scala",
+    ".clj": "Clojure", ".ex": "Elixir", ".dart": "Dart",
+    ".nim": "Nim", ".zig": "Zig", ".v": "V"
+}
+
+# Maximum number of directory entries looked at per project
+FILE_BUDGET = int(os.environ.get('PROJECT_VIEWER_LANG_BUDGET', '5000'))
+# Weight files by size (like GitHub linguist) instead of counting them
+WEIGHT_BY_BYTES = os.environ.get('PROJECT_VIEWER_LANG_WEIGHTED', '0') == '1'
+# Stop once the leading extension is this many standard deviations ahead
+# of the runner-up, after at least MIN_SAMPLES source files were seen
+DOMINANCE_SIGMA = 3.0
+MIN_SAMPLES = 50
+
+
+def _dominates(counts):
+    """Return True when the leading extension can no longer plausibly be overtaken."""
+    if not counts:
+        return False
+    ranked = sorted(counts.values(), reverse=True)
+    top = ranked[0]
+    second = ranked[1] if len(ranked) > 1 else 0
+    return top - second > DOMINANCE_SIGMA * math.sqrt(top + second)
+
+
+def count_extensions(project_path, file_budget=None, weight_by_bytes=None):
+    """Count source files per extension with a bounded breadth-first scandir walk.
+
+    Hidden directories and SKIP_DIRS are pruned without being entered. The
+    walk stops after file_budget entries, or earlier once one extension
+    clearly dominates. With weight_by_bytes, files count by their size.
+    """
+    file_budget = FILE_BUDGET if file_budget is None else file_budget
+    weight_by_bytes = WEIGHT_BY_BYTES if weight_by_bytes is None else weight_by_bytes
+
+    ext_counts = {}
+    samples = 0
+    seen = 0
+    pending = deque([project_path])
+
+    while pending and seen < file_budget:
+        try:
+            entries = os.scandir(pending.popleft())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                seen += 1
+                if seen > file_budget:
+                    break
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not is_skipped(entry.name):
+                            pending.append(entry.path)
+                        continue
+                except OSError:
+                    continue
+                _, ext = os.path.splitext(entry.name.lower())
+                if ext not in LANG_MAP:
+                    continue
+                weight = 1
+                if weight_by_bytes:
+                    try:
+                        weight = entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+                ext_counts[ext] = ext_counts.get(ext, 0) + weight
+                samples += 1
+
+        if samples >= MIN_SAMPLES and not weight_by_bytes and _dominates(ext_counts):
+            break
+
+    return ext_counts
+
+
+def detect_language(project_path, file_budget=None, weight_by_bytes=None):
+    """Return the primary language of a project, or "Unknown"."""
+    ext_counts = count_extensions(project_path, file_budget, weight_by_bytes)
+    if not ext_counts:
+        return "Unknown"
+    primary_ext = max(ext_counts, key=lambda k: ext_counts.get(k, 0))
+    return LANG_MAP.get(primary_ext, "Unknown")
@@ -0,0 +1,246 @@
+"""
+Request, scan, subprocess and cache metrics in the Prometheus text format
+
+Counters and histograms are kept in memory by this process and rendered
+by render() for the /metrics endpoint. Scans and requests are split into
+named phases with a PhaseTimer, and the latest duration of every phase
+and git command is also kept per project, so slow repositories can be
+found with the debug flag of /api/projects.
+
+Metrics live in the memory of one process. Work done in a process pool
+is run through capture_updates(), which returns the updates instead of
+applying them, and the parent replays them with apply_updates().
+"""
+
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+SERVER_TIMING = os.environ.get('PROJECT_VIEWER_SERVER_TIMING', '0') == '1'
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REGISTRY = []
+captured = None  # list of updates while capture_updates() runs in a pool process
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per combination of label values."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        if captured is not None:
+            captured.append(('inc', self.name, amount, labels))
+            return
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def lines(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        for key, value in values:
+            yield f'{self.name}{format_labels(self.labels, key)} {format_value(value)}'
+
+
+class Histogram:
+    """Observed durations in cumulative buckets, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [per-bucket counts, sum, count]
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        if captured is not None:
+            captured.append(('observe', self.name, value, labels))
+            return
+        key = tuple(str(labels[name]) for name in self.labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if slot < len(self.buckets):
+                entry[0][slot] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def lines(self):
+        with self.lock:
+            values = sorted((key, (list(counts), total, count))
+                            for key, (counts, total, count) in self.values.items())
+        names = self.labels + ('le',)
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{format_labels(names, key + (format_value(bound),))} {cumulative}'
+            yield f'{self.name}_bucket{format_labels(names, key + ("+Inf",))} {count}'
+            yield f'{self.name}_sum{format_labels(self.labels, key)} {format_value(total)}'
+            yield f'{self.name}_count{format_labels(self.labels, key)} {count}'
+
+
+class ProjectTimings:
+    """The latest duration of each phase and git command per project, in milliseconds."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def record(self, project_path, name, seconds):
+        if captured is not None:
+            captured.append(('timing', project_path, name, seconds))
+            return
+        with self.lock:
+            self.entries.setdefault(project_path, {})[name] = round(seconds * 1000, 2)
+
+    def get(self, project_path):
+        with self.lock:
+            return dict(self.entries.get(project_path, {}))
+
+    def prune(self, project_paths):
+        keep = set(project_paths)
+        with self.lock:
+            for project_path in [path for path in self.entries if path not in keep]:
+                del self.entries[project_path]
+
+
+REQUEST_SECONDS = Histogram('project_viewer_request_duration_seconds',
+                            'Time to build a response, by route', ('endpoint', 'method', 'status'))
+REQUEST_PHASE_SECONDS = Histogram('project_viewer_request_phase_seconds',
+                                  'Time spent in each phase of a request', ('endpoint', 'phase'))
+SCAN_PHASE_SECONDS = Histogram('project_viewer_scan_phase_seconds',
+                               'Time spent in each phase of a project scan', ('phase',))
+SUBPROCESS_SECONDS = Histogram('project_viewer_subprocess_duration_seconds',
+                               'Run time of git and gh subprocesses', ('command',))
+SUBPROCESS_FAILURES = Counter('project_viewer_subprocess_failures_total',
+                              'Subprocesses that failed or timed out', ('command',))
+GITHUB_REQUEST_SECONDS = Histogram('project_viewer_github_request_duration_seconds',
+                                   'GitHub API request time', ('method', 'status'))
+CACHE_LOOKUPS = Counter('project_viewer_cache_lookups_total',
+                        'Cache lookups by cache and result (hit or miss)', ('cache', 'result'))
+
+project_timings = ProjectTimings()
+
+
+def record_subprocess(command, seconds, ok=True, project_path=None):
+    """Count one subprocess run, and remember its duration for the project."""
+    SUBPROCESS_SECONDS.observe(seconds, command=command)
+    if not ok:
+        SUBPROCESS_FAILURES.inc(command=command)
+    if project_path:
+        project_timings.record(project_path, command, seconds)
+
+
+def record_cache(cache, hit, count=1):
+    if count:
+        CACHE_LOOKUPS.inc(count, cache=cache, result='hit' if hit else 'miss')
+
+
+def capture_updates(func, *args):
+    """Call func in a pool process and return (result, the metric updates it made)."""
+    global captured
+    captured = []
+    try:
+        return func(*args), captured
+    finally:
+        captured = None
+
+
+def apply_updates(updates):
+    """Apply metric updates returned by capture_updates() in another process."""
+    metrics = {metric.name: metric for metric in REGISTRY}
+    for kind, first, second, third in updates:
+        if kind == 'inc':
+            metrics[first].inc(second, **third)
+        elif kind == 'observe':
+            metrics[first].observe(second, **third)
+        else:
+            project_timings.record(first, second, third)
+
+
+class PhaseTimer:
+    """Splits one scan or request into named phases.
+
+    phase(name) is a context manager; lap(name) ends a phase that started
+    at the previous lap (or when the timer was created). Every phase is
+    observed in the histogram with the timer's labels and, when a project
+    path is given, recorded in project_timings.
+    """
+
+    def __init__(self, histogram, project_path=None, **labels):
+        self.histogram = histogram
+        self.project_path = project_path
+        self.labels = labels
+        self.phases = {}  # phase name -> seconds, in the order they first ran
+        self.started = self.last = time.perf_counter()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.histogram.observe(seconds, phase=name, **self.labels)
+        if self.project_path:
+            project_timings.record(self.project_path, name, self.phases[name])
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.add(name, now - self.last)
+        self.last = now
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Return the phases and the total as a Server-Timing header value."""
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items()]
+        return ', '.join(entries + [f'total;dur={self.elapsed() * 1000:.1f}'])
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help_text}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.lines())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,270 @@
+"""
+Live in-memory project index kept up to date by a filesystem watcher
+
+Watches PROJECTS_DIR, each project's top level and its .git directory with
+watchdog when it is installed, or by polling cheap mtime signatures
+otherwise. Only projects whose files changed are rescanned, and every change
+bumps a sequence number so clients can ask for "projects changed since N".
+"""
+
+import os
+import time
+import threading
+
+from scan_cache import project_signature
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+POLL_INTERVAL = float(os.environ.get('PROJECT_VIEWER_POLL_INTERVAL', '2'))
+DEBOUNCE = 0.5  # seconds to wait for a burst of events to settle before rescanning
+
+
+def list_projects(projects_dir):
+    """Return the sorted project directories under projects_dir."""
+    project_paths = []
+    try:
+        names = sorted(os.listdir(projects_dir))
+    except OSError:
+        return project_paths
+    for item in names:
+        item_path = os.path.join(projects_dir, item)
+        if os.path.isdir(item_path) and not item.startswith('.'):
+            project_paths.append(item_path)
+    return project_paths
+
+
+def _comparable(project_info):
+    """Return the part of a record that decides whether a project really changed."""
+    return {key: value for key, value in project_info.items() if key != 'scan'}
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the index."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_any_event(self, event):
+        self.index.notify_path(event.src_path)
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.index.notify_path(dest_path)
+
+
+class ProjectIndex:
+    """In-memory index of scanned projects with a sequence-numbered change feed.
+
+    rescan(project_paths) must return fresh records for the given paths in
+    the same order. The index is seeded with a full scan result and from
+    then on only rescans projects reported by the watcher.
+    """
+
+    def __init__(self, projects_dir, rescan, poll_interval=POLL_INTERVAL, use_watchdog=True):
+        self.projects_dir = os.path.abspath(projects_dir)
+        self.rescan = rescan
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.projects = {}
+        self.changed_at = {}
+        self.removed_at = {}
+        self.signatures = {}
+        self.seq = 0
+        self.ready = False
+        self.dirty = set()
+        self.listing_dirty = False
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.observer = None
+        self.watches = {}
+        self.stopped = False
+
+    def seed(self, records):
+        """Load a complete scan and start watching for changes.
+
+        Seeding an index that is already live (e.g. after a forced refresh)
+        publishes the differences as regular changes instead.
+        """
+        with self.lock:
+            live = self.ready
+            if not live:
+                for project_info in records:
+                    self.projects[project_info['path']] = project_info
+                self.signatures = {path: project_signature(path) for path in self.projects}
+                # Projects whose scan failed or timed out are retried right away
+                self.dirty.update(project_info['path'] for project_info in records
+                                  if project_info.get('scan_error'))
+                self.ready = True
+        if live:
+            with self.lock:
+                removed = set(self.projects) - {project_info['path'] for project_info in records}
+            self.publish(records, removed)
+            return
+        threading.Thread(target=self.worker, name='project-index', daemon=True).start()
+        if self.use_watchdog:
+            self.start_observer()
+        else:
+            threading.Thread(target=self.poller, name='project-index-poll', daemon=True).start()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.wakeup.notify_all()
+        if self.observer:
+            self.observer.stop()
+
+    def start_observer(self):
+        self.observer = Observer()
+        self.observer.schedule(_EventHandler(self), self.projects_dir, recursive=False)
+        for project_path in list(self.projects):
+            self.watch_project(project_path)
+        self.observer.start()
+
+    def watch_project(self, project_path):
+        """Watch a project's top level and its .git directory (both non-recursive)."""
+        if not self.observer or project_path in self.watches:
+            return
+        handler = _EventHandler(self)
+        watches = []
+        for path in (project_path, os.path.join(project_path, '.git')):
+            if os.path.isdir(path):
+                try:
+                    watches.append(self.observer.schedule(handler, path, recursive=False))
+                except OSError:
+                    pass
+        self.watches[project_path] = watches
+
+    def unwatch_project(self, project_path):
+        for watch in self.watches.pop(project_path, []):
+            try:
+                self.observer.unschedule(watch)
+            except (KeyError, OSError):
+                pass
+
+    def notify_path(self, path):
+        """Mark the project containing path as dirty."""
+        path = os.path.abspath(path)
+        rel_path = os.path.relpath(path, self.projects_dir)
+        if rel_path.startswith('..'):
+            return
+        with self.lock:
+            if rel_path == '.' or os.sep not in rel_path:
+                # An entry directly under PROJECTS_DIR: a project was added,
+                # removed, or its directory mtime changed.
+                self.listing_dirty = True
+            if rel_path != '.':
+                self.dirty.add(os.path.join(self.projects_dir, rel_path.split(os.sep)[0]))
+            self.wakeup.notify()
+
+    def poller(self):
+        """Polling fallback: compare cheap mtime signatures every poll_interval."""
+        while not self.stopped:
+            time.sleep(self.poll_interval)
+            current = list_projects(self.projects_dir)
+            changed = []
+            with self.lock:
+                known = set(self.projects)
+            if set(current) != known:
+                with self.lock:
+                    self.listing_dirty = True
+            for project_path in current:
+                signature = project_signature(project_path)
+                if self.signatures.get(project_path) != signature:
+                    changed.append(project_path)
+            if changed or set(current) != known:
+                with self.lock:
+                    self.dirty.update(changed)
+                    self.wakeup.notify()
+
+    def worker(self):
+        """Rescan dirty projects in batches and publish the changes."""
+        while True:
+            with self.lock:
+                while not self.stopped and not self.dirty and not self.listing_dirty:
+                    self.wakeup.wait()
+                if self.stopped:
+                    return
+            # Let a burst of events (e.g. a git checkout) settle first
+            time.sleep(DEBOUNCE)
+            with self.lock:
+                dirty = self.dirty
+                listing_dirty = self.listing_dirty
+                self.dirty = set()
+                self.listing_dirty = False
+            try:
+                self.apply_changes(dirty, listing_dirty)
+            except Exception as e:
+                print(f"Project index update failed: {e}")
+
+    def apply_changes(self, dirty, listing_dirty):
+        existing = set(list_projects(self.projects_dir))
+        with self.lock:
+            known = set(self.projects)
+        removed = known - existing if listing_dirty else set()
+        added = existing - known if listing_dirty else set()
+        to_scan = sorted((dirty & existing) | added)
+
+        records = self.rescan(to_scan) if to_scan else []
+        self.publish(records, removed)
+
+    def publish(self, records, removed=()):
+        """Store fresh records and removals, bumping seq for real changes only."""
+        signatures = {project_info['path']: project_signature(project_info['path'])
+                      for project_info in records}
+        added = []
+
+        with self.lock:
+            for project_path in removed:
+                project_info = self.projects.pop(project_path, None)
+                self.signatures.pop(project_path, None)
+                self.changed_at.pop(project_path, None)
+                if project_info:
+                    self.seq += 1
+                    self.removed_at[project_info['name']] = self.seq
+            for project_info in records:
+                project_path = project_info['path']
+                self.signatures[project_path] = signatures[project_path]
+                previous = self.projects.get(project_path)
+                if previous is None:
+                    added.append(project_path)
+                elif _comparable(previous) == _comparable(project_info):
+                    continue
+                self.seq += 1
+                self.projects[project_path] = project_info
+                self.changed_at[project_path] = self.seq
+                self.removed_at.pop(project_info['name'], None)
+
+        for project_path in removed:
+            self.unwatch_project(project_path)
+        for project_path in added:
+            self.watch_project(project_path)
+
+    def touch(self, project_paths):
+        """Report projects as changed without rescanning them.
+
+        Used when data attached to records at response time (such as the
+        large-file push risk) was refreshed, so polling clients refetch them.
+        """
+        with self.lock:
+            for project_path in project_paths:
+                if project_path in self.projects:
+                    self.seq += 1
+                    self.changed_at[project_path] = self.seq
+
+    def snapshot(self):
+        """Return (seq, records sorted by path) for every indexed project."""
+        with self.lock:
+            records = [dict(self.projects[path]) for path in sorted(self.projects)]
+            return self.seq, records
+
+    def changes_since(self, since):
+        """Return (seq, changed records, removed project names) after sequence since."""
+        with self.lock:
+            changed = [dict(self.projects[path]) for path in sorted(self.changed_at)
+                       if self.changed_at[path] > since]
+            removed = sorted(name for name, seq in self.removed_at.items() if seq > since)
+            return self.seq, changed, removed
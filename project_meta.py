@@ -0,0 +1,157 @@
+"""
+Cached, validated access to .project-meta.json files
+
+Parsed metadata is cached by the file's (mtime, size), so a file is only
+read again after it changes. Every file is checked against a schema
+modeled on sample-project-meta.json; problems are reported per project
+instead of being hidden. Writes merge into the existing file under a
+per-project lock and replace it atomically.
+"""
+
+import os
+import json
+import datetime
+import threading
+
+from metrics import record_cache
+
+META_FILE = '.project-meta.json'
+STATUSES = ('active', 'inactive', 'archived')
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class MetadataError(Exception):
+    """Raised when metadata cannot be saved; errors lists the problems."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or [message]
+
+
+def check_text(value):
+    return None if isinstance(value, str) else 'must be a string'
+
+
+def check_status(value):
+    if value not in STATUSES:
+        return f"must be one of {', '.join(STATUSES)}"
+    return None
+
+
+def check_string_list(value):
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        return 'must be a list of strings'
+    return None
+
+
+def check_date(value):
+    try:
+        datetime.datetime.strptime(value, DATE_FORMAT)
+    except (TypeError, ValueError):
+        return 'must be a date like 2023-01-15'
+    return None
+
+
+# Known fields and their checks; other fields are kept as they are
+SCHEMA = {
+    'description': check_text,
+    'status': check_status,
+    'category': check_text,
+    'technologies': check_string_list,
+    'created': check_date,
+    'lastActive': check_date,
+    'purpose': check_text,
+    'notes': check_text
+}
+
+
+def validate(metadata):
+    """Return a list of problems with a metadata object (empty when valid)."""
+    if not isinstance(metadata, dict):
+        return ['metadata must be a JSON object']
+    errors = []
+    for field, check in SCHEMA.items():
+        if field in metadata:
+            problem = check(metadata[field])
+            if problem:
+                errors.append(f'{field} {problem}')
+    return errors
+
+
+def read_meta_file(meta_file):
+    """Parse and validate a metadata file; returns (metadata, errors)."""
+    try:
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, UnicodeDecodeError) as e:
+        return {}, [f'cannot read {META_FILE}: {e}']
+    except ValueError as e:
+        return {}, [f'invalid JSON in {META_FILE}: {e}']
+    errors = validate(metadata)
+    if not isinstance(metadata, dict):
+        metadata = {}
+    return metadata, errors
+
+
+class MetadataStore:
+    """Reads and writes .project-meta.json files with a (mtime, size) keyed cache."""
+
+    def __init__(self):
+        self.entries = {}  # meta file path -> (mtime_ns, size, metadata, errors)
+        self.lock = threading.Lock()
+        self.write_locks = {}
+
+    def load(self, project_path):
+        """Return (metadata, errors) for a project; ({}, []) when it has no file."""
+        meta_file = os.path.join(project_path, META_FILE)
+        try:
+            st = os.stat(meta_file)
+        except OSError:
+            with self.lock:
+                self.entries.pop(meta_file, None)
+            return {}, []
+        with self.lock:
+            entry = self.entries.get(meta_file)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            record_cache('metadata', True)
+            return dict(entry[2]), list(entry[3])
+        record_cache('metadata', False)
+        metadata, errors = read_meta_file(meta_file)
+        with self.lock:
+            self.entries[meta_file] = (st.st_mtime_ns, st.st_size, metadata, errors)
+        return dict(metadata), list(errors)
+
+    def write_lock(self, meta_file):
+        with self.lock:
+            return self.write_locks.setdefault(meta_file, threading.Lock())
+
+    def update(self, project_path, changes):
+        """Merge changes into a project's metadata and write it atomically.
+
+        Only the changed fields are validated, so a file with an old problem
+        can still be fixed one field at a time. Returns the saved metadata.
+        Raises MetadataError for invalid changes or an unparseable file.
+        """
+        errors = validate(changes)
+        if errors:
+            raise MetadataError('Invalid metadata: ' + '; '.join(errors), errors)
+        meta_file = os.path.join(project_path, META_FILE)
+        with self.write_lock(meta_file):
+            metadata = {}
+            if os.path.exists(meta_file):
+                metadata, errors = read_meta_file(meta_file)
+                if not metadata and errors:
+                    # Never overwrite a file we could not parse
+                    raise MetadataError(errors[0], errors)
+            metadata.update(changes)
+            tmp_file = f'{meta_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(metadata, f, indent=2)
+                    f.write('\n')
+                os.replace(tmp_file, meta_file)
+            except OSError:
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
+                raise
+        return metadata
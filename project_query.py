@@ -0,0 +1,132 @@
+"""
+Server-side filtering, sorting, paging and facets for the project list
+
+A ProjectCatalog is built once from the scan records and annotations and
+holds secondary indexes: project names by language, by type and by
+status, a lower-cased search text per project, and sort orders computed
+on first use. A query intersects the index sets, applies the text search
+to what is left and slices the requested page out of the sort order, so
+only the visible page has to be decorated and sent to the browser.
+"""
+
+DEFAULT_PAGE_SIZE = 60
+MAX_PAGE_SIZE = 500
+
+# Status filter name -> predicate on a project record with its annotation and worktree status
+STATUS_FILTERS = {
+    'no-git': lambda project: not project.get('has_git'),
+    'no-remote': lambda project: not project.get('has_remote'),
+    'no-readme': lambda project: not project.get('readme_exists'),
+    'annotated': lambda project: is_annotated(project.get('annotation')),
+    'dirty': lambda project: bool((project.get('worktree') or {}).get('dirty')),
+    'unpushed': lambda project: (project.get('worktree') or {}).get('ahead', 0) > 0,
+    'behind': lambda project: (project.get('worktree') or {}).get('behind', 0) > 0
+}
+
+# Sort name -> key function; a leading '-' on the sort parameter reverses it
+SORT_KEYS = {
+    'name': lambda project: project['name'].lower(),
+    'modified': lambda project: ('' if project.get('last_modified') == 'Unknown'
+                                 else project.get('last_modified') or ''),
+    'language': lambda project: ((project.get('language') or '').lower(), project['name'].lower()),
+    'type': lambda project: ((project.get('type') or '').lower(), project['name'].lower()),
+    'activity': lambda project: (project.get('activity') or {}).get('last_commit') or 0
+}
+
+# Request parameters that switch /api/projects to a paged response
+QUERY_PARAMS = ('language', 'type', 'status', 'q', 'sort', 'limit', 'offset')
+
+
+class QueryError(ValueError):
+    """Raised for invalid query parameters."""
+
+
+def is_annotated(annotation):
+    return bool(annotation and (annotation.get('notes') or '').strip())
+
+
+def parse_query(args):
+    """Turn request arguments into a query dict; raises QueryError when invalid."""
+    status = args.get('status') or None
+    if status and status not in STATUS_FILTERS:
+        raise QueryError(f"Unknown status filter: {status}")
+    sort = args.get('sort') or 'name'
+    if sort.lstrip('-') not in SORT_KEYS:
+        raise QueryError(f"Unknown sort: {sort}")
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        raise QueryError('limit and offset must be integers')
+    if limit < 1 or offset < 0:
+        raise QueryError('limit must be positive and offset not negative')
+    return {
+        'language': args.get('language') or None,
+        'type': args.get('type') or None,
+        'status': status,
+        'q': (args.get('q') or '').strip().lower(),
+        'sort': sort,
+        'limit': min(limit, MAX_PAGE_SIZE),
+        'offset': offset
+    }
+
+
+class ProjectCatalog:
+    """Project records with secondary indexes for filtering and facet counts."""
+
+    def __init__(self, projects):
+        self.projects = {project['name']: project for project in projects}
+        self.by_language = {}
+        self.by_type = {}
+        self.by_status = {status: set() for status in STATUS_FILTERS}
+        self.search_text = {}
+        self.orders = {}
+
+        for name, project in self.projects.items():
+            self.by_language.setdefault(project.get('language') or 'Unknown', set()).add(name)
+            self.by_type.setdefault(project.get('type') or 'Unknown', set()).add(name)
+            for status, matches in STATUS_FILTERS.items():
+                if matches(project):
+                    self.by_status[status].add(name)
+            annotation = project.get('annotation') or {}
+            self.search_text[name] = '\n'.join(
+                [name, annotation.get('notes') or ''] + list(annotation.get('tags') or [])).lower()
+
+        self.facets = {
+            'total': len(self.projects),
+            'git': len(self.projects) - len(self.by_status['no-git']),
+            'remote': len(self.projects) - len(self.by_status['no-remote']),
+            'annotated': len(self.by_status['annotated']),
+            'dirty': len(self.by_status['dirty']),
+            'unpushed': len(self.by_status['unpushed']),
+            'languages': {language: len(names) for language, names in sorted(self.by_language.items())},
+            'types': {project_type: len(names) for project_type, names in sorted(self.by_type.items())},
+            'statuses': {status: len(names) for status, names in self.by_status.items()}
+        }
+
+    def order(self, sort):
+        """Return project names in sort order, computed once per sort."""
+        if sort not in self.orders:
+            key = SORT_KEYS[sort.lstrip('-')]
+            names = sorted(self.projects, key=lambda name: key(self.projects[name]),
+                           reverse=sort.startswith('-'))
+            self.orders[sort] = names
+        return self.orders[sort]
+
+    def query(self, query):
+        """Return (matched count, projects on the requested page)."""
+        selected = None
+        for index, value in ((self.by_language, query['language']), (self.by_type, query['type']),
+                             (self.by_status, query['status'])):
+            if value is not None:
+                names = index.get(value, set())
+                selected = names if selected is None else selected & names
+        if query['q']:
+            candidates = self.projects if selected is None else selected
+            selected = {name for name in candidates if query['q'] in self.search_text[name]}
+
+        names = self.order(query['sort'])
+        if selected is not None:
+            names = [name for name in names if name in selected]
+        page = names[query['offset']:query['offset'] + query['limit']]
+        return len(names), [self.projects[name] for name in page]
@@ -1,98 +1,279 @@
 #!/usr/bin/env python3
 """
 Commit and push all repositories with changes
+
+Repositories are discovered under a projects directory and processed
+concurrently. Local steps (status, add, commit) run in a thread pool; the
+network push additionally takes a per-host slot so a single git server is
+not hit by every worker at once. Transient push failures are retried with
+exponential backoff, progress is printed as each repository finishes, and
+a JSON summary can be written for other tools.
 """
 
 import os
-import subprocess
+import re
 import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def check_and_push_repo(repo_path, repo_name):
-    """Check if repo has changes and push if needed."""
-    try:
-        # Check if there are uncommitted changes
-        status = subprocess.run(['git', 'status', '--porcelain'], 
-                              cwd=repo_path, capture_output=True, text=True)
-        
-        if status.stdout.strip():
-            print(f"\n📝 {repo_name}: Has uncommitted changes")
-            
-            # Add all changes (ignore submodule warnings)
-            subprocess.run(['git', 'add', '.'], cwd=repo_path, capture_output=True)
-            
-            # Commit
-            commit_result = subprocess.run(['git', 'commit', '-m', 'Update project files'], 
-                                         cwd=repo_path, capture_output=True, text=True)
-            
-            if commit_result.returncode == 0:
-                print(f"   ✓ Committed changes")
-            else:
-                print(f"   ⚠ Commit failed or nothing to commit")
-        
-        # Check if we need to push
-        push_check = subprocess.run(['git', 'status', '-sb'], 
-                                  cwd=repo_path, capture_output=True, text=True)
-        
-        if 'ahead' in push_check.stdout or not 'origin' in push_check.stdout:
-            print(f"   🚀 Pushing to remote...")
-            
-            # Get current branch
-            branch_result = subprocess.run(['git', 'branch', '--show-current'], 
-                                         cwd=repo_path, capture_output=True, text=True)
-            branch = branch_result.stdout.strip() or 'main'
-            
-            # Push
-            push_result = subprocess.run(['git', 'push', '-u', 'origin', branch], 
-                                       cwd=repo_path, capture_output=True, text=True)
-            
-            if push_result.returncode == 0:
-                print(f"   ✓ Pushed successfully")
-                return "pushed"
+from git_reader import read_repo_info
+from project_index import list_projects
+from worktree_status import parse_status
+
+DEFAULT_PROJECTS_DIR = os.path.expanduser("~/Documents/dev")
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 4
+DEFAULT_RETRIES = 3
+BACKOFF_BASE = 2.0  # seconds before the first retry, doubled after each attempt
+PUSH_TIMEOUT = 300
+LOCAL_TIMEOUT = 60
+COMMIT_MESSAGE = 'Update project files'
+
+# stderr fragments of push failures worth retrying (network or server hiccups)
+TRANSIENT_ERRORS = re.compile(
+    r'could not resolve host|connection (timed out|reset|refused|closed)|'
+    r'operation timed out|failed to connect|couldn.t connect to server|early eof|'
+    r'remote end hung up|rpc failed|'
+    r'ssh: connect to host|kex_exchange_identification|'
+    r'the requested url returned error: (429|5\d\d)|temporary failure|try again',
+    re.IGNORECASE)
+
+# Never let git wait for credentials on a terminal nobody is watching
+GIT_ENV = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+# Used for pushes only when neither the environment nor the repository config chooses an ssh command
+BATCH_SSH_COMMAND = 'ssh -o BatchMode=yes'
+
+
+def remote_host(url):
+    """Return the host name of a git remote URL, or None for local paths."""
+    if not url:
+        return None
+    match = re.match(r'^[a-z][a-z0-9+.-]*://(?:[^@/]+@)?([^:/]+)', url, re.IGNORECASE)
+    if match:
+        return match.group(1).lower()
+    # scp-like syntax: [user@]host:path
+    match = re.match(r'^(?:[^@/]+@)?([^:/]+):', url)
+    if match:
+        return match.group(1).lower()
+    return None
+
+
+def discover_repos(projects_dir, names=None):
+    """Return a list of {name, path, host} for git repositories with an origin remote."""
+    repos = []
+    for path in list_projects(projects_dir):
+        name = os.path.basename(path)
+        if names and name not in names:
+            continue
+        info = read_repo_info(path)
+        if info is None:
+            continue
+        origin = info['remotes'].get('origin')
+        if not origin:
+            continue
+        repos.append({'name': name, 'path': path, 'host': remote_host(origin) or 'local'})
+    return repos
+
+
+def git(repo_path, args, timeout=LOCAL_TIMEOUT):
+    return subprocess.run(['git'] + args, cwd=repo_path, capture_output=True, text=True,
+                          timeout=timeout, env=GIT_ENV, stdin=subprocess.DEVNULL)
+
+
+def push_args(repo_path, branch):
+    """Return the git arguments for a push, keeping ssh from prompting.
+
+    A configured core.sshCommand, GIT_SSH_COMMAND or GIT_SSH (custom keys,
+    agents, wrappers) is left alone; otherwise ssh runs in batch mode.
+    """
+    args = ['push', '-u', 'origin', branch]
+    if 'GIT_SSH_COMMAND' in os.environ or 'GIT_SSH' in os.environ:
+        return args
+    if git(repo_path, ['config', '--get', 'core.sshCommand']).returncode == 0:
+        return args
+    return ['-c', f'core.sshCommand={BATCH_SSH_COMMAND}'] + args
+
+
+def read_status(repo_path):
+    """Return (branch, upstream, ahead, dirty) from a single porcelain v2 status call."""
+    result = git(repo_path, ['status', '--porcelain=v2', '--branch'])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or 'git status failed')
+    status = parse_status(result.stdout)
+    return status['branch'], status['upstream'], status['ahead'], status['dirty']
+
+
+class PushEngine:
+    """Runs check-commit-push over many repositories with bounded concurrency."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, retries=DEFAULT_RETRIES,
+                 commit=True, dry_run=False, progress=None):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.commit = commit
+        self.dry_run = dry_run
+        self.progress = progress or (lambda result: None)
+        self.host_slots = {}
+        self.host_slots_lock = threading.Lock()
+
+    def host_slot(self, host):
+        with self.host_slots_lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self.host_slots[host]
+
+    def push(self, repo, branch, result):
+        """Push a branch, retrying transient failures with exponential backoff and jitter."""
+        args = push_args(repo['path'], branch)
+        for attempt in range(1, self.retries + 2):
+            result['attempts'] = attempt
+            with self.host_slot(repo['host']):
+                try:
+                    push = git(repo['path'], args, timeout=PUSH_TIMEOUT)
+                    error = push.stderr.strip() if push.returncode != 0 else None
+                except subprocess.TimeoutExpired:
+                    error = f'push timed out after {PUSH_TIMEOUT}s'
+            if error is None:
+                return None
+            transient = error.startswith('push timed out') or TRANSIENT_ERRORS.search(error)
+            if not transient or attempt > self.retries:
+                return error
+            time.sleep(BACKOFF_BASE * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+        return error
+
+    def process(self, repo):
+        """Commit (optionally) and push one repository; returns its result record."""
+        start = time.perf_counter()
+        result = {
+            'name': repo['name'],
+            'path': repo['path'],
+            'host': repo['host'],
+            'status': None,
+            'branch': None,
+            'committed': False,
+            'attempts': 0,
+            'error': None
+        }
+        try:
+            branch, upstream, ahead, dirty = read_status(repo['path'])
+            result['branch'] = branch
+            if branch is None:
+                result['status'] = 'skipped'
+                result['error'] = 'detached HEAD'
+                return result
+            if dirty and self.commit:
+                if self.dry_run:
+                    result['committed'] = True
+                else:
+                    add = git(repo['path'], ['add', '.'])
+                    if add.returncode != 0:
+                        raise RuntimeError(add.stderr.strip() or 'git add failed')
+                    commit = git(repo['path'], ['commit', '-m', COMMIT_MESSAGE])
+                    result['committed'] = commit.returncode == 0
+                if result['committed']:
+                    ahead += 1
+
+            if upstream and ahead == 0:
+                result['status'] = 'up_to_date'
+            elif self.dry_run:
+                result['status'] = 'would_push'
             else:
-                print(f"   ❌ Push failed: {push_result.stderr}")
-                return "failed"
-        else:
-            print(f"✓ {repo_name}: Already up to date")
-            return "up_to_date"
-            
-    except Exception as e:
-        print(f"❌ {repo_name}: Error - {str(e)}")
-        return "error"
+                result['error'] = self.push(repo, branch, result)
+                result['status'] = 'failed' if result['error'] else 'pushed'
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            result['status'] = 'error'
+            result['error'] = str(e)
+        finally:
+            result['duration'] = round(time.perf_counter() - start, 3)
+        return result
 
-def main():
-    base_dir = "../"
-    
-    # List of repos that have SSH remotes (from previous output)
-    repos_with_remotes = [
-        'PluginsAPIDemo', 'SchwinnBTCapture', 'ags', 'besu', 'blockscout',
-        'canton-local', 'circom', 'dumpproxies', 'eth_explorer', 'kurtosis-cdk',
-        'pgpool', 'polygon-cli', 'pypoll', 'stark101', 'theLMbook', 'zk-demo',
-        'zkp-test', 'music', 'zkp-test-book', 'addr', 'circpl', 'codedoc',
-        'llm-queue', 'ppt', 'project-viewer', 'psych', 'ava', 'dynreact',
-        'local-rag', 'podman-besu', 'repo_agent', 'sampo', 'sql_gpt'
-    ]
-    
-    print(f"Checking and pushing repositories...\n")
-    
-    results = {
-        'pushed': 0,
-        'up_to_date': 0,
-        'failed': 0,
-        'error': 0
+    def run(self, repos):
+        """Process repositories concurrently, reporting each as it finishes."""
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = [executor.submit(self.process, repo) for repo in repos]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                self.progress(result)
+        return sorted(results, key=lambda result: result['name'])
+
+
+def summarize(results, duration):
+    """Build the machine-readable summary of a run."""
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return {
+        'duration': round(duration, 3),
+        'total': len(results),
+        'counts': counts,
+        'repos': results
     }
-    
-    for repo in sorted(repos_with_remotes):
-        repo_path = os.path.join(base_dir, repo)
-        
-        if os.path.exists(repo_path):
-            result = check_and_push_repo(repo_path, repo)
-            results[result] = results.get(result, 0) + 1
-    
-    print(f"\n📊 Summary:")
-    print(f"   Pushed: {results['pushed']}")
-    print(f"   Already up to date: {results['up_to_date']}")
-    print(f"   Failed: {results['failed']}")
-    print(f"   Errors: {results['error']}")
+
+
+def print_progress(result, stream):
+    icons = {'pushed': '✓', 'would_push': '🚀', 'up_to_date': '·', 'skipped': '-', 'failed': '❌', 'error': '❌'}
+    line = f"{icons.get(result['status'], '?')} {result['name']}: {result['status']}"
+    if result['committed']:
+        line += ' (committed changes)'
+    if result['attempts'] > 1:
+        line += f" after {result['attempts']} attempts"
+    if result['error']:
+        line += f" - {result['error'].splitlines()[-1]}"
+    print(line, file=stream, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Commit and push all repositories with changes.')
+    parser.add_argument('projects_dir', nargs='?', default=DEFAULT_PROJECTS_DIR,
+                        help=f'directory containing the repositories (default: {DEFAULT_PROJECTS_DIR})')
+    parser.add_argument('--repo', action='append', dest='repos',
+                        help='only process this repository (can be repeated)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'repositories processed at once (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST,
+                        help=f'concurrent pushes per git host (default: {DEFAULT_PER_HOST})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'retries for transient push failures (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--no-commit', action='store_true', help='push existing commits only')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be committed and pushed')
+    parser.add_argument('--json', action='store_true',
+                        help='print the JSON summary to stdout (progress goes to stderr)')
+    parser.add_argument('--summary', help='also write the JSON summary to this file')
+    args = parser.parse_args()
+
+    projects_dir = os.path.expanduser(args.projects_dir)
+    progress_stream = sys.stderr if args.json else sys.stdout
+    repos = discover_repos(projects_dir, set(args.repos) if args.repos else None)
+    print(f"Checking and pushing {len(repos)} repositories in {projects_dir}...\n", file=progress_stream)
+
+    engine = PushEngine(workers=args.workers, per_host=args.per_host, retries=args.retries,
+                        commit=not args.no_commit, dry_run=args.dry_run,
+                        progress=lambda result: print_progress(result, progress_stream))
+    start = time.perf_counter()
+    summary = summarize(engine.run(repos), time.perf_counter() - start)
+
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"\n📊 Summary ({summary['duration']:.1f}s):")
+        for status, count in sorted(summary['counts'].items()):
+            print(f"   {status}: {count}")
+
+    failed = summary['counts'].get('failed', 0) + summary['counts'].get('error', 0)
+    sys.exit(1 if failed else 0)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,93 @@
+"""
+Persistent scan cache for project directories
+"""
+
+import os
+import json
+import threading
+
+# Files whose mtimes decide whether a cached scan is still valid. The project
+# directory itself changes whenever a top-level entry is added or removed.
+SIGNATURE_PATHS = ['', '.git', os.path.join('.git', 'HEAD'),
+                   os.path.join('.git', 'config'), '.project-meta.json']
+
+CACHE_VERSION = 2  # bumped when scan records gain fields
+
+
+def project_signature(project_path):
+    """Return the list of mtimes used to validate a cached scan."""
+    signature = []
+    for rel_path in SIGNATURE_PATHS:
+        try:
+            signature.append(os.stat(os.path.join(project_path, rel_path)).st_mtime_ns)
+        except OSError:
+            signature.append(None)
+    return signature
+
+
+class ScanCache:
+    """On-disk cache of scan_project() results keyed by project path."""
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load cached entries from disk, discarding unreadable or stale caches."""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        """Write the cache to disk if it changed, replacing the file atomically."""
+        with self.lock:
+            if not self.dirty:
+                return
+            # A snapshot: put() and prune() may run in other threads while it is written
+            data = {'version': CACHE_VERSION, 'entries': dict(self.entries)}
+            self.dirty = False
+        tmp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            with self.lock:
+                self.dirty = True
+            raise
+
+    def get(self, project_path, signature=None):
+        """Return the cached scan for a project, or None if missing or stale."""
+        if signature is None:
+            signature = project_signature(project_path)
+        with self.lock:
+            entry = self.entries.get(project_path)
+        if entry and entry['signature'] == signature:
+            return entry['info']
+        return None
+
+    def put(self, project_path, info, signature=None):
+        """Store a fresh scan result for a project."""
+        if signature is None:
+            signature = project_signature(project_path)
+        with self.lock:
+            self.entries[project_path] = {'signature': signature, 'info': info}
+            self.dirty = True
+
+    def prune(self, project_paths):
+        """Drop entries for projects that no longer exist."""
+        keep = set(project_paths)
+        with self.lock:
+            for path in list(self.entries):
+                if path not in keep:
+                    del self.entries[path]
+                    self.dirty = True
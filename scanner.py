@@ -0,0 +1,89 @@
+"""
+Parallel project scanning engine
+"""
+
+import os
+import time
+import concurrent.futures
+
+from metrics import capture_updates, apply_updates
+
+# Defaults can be overridden through the environment without touching the code
+SCAN_WORKERS = int(os.environ.get('PROJECT_VIEWER_SCAN_WORKERS', '16'))
+SCAN_MODE = os.environ.get('PROJECT_VIEWER_SCAN_MODE', 'thread')  # 'thread' or 'process'
+SCAN_TIMEOUT = float(os.environ.get('PROJECT_VIEWER_SCAN_TIMEOUT', '30'))
+POLL_INTERVAL = 0.05  # seconds between checks for projects that ran past the timeout
+
+
+def _timed_scan(scan_func, project_path, capture=False):
+    """Run scan_func and return its result, the elapsed time and the metric updates.
+
+    With capture (in a pool process) the metric updates are returned
+    for the parent to apply, since the worker's own metrics are never read.
+    """
+    start = time.perf_counter()
+    if capture:
+        info, updates = capture_updates(scan_func, project_path)
+    else:
+        info, updates = scan_func(project_path), None
+    return info, time.perf_counter() - start, updates
+
+
+def iter_scan_projects(project_paths, scan_func, workers=None, mode=None, timeout=None):
+    """Scan projects concurrently, yielding results in completion order.
+
+    Each result is a dict with 'path', 'info', 'duration' (seconds) and 'error'.
+    The timeout applies to each project from the moment a worker starts it,
+    so projects waiting in the queue never time out. A project still running
+    after the timeout is reported with info=None and error='timeout'; its
+    worker is abandoned, not waited for.
+    """
+    workers = workers or SCAN_WORKERS
+    mode = mode or SCAN_MODE
+    timeout = SCAN_TIMEOUT if timeout is None else timeout
+
+    if not project_paths:
+        return
+
+    if mode == 'process':
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                         thread_name_prefix='scan')
+    futures = {executor.submit(_timed_scan, scan_func, path, mode == 'process'): path
+               for path in project_paths}
+    pending = set(futures)
+    started = {}  # future -> time it was first seen running
+    try:
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, timeout=POLL_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+            now = time.perf_counter()
+            for future in done:
+                path = futures[future]
+                try:
+                    info, duration, updates = future.result()
+                    if updates:
+                        apply_updates(updates)
+                    yield {'path': path, 'info': info, 'duration': duration, 'error': None}
+                except Exception as e:
+                    yield {'path': path, 'info': None,
+                           'duration': now - started.get(future, now), 'error': str(e)}
+            for future in list(pending):
+                if future not in started:
+                    if future.running():
+                        started[future] = now
+                elif now - started[future] > timeout:
+                    pending.discard(future)
+                    yield {'path': futures[future], 'info': None,
+                           'duration': now - started[future], 'error': 'timeout'}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_projects(project_paths, scan_func, workers=None, mode=None, timeout=None):
+    """Scan projects concurrently and return results in the input order."""
+    results = {result['path']: result
+               for result in iter_scan_projects(project_paths, scan_func,
+                                                workers, mode, timeout)}
+    return [results[path] for path in project_paths]
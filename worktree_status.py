@@ -0,0 +1,193 @@
+"""
+Working-tree status (dirty files, ahead/behind, branch) for many repositories
+
+Each repository is asked once with `git status --porcelain=v2 --branch`,
+many repositories at a time in a thread pool. Results are cached against
+a cheap signature: the mtime and size of .git/index, the HEAD commit and
+the mtimes of FETCH_HEAD and packed-refs. Editing a tracked file changes
+none of those, so entries of repositories being looked at also expire
+after STATUS_TTL seconds.
+
+Status runs never take index.lock (--no-optional-locks), so they cannot
+get in the way of git commands the user runs at the same time.
+"""
+
+import os
+import sys
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from git_reader import UnsupportedRepo, find_git_dir, find_common_dir, read_head
+from metrics import record_subprocess
+
+STATUS_WORKERS = int(os.environ.get('PROJECT_VIEWER_STATUS_WORKERS', '8'))
+STATUS_TTL = float(os.environ.get('PROJECT_VIEWER_STATUS_TTL', '60'))
+STATUS_TIMEOUT = 60
+# The fsmonitor daemon only exists on macOS and Windows; elsewhere the
+# repository's own core.fsmonitor hook setting (if any) still applies
+USE_FSMONITOR = os.environ.get('PROJECT_VIEWER_FSMONITOR',
+                               '1' if sys.platform in ('darwin', 'win32') else '0') == '1'
+
+STATUS_ENV = dict(os.environ, GIT_TERMINAL_PROMPT='0', LC_ALL='C')
+
+
+def status_command():
+    cmd = ['git', '--no-optional-locks', '-c', 'core.untrackedCache=true']
+    if USE_FSMONITOR:
+        cmd += ['-c', 'core.fsmonitor=true']
+    # Untracked directories are reported once instead of file by file
+    return cmd + ['status', '--porcelain=v2', '--branch', '--untracked-files=normal',
+                  '--ignore-submodules=dirty']
+
+
+def parse_status(output):
+    """Parse `git status --porcelain=v2 --branch` output into a status dict."""
+    status = {
+        'branch': None,
+        'upstream': None,
+        'ahead': 0,
+        'behind': 0,
+        'staged': 0,
+        'modified': 0,
+        'untracked': 0,
+        'conflicts': 0
+    }
+    for line in output.splitlines():
+        if line.startswith('# branch.head '):
+            branch = line[len('# branch.head '):]
+            status['branch'] = None if branch == '(detached)' else branch
+        elif line.startswith('# branch.upstream '):
+            status['upstream'] = line[len('# branch.upstream '):]
+        elif line.startswith('# branch.ab '):
+            ahead, behind = line.split()[2:4]
+            status['ahead'] = int(ahead.lstrip('+'))
+            status['behind'] = int(behind.lstrip('-'))
+        elif line.startswith(('1 ', '2 ')):
+            xy = line[2:4]
+            if xy[0] != '.':
+                status['staged'] += 1
+            if xy[1] != '.':
+                status['modified'] += 1
+        elif line.startswith('u '):
+            status['conflicts'] += 1
+        elif line.startswith('? '):
+            status['untracked'] += 1
+    status['dirty'] = bool(status['staged'] or status['modified'] or status['untracked']
+                           or status['conflicts'])
+    return status
+
+
+def read_status(project_path):
+    """Run git status in one repository; returns a status dict or one with an 'error'."""
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(status_command(), cwd=project_path, capture_output=True, text=True,
+                                errors='replace', timeout=STATUS_TIMEOUT, env=STATUS_ENV)
+    except subprocess.TimeoutExpired:
+        record_subprocess('git status', time.perf_counter() - start, False, project_path)
+        return {'error': f'git status timed out after {STATUS_TIMEOUT}s'}
+    except OSError as e:
+        record_subprocess('git status', time.perf_counter() - start, False, project_path)
+        return {'error': str(e)}
+    record_subprocess('git status', time.perf_counter() - start, result.returncode == 0, project_path)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip() or 'git status failed'}
+    return parse_status(result.stdout)
+
+
+def status_signature(project_path):
+    """Return the values that change when the status is likely to change, or None."""
+    git_dir = find_git_dir(project_path)
+    if git_dir is None:
+        return None
+    try:
+        common_dir = find_common_dir(git_dir)
+        _, head = read_head(git_dir, common_dir)
+    except (OSError, UnsupportedRepo):
+        head = None
+    signature = [head]
+    for path in (os.path.join(git_dir, 'index'), os.path.join(common_dir, 'FETCH_HEAD'),
+                 os.path.join(common_dir, 'packed-refs')):
+        try:
+            st = os.stat(path)
+            signature += [st.st_mtime_ns, st.st_size]
+        except OSError:
+            signature += [None, None]
+    return signature
+
+
+class StatusCollector:
+    """Collects and caches the working-tree status of many repositories."""
+
+    def __init__(self, workers=STATUS_WORKERS, ttl=STATUS_TTL):
+        self.workers = workers
+        self.ttl = ttl
+        self.entries = {}  # project path -> (signature, checked time, status)
+        self.running = False
+        self.lock = threading.Lock()
+
+    def cached(self, project_path, expire=True):
+        """Return (status, fresh) from the cache; status is None if never collected.
+
+        Without expire an entry stays fresh until its signature changes,
+        however old it is.
+        """
+        with self.lock:
+            entry = self.entries.get(project_path)
+        if entry is None:
+            return None, False
+        signature, checked, status = entry
+        if expire and time.monotonic() - checked >= self.ttl:
+            return status, False
+        return status, status_signature(project_path) == signature
+
+    def collect(self, project_paths):
+        """Refresh the status of repositories in parallel.
+
+        Returns the paths whose status differs from the cached one.
+        """
+        def collect_one(project_path):
+            signature = status_signature(project_path)
+            return project_path, signature, read_status(project_path)
+
+        changed = []
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            for project_path, signature, status in executor.map(collect_one, project_paths):
+                with self.lock:
+                    previous = self.entries.get(project_path)
+                    self.entries[project_path] = (signature, time.monotonic(), status)
+                if previous is None or previous[2] != status:
+                    changed.append(project_path)
+        return changed
+
+    def collect_in_background(self, project_paths, on_done=None):
+        """Run collect() in a thread unless one is already running.
+
+        on_done is called with the paths whose status changed.
+        """
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+
+        def run():
+            try:
+                changed = self.collect(project_paths)
+                if on_done and changed:
+                    on_done(changed)
+            except Exception as e:
+                print(f"Working tree status failed: {e}")
+            finally:
+                with self.lock:
+                    self.running = False
+
+        threading.Thread(target=run, name='worktree-status', daemon=True).start()
+
+    def prune(self, project_paths):
+        """Drop cached entries for repositories that no longer exist."""
+        keep = set(project_paths)
+        with self.lock:
+            for project_path in [path for path in self.entries if path not in keep]:
+                del self.entries[project_path]